@@ -1,11 +1,39 @@
+import hashlib
 import json
+import logging
+from datetime import timedelta
+from threading import Thread
+from uuid import uuid4
 
 from dateutil import parser as date_parser
+from django.conf import settings as django_settings
+from django.db import transaction
+from django.db.models import BooleanField, Case, Q, Value, When
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
+from redis import RedisError
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import exception_handler
 
-from hive_app.models import Asset
+from celery_tasks import (
+    BACKUP_TIME_LIMIT,
+    RECOVERY_LOCK_KEY,
+    ingest_asset,
+    mark_ingestion_queued,
+    recover_backup,
+)
+from hive_app.models import Asset, AssetChange, ProcessingState
+from lib import playlist
+from lib.redis_client import connect_to_redis
+from settings import ZmqPublisher
+
+SNAPSHOT_KEY = 'snapshot:{}'
+# Snapshots nobody asked for in this many max ages are dropped, so that
+# the first request after a quiet spell doesn't get ancient data.
+SNAPSHOT_KEEP_FACTOR = 10
+
+r = connect_to_redis()
 
 
 class AssetCreationError(Exception):
@@ -49,18 +77,182 @@ def custom_exception_handler(exc, context):
     )
 
 
+def get_active_filter(current_time=None):
+    """The SQL equivalent of `Asset.is_active()`."""
+    current_time = current_time or timezone.now()
+    return Q(
+        is_enabled=True,
+        start_date__lt=current_time,
+        end_date__gt=current_time,
+    )
+
+
+def annotate_active(queryset, current_time=None):
+    """Adds an `active` column so that rows don't call `is_active()`."""
+    return queryset.annotate(
+        active=Case(
+            When(get_active_filter(current_time), then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        )
+    )
+
+
 def get_active_asset_ids():
-    enabled_assets = Asset.objects.filter(
-        is_enabled=1,
-        start_date__isnull=False,
-        end_date__isnull=False,
+    """Returns the ids of the active assets in play order."""
+    return list(
+        Asset.objects.filter(get_active_filter())
+        .order_by('play_order', 'asset_id')
+        .values_list('asset_id', flat=True)
     )
-    return [asset.asset_id for asset in enabled_assets if asset.is_active()]
 
 
 def save_active_assets_ordering(active_asset_ids):
-    for i, asset_id in enumerate(active_asset_ids):
-        Asset.objects.filter(asset_id=asset_id).update(play_order=i)
+    """
+    Sets each asset's play_order to its position in `active_asset_ids`.
+    Only rows whose position changed are written, batched into CASE
+    updates within one transaction.
+    """
+    positions = {asset_id: i for i, asset_id in enumerate(active_asset_ids)}
+
+    with transaction.atomic():
+        current_positions = Asset.objects.filter(
+            asset_id__in=positions
+        ).values_list('asset_id', 'play_order')
+        changed_assets = [
+            Asset(asset_id=asset_id, play_order=positions[asset_id])
+            for asset_id, play_order in current_positions
+            if play_order != positions[asset_id]
+        ]
+        Asset.objects.bulk_update(changed_assets, ['play_order'])
+        AssetChange.record(asset.asset_id for asset in changed_assets)
+
+
+def notify_playlist_changed(asset_ids=None):
+    """
+    Bump the playlist version and tell the viewer which assets changed.
+    If Redis is unavailable the viewer falls back to polling the database.
+    """
+    return playlist.notify_playlist_changed(
+        ZmqPublisher.get_instance(), asset_ids
+    )
+
+
+def queue_ingestion(assets):
+    """
+    Queues `ingest_asset` for the given assets that need it, once the
+    current transaction is committed. Assets the broker couldn't take are
+    picked up by `queue_pending_ingestion` later.
+    """
+    asset_ids = [
+        asset.asset_id
+        for asset in assets
+        if asset.processing_state == ProcessingState.QUEUED
+    ]
+
+    def send():
+        for asset_id in asset_ids:
+            try:
+                ingest_asset.apply_async(args=[asset_id])
+                mark_ingestion_queued(asset_id, force=True)
+            except Exception as error:
+                logging.warning('Could not queue %s: %s', asset_id, error)
+
+    if asset_ids:
+        transaction.on_commit(send)
+
+
+def collect_snapshot(collect):
+    collected_at = timezone.now()
+    max_age = timedelta(seconds=django_settings.DIAGNOSTICS_SNAPSHOT_MAX_AGE)
+    return {
+        'data': collect(),
+        'collected_at': collected_at.isoformat(),
+        'stale_after': (collected_at + max_age).isoformat(),
+    }
+
+
+def store_snapshot(name, collect):
+    snapshot = collect_snapshot(collect)
+    try:
+        r.set(
+            SNAPSHOT_KEY.format(name),
+            json.dumps(snapshot),
+            ex=(
+                django_settings.DIAGNOSTICS_SNAPSHOT_MAX_AGE
+                * SNAPSHOT_KEEP_FACTOR
+            ),
+        )
+    except RedisError as error:
+        logging.warning('Could not store the %s snapshot: %s', name, error)
+    return snapshot
+
+
+def refresh_snapshot(name, collect):
+    try:
+        store_snapshot(name, collect)
+        r.delete(f'{SNAPSHOT_KEY.format(name)}:lock')
+    except Exception as error:
+        logging.warning('Could not refresh the %s snapshot: %s', name, error)
+
+
+def get_snapshot(name, collect, refresh=False):
+    """
+    Returns what `collect()` returned, as of `collected_at`, along with
+    when it goes stale. Snapshots are shared through Redis by all the
+    workers. A stale one is still returned while a background thread
+    collects a new one; `refresh` collects a new one right away.
+    """
+    try:
+        cached = None if refresh else r.get(SNAPSHOT_KEY.format(name))
+        if cached is None:
+            return store_snapshot(name, collect)
+
+        snapshot = json.loads(cached)
+        if date_parser.parse(snapshot['stale_after']) <= timezone.now():
+            # Only one worker refreshes it at a time.
+            if r.set(
+                f'{SNAPSHOT_KEY.format(name)}:lock',
+                1,
+                nx=True,
+                ex=django_settings.DIAGNOSTICS_SNAPSHOT_MAX_AGE,
+            ):
+                Thread(
+                    target=refresh_snapshot, args=(name, collect), daemon=True
+                ).start()
+    except RedisError as error:
+        logging.warning('Could not get the %s snapshot: %s', name, error)
+        return collect_snapshot(collect)
+
+    return snapshot
+
+
+def start_recovery(file_path):
+    """
+    Queues the restore of the backup at `file_path` and returns its task,
+    or None if a backup is already being restored.
+    """
+    task_id = uuid4().hex
+    if not r.set(RECOVERY_LOCK_KEY, task_id, nx=True, ex=BACKUP_TIME_LIMIT):
+        return None
+
+    return recover_backup.apply_async(args=[file_path], task_id=task_id)
+
+
+def make_etag(*parts):
+    """A strong ETag for a response that only depends on `parts`."""
+    digest = hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def not_modified(request, etag):
+    """Returns a 304 response if the client already has `etag`."""
+    etags = parse_etags(request.headers.get('If-None-Match', ''))
+    if '*' in etags or etag in (tag.removeprefix('W/') for tag in etags):
+        return Response(
+            status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag}
+        )
+    return None
 
 
 def parse_request(request):
@@ -0,0 +1,8 @@
+from rest_framework.pagination import CursorPagination
+
+
+class AssetCursorPagination(CursorPagination):
+    ordering = ('play_order', 'asset_id')
+    page_size = 100
+    page_size_query_param = 'limit'
+    max_page_size = 1000
@@ -9,12 +9,13 @@ from rest_framework.serializers import (
     Serializer,
 )
 
-from hive_app.models import Asset
+from hive_app.models import Asset, ProcessingState
 from lib.utils import validate_url
 
 
-def get_unique_name(name):
-    names = Asset.objects.values_list('name', flat=True)
+def get_unique_name(name, names=None):
+    if names is None:
+        names = Asset.objects.values_list('name', flat=True)
     if name in names:
         i = 1
         while True:
@@ -36,6 +37,24 @@ def validate_uri(uri):
             raise Exception('Invalid URL. Failed to add asset.')
 
 
+def queue_for_ingestion(asset, is_processing=True):
+    """
+    Leaves the slow parts of adding an asset -- downloading, checking the
+    URL, probing, hashing and scaling images -- to the `ingest_asset`
+    task, if there's anything to do. The asset is processing until then.
+    """
+    is_local = asset['uri'].startswith('/')
+    if (
+        'youtube_asset' in asset['mimetype']
+        or ('video' in asset['mimetype'] and not asset['duration'])
+        or not asset['skip_asset_check']
+        or (is_local and not asset.get('md5'))
+        or (is_local and 'image' in asset['mimetype'])
+    ):
+        asset['is_processing'] = is_processing
+        asset['processing_state'] = ProcessingState.QUEUED
+
+
 class AssetSerializer(ModelSerializer):
     duration = CharField()
     is_enabled = IntegerField(min_value=0, max_value=1)
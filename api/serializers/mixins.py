@@ -5,15 +5,12 @@ from os import path, rename
 from rest_framework.serializers import CharField, Serializer
 
 from api.errors import AssetCreationError
-from lib.utils import (
-    download_video_from_youtube,
-    get_video_duration,
-    url_fails,
-)
+from api.uploads import get_upload_md5
 from settings import settings
 
 from . import (
     get_unique_name,
+    queue_for_ingestion,
     validate_uri,
 )
 
@@ -50,30 +47,29 @@ class CreateAssetSerializerMixin:
             asset['asset_id'] = uuid.uuid4().hex
 
         if not asset_id and uri.startswith('/'):
+            md5 = get_upload_md5(uri)
+            if md5:
+                asset['md5'] = md5
             path_name = path.join(settings['assetdir'], asset['asset_id'])
             ext_name = data.get('ext', '')
             new_uri = f'{path_name}{ext_name}'
-            rename(uri, new_uri)
+            if getattr(self, 'defer_file_move', False):
+                # Moved by the caller, once it's sure to save the asset.
+                self.file_move = (uri, new_uri)
+            else:
+                rename(uri, new_uri)
             uri = new_uri
 
-        if 'youtube_asset' in asset['mimetype']:
-            (uri, asset['name'], asset['duration']) = (
-                download_video_from_youtube(uri, asset['asset_id'])
-            )
-            asset['mimetype'] = 'video'
-            asset['is_processing'] = True if version == 'v2' else 1
-
         asset['uri'] = uri
 
-        if 'video' in asset['mimetype']:
+        if (
+            'video' in asset['mimetype']
+            or 'youtube_asset' in asset['mimetype']
+        ):
             if int(data.get('duration')) == 0:
-                original_mimetype = data.get('mimetype')
-
-                if original_mimetype != 'youtube_asset':
-                    duration = get_video_duration(uri).total_seconds()
-                    asset['duration'] = (
-                        duration if version == 'v2' else int(duration)
-                    )
+                # Set by `ingest_asset`, along with a YouTube video's
+                # name.
+                asset['duration'] = 0
             else:
                 raise AssetCreationError(
                     'Duration must be zero for video assets.'
@@ -100,10 +96,9 @@ class CreateAssetSerializerMixin:
         asset['start_date'] = data.get('start_date').replace(tzinfo=None)
         asset['end_date'] = data.get('end_date').replace(tzinfo=None)
 
-        if not asset['skip_asset_check'] and url_fails(asset['uri']):
-            raise AssetCreationError(
-                'Could not retrieve file. Check the asset URL.'
-            )
+        queue_for_ingestion(
+            asset, is_processing=True if version == 'v2' else 1
+        )
 
         return asset
 
@@ -10,15 +10,11 @@ from rest_framework.serializers import (
     Serializer,
 )
 
-from lib.utils import (
-    download_video_from_youtube,
-    get_video_duration,
-    url_fails,
-)
 from settings import settings
 
 from . import (
     get_unique_name,
+    queue_for_ingestion,
     validate_uri,
 )
 
@@ -39,6 +35,7 @@ class CreateAssetSerializerV1_1(Serializer):
     nocache = BooleanField(required=False)
     play_order = IntegerField(required=False)
     skip_asset_check = IntegerField(min_value=0, max_value=1, required=False)
+    processing_state = CharField(read_only=True)
 
     def prepare_asset(self, data):
         name = data['name']
@@ -65,20 +62,14 @@ class CreateAssetSerializerV1_1(Serializer):
                 rename(uri, path.join(settings['assetdir'], asset['asset_id']))
                 uri = path.join(settings['assetdir'], asset['asset_id'])
 
-        if 'youtube_asset' in asset['mimetype']:
-            (uri, asset['name'], asset['duration']) = (
-                download_video_from_youtube(uri, asset['asset_id'])
-            )
-            asset['mimetype'] = 'video'
-            asset['is_processing'] = 1
-
         asset['uri'] = uri
 
-        if 'video' in asset['mimetype']:
-            if int(data.get('duration')) == 0:
-                asset['duration'] = int(
-                    get_video_duration(uri).total_seconds()
-                )
+        if (
+            'video' in asset['mimetype']
+            or 'youtube_asset' in asset['mimetype']
+        ):
+            # Probed by `ingest_asset` when zero.
+            asset['duration'] = int(data.get('duration') or 0)
         else:
             # Crashes if it's not an int. We want that.
             asset['duration'] = int(data.get('duration'))
@@ -95,8 +86,7 @@ class CreateAssetSerializerV1_1(Serializer):
         else:
             asset['end_date'] = ''
 
-        if not asset['skip_asset_check'] and url_fails(asset['uri']):
-            raise Exception('Could not retrieve file. Check the asset URL.')
+        queue_for_ingestion(asset, is_processing=1)
 
         return asset
 
@@ -27,6 +27,7 @@ class CreateAssetSerializerV1_2(Serializer, CreateAssetSerializerMixin):
     nocache = IntegerField(min_value=0, max_value=1, required=False)
     play_order = IntegerField(required=False)
     skip_asset_check = IntegerField(min_value=0, max_value=1, required=False)
+    processing_state = CharField(read_only=True)
 
     def validate(self, data):
         return self.prepare_asset(data, version='v1_2')
@@ -5,23 +5,38 @@ from rest_framework.serializers import (
     CharField,
     ChoiceField,
     DateTimeField,
+    DictField,
     IntegerField,
+    ListField,
     ModelSerializer,
+    RegexField,
     Serializer,
     SerializerMethodField,
+    ValidationError,
 )
 
 from hive_app.models import Asset
 from api.serializers import UpdateAssetSerializer
 from api.serializers.mixins import CreateAssetSerializerMixin
 
+BATCH_MAX_OPERATIONS = 1000
+
 
 class AssetSerializerV2(ModelSerializer, CreateAssetSerializerMixin):
     is_active = SerializerMethodField()
 
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
     @extend_schema_field(OpenApiTypes.BOOL)
     def get_is_active(self, obj):
-        return obj.is_active()
+        # Listings compute this in SQL, see `annotate_active()`.
+        active = getattr(obj, 'active', None)
+        return obj.is_active() if active is None else active
 
     class Meta:
         model = Asset
@@ -39,12 +54,56 @@ class AssetSerializerV2(ModelSerializer, CreateAssetSerializerMixin):
             'skip_asset_check',
             'is_active',
             'is_processing',
+            'processing_state',
+            'processing_error',
         ]
 
 
+class AssetListQuerySerializerV2(Serializer):
+    active = BooleanField(required=False, allow_null=True, default=None)
+    enabled = BooleanField(required=False, allow_null=True, default=None)
+    mimetype = CharField(
+        required=False,
+        help_text='Comma-separated list of mimetypes, e.g. `image,video`.',
+    )
+    name_prefix = CharField(required=False)
+    scheduled_from = DateTimeField(
+        required=False,
+        default_timezone=timezone.utc,
+        help_text='Only assets scheduled to end after this time.',
+    )
+    scheduled_until = DateTimeField(
+        required=False,
+        default_timezone=timezone.utc,
+        help_text='Only assets scheduled to start before this time.',
+    )
+    fields = CharField(
+        required=False,
+        help_text='Comma-separated list of fields to return.',
+    )
+
+    def validate_mimetype(self, value):
+        return [mimetype for mimetype in value.split(',') if mimetype]
+
+    def validate_fields(self, value):
+        fields = [field for field in value.split(',') if field]
+        unknown = set(fields) - set(AssetSerializerV2.Meta.fields)
+        if unknown:
+            raise ValidationError(
+                f'Unknown fields: {", ".join(sorted(unknown))}.'
+            )
+        return fields
+
+
 class CreateAssetSerializerV2(Serializer, CreateAssetSerializerMixin):
-    def __init__(self, *args, unique_name=False, **kwargs):
+    def __init__(
+        self, *args, unique_name=False, defer_file_move=False, **kwargs
+    ):
         self.unique_name = unique_name
+        # With `defer_file_move`, validating doesn't move an uploaded file
+        # into place, `file_move` is the move left to do.
+        self.defer_file_move = defer_file_move
+        self.file_move = None
         super().__init__(*args, **kwargs)
 
     asset_id = CharField(read_only=True)
@@ -60,6 +119,9 @@ class CreateAssetSerializerV2(Serializer, CreateAssetSerializerMixin):
     nocache = BooleanField(required=False)
     play_order = IntegerField(required=False)
     skip_asset_check = BooleanField(required=False)
+    # Only taken from uploads the server checked, see `get_upload_md5`.
+    md5 = CharField(read_only=True)
+    processing_state = CharField(read_only=True)
 
     def validate(self, data):
         return self.prepare_asset(data, version='v2')
@@ -73,6 +135,76 @@ class UpdateAssetSerializerV2(UpdateAssetSerializer):
     duration = IntegerField()
 
 
+class AssetBatchOperationSerializerV2(Serializer):
+    op = ChoiceField(choices=['create', 'patch', 'delete'])
+    asset_id = CharField(required=False)
+    data = DictField(required=False)
+
+    def validate(self, data):
+        if data['op'] != 'create' and not data.get('asset_id'):
+            raise ValidationError(
+                {'asset_id': f'This field is required for {data["op"]}.'}
+            )
+        if data['op'] != 'delete' and 'data' not in data:
+            raise ValidationError(
+                {'data': f'This field is required for {data["op"]}.'}
+            )
+        return data
+
+
+class AssetBatchSerializerV2(Serializer):
+    operations = AssetBatchOperationSerializerV2(
+        many=True, allow_empty=False, max_length=BATCH_MAX_OPERATIONS
+    )
+
+
+class AssetChangesQuerySerializerV2(Serializer):
+    since = IntegerField(required=False, min_value=0, default=0)
+
+
+class AssetChangesSerializerV2(Serializer):
+    version = IntegerField()
+    upserted = ListField(child=CharField())
+    deleted = ListField(child=CharField())
+
+
+class CreateUploadSerializerV2(Serializer):
+    filename = CharField()
+    size = IntegerField(min_value=0)
+
+
+class UploadSerializerV2(Serializer):
+    upload_id = CharField()
+    filename = CharField()
+    size = IntegerField()
+    offset = IntegerField()
+
+
+class FinalizeUploadSerializerV2(Serializer):
+    md5 = RegexField(r'^[0-9a-fA-F]{32}$', required=False)
+
+
+class CreateBackupSerializerV2(Serializer):
+    incremental = BooleanField(default=False)
+
+
+class BackupTaskSerializerV2(Serializer):
+    task_id = CharField()
+    status = CharField()
+    done = IntegerField(required=False)
+    total = IntegerField(required=False)
+    filename = CharField(required=False)
+    error = CharField(required=False)
+
+
+class RecoveryTaskSerializerV2(Serializer):
+    task_id = CharField()
+    status = CharField()
+    done = IntegerField(required=False)
+    total = IntegerField(required=False)
+    error = CharField(required=False)
+
+
 class DeviceSettingsSerializerV2(Serializer):
     player_name = CharField()
     audio_output = CharField()
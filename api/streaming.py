@@ -0,0 +1,126 @@
+import os
+import re
+from os import path
+from urllib.parse import quote
+
+from django.conf import settings as django_settings
+from django.http import FileResponse, HttpResponse
+from django.utils.http import content_disposition_header, quote_etag
+
+from settings import settings
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange(object):
+    """
+    The `length` bytes of `file` starting at `start`. The file's
+    descriptor is still exposed so that the WSGI server can `sendfile()`
+    it; gunicorn starts at the current offset and stops after
+    `Content-Length` bytes.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    Returns the `(start, end)` bytes, both inclusive, requested by a
+    `Range` header. Returns None when the whole file should be sent, which
+    is also what we do for multiple ranges. Raises ValueError if the range
+    can't be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+
+    first, last = match.groups()
+    if not first:
+        # The last `last` bytes.
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+
+    if start > end or start >= size:
+        raise ValueError(header)
+
+    return start, end
+
+
+def stream_file(request, file_path, filename, mimetype):
+    """
+    Sends the file as an attachment without loading it into memory.
+    Single byte ranges are honoured so that downloads can be resumed.
+    Files in the asset directory are handed off to nginx when it's set up
+    for it, see `ASSET_ACCEL_REDIRECT_LOCATION`.
+    """
+    location = django_settings.ASSET_ACCEL_REDIRECT_LOCATION
+    asset_dir = path.join(path.realpath(settings['assetdir']), '')
+    real_path = path.realpath(file_path)
+
+    if location and real_path.startswith(asset_dir):
+        response = HttpResponse(content_type=mimetype)
+        response['X-Accel-Redirect'] = location.rstrip('/') + quote(
+            real_path[len(asset_dir) - 1 :]
+        )
+        response['Content-Disposition'] = content_disposition_header(
+            True, filename
+        )
+        return response
+
+    stat = os.stat(file_path)
+    size = stat.st_size
+    etag = quote_etag(f'{stat.st_mtime_ns:x}-{size:x}')
+    byte_range = None
+
+    # A stale `If-Range` means the file changed since the client's partial
+    # download, so it gets the whole file again.
+    if request.headers.get('If-Range', etag) == etag:
+        try:
+            byte_range = parse_range(request.headers.get('Range', ''), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    file = open(file_path, 'rb')
+
+    if byte_range is None:
+        response = FileResponse(
+            file,
+            as_attachment=True,
+            filename=filename,
+            content_type=mimetype,
+        )
+    else:
+        start, end = byte_range
+        response = FileResponse(
+            FileRange(file, start, end - start + 1),
+            status=206,
+            as_attachment=True,
+            filename=filename,
+            content_type=mimetype,
+        )
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    return response
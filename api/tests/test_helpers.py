@@ -0,0 +1,100 @@
+"""
+Tests for the playlist ordering helpers.
+"""
+
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.helpers import (
+    get_active_asset_ids,
+    save_active_assets_ordering,
+)
+from hive_app.models import Asset
+
+
+class PlaylistOrderingTest(TestCase):
+    def create_asset(self, asset_id, play_order, **kwargs):
+        fields = {
+            'asset_id': asset_id,
+            'name': asset_id,
+            'uri': 'https://example.com',
+            'start_date': timezone.now() - timedelta(days=1),
+            'end_date': timezone.now() + timedelta(days=1),
+            'duration': 10,
+            'mimetype': 'webpage',
+            'is_enabled': True,
+            'play_order': play_order,
+            **kwargs,
+        }
+        return Asset.objects.create(**fields)
+
+    def count_updates(self, asset_ids):
+        with CaptureQueriesContext(connection) as context:
+            save_active_assets_ordering(asset_ids)
+
+        return sum(
+            query['sql'].startswith('UPDATE')
+            for query in context.captured_queries
+        )
+
+    def get_play_orders(self):
+        return dict(Asset.objects.values_list('asset_id', 'play_order'))
+
+    def test_active_asset_ids_are_in_play_order(self):
+        self.create_asset('c', 0)
+        self.create_asset('a', 2)
+        self.create_asset('b', 1)
+        self.create_asset('disabled', 3, is_enabled=False)
+        self.create_asset(
+            'expired', 4, end_date=timezone.now() - timedelta(hours=1)
+        )
+        self.create_asset('undated', 5, start_date=None)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_active_asset_ids(), ['c', 'b', 'a'])
+
+    def test_save_ordering(self):
+        self.create_asset('a', 0)
+        self.create_asset('b', 1)
+        self.create_asset('c', 2)
+        self.create_asset('inactive', 1, is_enabled=False)
+
+        save_active_assets_ordering(['c', 'a', 'b', 'unknown'])
+
+        self.assertEqual(
+            self.get_play_orders(),
+            {'c': 0, 'a': 1, 'b': 2, 'inactive': 1},
+        )
+
+    def test_unchanged_rows_are_not_written(self):
+        self.create_asset('a', 0)
+        self.create_asset('b', 1)
+
+        self.assertEqual(self.count_updates(['a', 'b']), 0)
+        self.assertEqual(self.count_updates(['a', 'c', 'b']), 1)
+        self.assertEqual(self.get_play_orders(), {'a': 0, 'b': 2})
+
+    def test_reorder_is_batched(self):
+        Asset.objects.bulk_create(
+            [
+                Asset(
+                    asset_id=f'{i:04}',
+                    start_date=timezone.now() - timedelta(days=1),
+                    end_date=timezone.now() + timedelta(days=1),
+                    is_enabled=True,
+                    play_order=i,
+                )
+                for i in range(1000)
+            ]
+        )
+        asset_ids = get_active_asset_ids()
+        asset_ids.reverse()
+
+        # A handful of CASE updates, not one per asset.
+        self.assertLessEqual(self.count_updates(asset_ids), 5)
+
+        self.assertEqual(get_active_asset_ids(), asset_ids)
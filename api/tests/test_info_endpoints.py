@@ -2,16 +2,26 @@
 Tests for Info API endpoints (v1 and v2).
 """
 
+import json
+from datetime import timedelta
 from unittest import mock
 
 from django.test import TestCase
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 
 
 class InfoEndpointsTest(TestCase):
     def setUp(self):
+        # No snapshot yet, so the diagnostics are always collected.
+        patcher = mock.patch(
+            'api.helpers.r', mock.Mock(**{'get.return_value': None})
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
         self.client = APIClient()
         self.info_url_v1 = reverse('api:info_v1')
         self.info_url_v2 = reverse('api:info_v2')
@@ -55,10 +65,10 @@ class InfoEndpointsTest(TestCase):
         }
         self._assert_response_data(data, expected_data)
 
-    @mock.patch('api.views.v2.is_up_to_date', return_value=True)
+    @mock.patch('api.views.mixins.is_up_to_date', return_value=True)
     @mock.patch('lib.diagnostics.get_load_avg', return_value={'15 min': 0.25})
-    @mock.patch('api.views.v2.size', return_value='20G')
-    @mock.patch('api.views.v2.statvfs', mock.MagicMock())
+    @mock.patch('api.views.mixins.size', return_value='20G')
+    @mock.patch('api.views.mixins.statvfs', mock.MagicMock())
     @mock.patch('api.views.v2.r.get', return_value='on')
     @mock.patch('api.views.v2.diagnostics.get_git_branch', return_value='main')
     @mock.patch(
@@ -149,3 +159,70 @@ class InfoEndpointsTest(TestCase):
             'host_user': 'testuser',
         }
         self._assert_response_data(data, expected_data)
+
+
+@mock.patch('api.views.mixins.r.get', return_value='on')
+@mock.patch('api.helpers.r')
+class InfoSnapshotTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.info_url = reverse('api:info_v1')
+        self.data = {'loadavg': 0.5, 'free_space': '10G', 'up_to_date': True}
+
+    def cache(self, redis_mock, stale_after):
+        redis_mock.get.return_value = json.dumps(
+            {
+                'data': self.data,
+                'collected_at': '2024-01-01T12:00:00+00:00',
+                'stale_after': stale_after.isoformat(),
+            }
+        )
+
+    @mock.patch('api.views.mixins.InfoViewMixin.collect')
+    def test_snapshot_is_served(self, collect_mock, redis_mock, _):
+        self.cache(redis_mock, timezone.now() + timedelta(seconds=30))
+
+        response = self.client.get(self.info_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['loadavg'], 0.5)
+        self.assertEqual(response.data['display_power'], 'on')
+        self.assertEqual(
+            response.data['collected_at'], '2024-01-01T12:00:00+00:00'
+        )
+        redis_mock.get.assert_called_once_with('snapshot:info')
+        collect_mock.assert_not_called()
+
+    @mock.patch('api.helpers.Thread')
+    @mock.patch('api.views.mixins.InfoViewMixin.collect')
+    def test_stale_snapshot_is_refreshed_in_background(
+        self, collect_mock, thread_mock, redis_mock, _
+    ):
+        self.cache(redis_mock, timezone.now() - timedelta(seconds=1))
+
+        response = self.client.get(self.info_url)
+
+        self.assertEqual(response.data['loadavg'], 0.5)
+        collect_mock.assert_not_called()
+        thread_mock.return_value.start.assert_called_once()
+
+        redis_mock.set.return_value = None
+        thread_mock.reset_mock()
+        self.client.get(self.info_url)
+        thread_mock.assert_not_called()
+
+    @mock.patch(
+        'api.views.mixins.InfoViewMixin.collect',
+        return_value={'loadavg': 0.1, 'free_space': '9G', 'up_to_date': False},
+    )
+    def test_refresh(self, collect_mock, redis_mock, _):
+        self.cache(redis_mock, timezone.now() + timedelta(seconds=30))
+
+        response = self.client.get(self.info_url, {'refresh': '1'})
+
+        self.assertEqual(response.data['loadavg'], 0.1)
+        collect_mock.assert_called_once()
+        redis_mock.get.assert_not_called()
+        key, snapshot = redis_mock.set.call_args.args
+        self.assertEqual(key, 'snapshot:info')
+        self.assertEqual(json.loads(snapshot)['data']['free_space'], '9G')
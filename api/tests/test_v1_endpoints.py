@@ -145,8 +145,8 @@ class V1EndpointsTest(TestCase, ParametrizedTestCase):
 
         with mock.patch(
             'api.views.v1.ZmqCollector.recv_json',
-            side_effect=(lambda _: {'current_asset_id': asset_id}),
-        ):
+            side_effect=(lambda _, request_id: {'current_asset_id': asset_id}),
+        ) as recv_json_mock:
             viewer_current_asset_url = reverse('api:viewer_current_asset_v1')
             response = self.client.get(viewer_current_asset_url)
             data = response.data
@@ -156,3 +156,8 @@ class V1EndpointsTest(TestCase, ParametrizedTestCase):
 
             self.assertEqual(data['asset_id'], asset_id)
             self.assertEqual(data['is_active'], 1)
+
+            # The reply is matched to the request.
+            (command,) = send_to_viewer_mock.call_args.args
+            _, request_id = recv_json_mock.call_args.args
+            self.assertEqual(command, f'current_asset_id&{request_id}')
@@ -3,14 +3,24 @@ Tests for V2 API endpoints.
 """
 
 import hashlib
+import os
+import tempfile
+from base64 import b64decode
+from datetime import timedelta
 from unittest import mock
 from unittest.mock import patch
 
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from hive_app.models import Asset, ProcessingState
+from lib.backup_helper import BackupError
+from settings import settings
+
 
 class DeviceSettingsViewV2Test(TestCase):
     def setUp(self):
@@ -56,6 +66,37 @@ class DeviceSettingsViewV2Test(TestCase):
         for key, expected_value in expected_values.items():
             self.assertEqual(response.data[key], expected_value)
 
+    @mock.patch('api.views.v2.settings')
+    def test_get_device_settings_not_modified(self, settings_mock):
+        values = {
+            'player_name': 'Test Player',
+            'audio_output': 'hdmi',
+            'default_duration': '15',
+            'default_streaming_duration': '100',
+            'date_format': 'YYYY-MM-DD',
+            'auth_backend': '',
+            'show_splash': True,
+            'default_assets': [],
+            'shuffle_playlist': False,
+            'use_24_hour_clock': True,
+            'debug_logging': False,
+            'user': '',
+        }
+        settings_mock.__getitem__.side_effect = lambda key: values[key]
+
+        etag = self.client.get(self.device_settings_url)['ETag']
+        response = self.client.get(
+            self.device_settings_url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        values['player_name'] = 'Renamed Player'
+        response = self.client.get(
+            self.device_settings_url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['player_name'], 'Renamed Player')
+
     @mock.patch('api.views.v2.settings')
     def test_patch_device_settings_invalid_auth_backend(self, settings_mock):
         settings_mock.load = mock.MagicMock()
@@ -135,8 +176,13 @@ class DeviceSettingsViewV2Test(TestCase):
         )
 
         settings_mock.load.assert_called_once()
-        settings_mock.save.assert_called_once()
-        self.assertEqual(settings_mock.__setitem__.call_count, 5)
+        settings_mock.update_and_save.assert_called_once_with(
+            auth_backend='',
+            player_name='New Player',
+            audio_output='hdmi',
+            default_duration=20,
+            show_splash=True,
+        )
 
         publisher_instance.send_to_viewer.assert_called_once_with('reload')
 
@@ -218,12 +264,14 @@ class DeviceSettingsViewV2Test(TestCase):
         )
 
         settings_mock.load.assert_called_once()
-        settings_mock.save.assert_called_once()
-        settings_mock.__setitem__.assert_any_call('auth_backend', 'auth_basic')
-        settings_mock.__setitem__.assert_any_call('user', 'testuser')
-        settings_mock.__setitem__.assert_any_call(
-            'password', expected_hashed_password
+        settings_mock.update_and_save.assert_called_once()
+        self.assertEqual(
+            settings_mock.update_and_save.call_args.kwargs['auth_backend'],
+            'auth_basic',
         )
+        changes = settings_mock.update_and_save.call_args.kwargs
+        self.assertEqual(changes['user'], 'testuser')
+        self.assertEqual(changes['password'], expected_hashed_password)
 
         publisher_instance.send_to_viewer.assert_called_once_with('reload')
 
@@ -273,8 +321,11 @@ class DeviceSettingsViewV2Test(TestCase):
         )
 
         settings_mock.load.assert_called_once()
-        settings_mock.save.assert_called_once()
-        settings_mock.__setitem__.assert_any_call('auth_backend', '')
+        settings_mock.update_and_save.assert_called_once()
+        self.assertEqual(
+            settings_mock.update_and_save.call_args.kwargs['auth_backend'],
+            '',
+        )
 
         publisher_instance.send_to_viewer.assert_called_once_with('reload')
 
@@ -327,15 +378,18 @@ class DeviceSettingsViewV2Test(TestCase):
         )
 
         settings_mock.load.assert_called_once()
-        settings_mock.save.assert_called_once()
-        settings_mock.__setitem__.assert_any_call('default_assets', True)
+        settings_mock.update_and_save.assert_called_once()
+        self.assertEqual(
+            settings_mock.update_and_save.call_args.kwargs['default_assets'],
+            True,
+        )
         add_default_assets_mock.assert_called_once()
         remove_default_assets_mock.assert_not_called()
         publisher_instance.send_to_viewer.assert_called_once_with('reload')
 
         # Reset mocks
         settings_mock.load.reset_mock()
-        settings_mock.save.reset_mock()
+        settings_mock.update_and_save.reset_mock()
         settings_mock.__setitem__.reset_mock()
         add_default_assets_mock.reset_mock()
         remove_default_assets_mock.reset_mock()
@@ -371,8 +425,11 @@ class DeviceSettingsViewV2Test(TestCase):
         )
 
         settings_mock.load.assert_called_once()
-        settings_mock.save.assert_called_once()
-        settings_mock.__setitem__.assert_any_call('default_assets', False)
+        settings_mock.update_and_save.assert_called_once()
+        self.assertEqual(
+            settings_mock.update_and_save.call_args.kwargs['default_assets'],
+            False,
+        )
         remove_default_assets_mock.assert_called_once()
         add_default_assets_mock.assert_not_called()
         publisher_instance.send_to_viewer.assert_called_once_with('reload')
@@ -433,3 +490,944 @@ class TestIntegrationsViewV2(TestCase):
                 'balena_device_name_at_init': None,
             },
         )
+
+
+@mock.patch('api.views.v2.notify_playlist_changed')
+class AssetBatchViewV2Test(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.batch_url = reverse('api:asset_batch_v2')
+
+    def create_asset(self, asset_id, play_order):
+        return Asset.objects.create(
+            asset_id=asset_id,
+            name=asset_id,
+            uri='https://example.com',
+            start_date=timezone.now() - timedelta(days=1),
+            end_date=timezone.now() + timedelta(days=1),
+            duration=10,
+            mimetype='webpage',
+            is_enabled=True,
+            play_order=play_order,
+        )
+
+    def asset_data(self, name, **kwargs):
+        return {
+            'name': name,
+            'uri': 'https://example.com',
+            'start_date': '2019-08-24T14:15:22Z',
+            'end_date': '2099-08-24T14:15:22Z',
+            'duration': 10,
+            'mimetype': 'webpage',
+            'is_enabled': True,
+            'skip_asset_check': True,
+            **kwargs,
+        }
+
+    def post(self, operations):
+        return self.client.post(
+            self.batch_url, data={'operations': operations}, format='json'
+        )
+
+    def test_batch_create_patch_delete(self, notify_mock):
+        self.create_asset('a', 0)
+        self.create_asset('b', 1)
+
+        response = self.post(
+            [
+                {'op': 'create', 'data': self.asset_data('c', play_order=0)},
+                {'op': 'patch', 'asset_id': 'a', 'data': {'name': 'A'}},
+                {'op': 'delete', 'asset_id': 'b'},
+            ]
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual(
+            [result['status'] for result in results], [201, 200, 204]
+        )
+        created_id = results[0]['asset_id']
+        self.assertEqual(results[0]['asset']['name'], 'c')
+        self.assertEqual(results[1]['asset']['name'], 'A')
+
+        self.assertFalse(Asset.objects.filter(asset_id='b').exists())
+        self.assertEqual(
+            list(
+                Asset.objects.order_by('play_order').values_list(
+                    'asset_id', flat=True
+                )
+            ),
+            [created_id, 'a'],
+        )
+        notify_mock.assert_called_once()
+
+    def test_batch_is_rejected_as_a_whole(self, notify_mock):
+        self.create_asset('a', 0)
+
+        response = self.post(
+            [
+                {'op': 'patch', 'asset_id': 'a', 'data': {'name': 'A'}},
+                {'op': 'delete', 'asset_id': 'missing'},
+                {'op': 'create', 'data': {'name': 'incomplete'}},
+            ]
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            [424, 404, 400],
+        )
+        self.assertEqual(Asset.objects.get(asset_id='a').name, 'a')
+        self.assertEqual(Asset.objects.count(), 1)
+        notify_mock.assert_not_called()
+
+    def test_batch_names_are_unique(self, notify_mock):
+        self.create_asset('taken', 0)
+
+        response = self.post(
+            [
+                {'op': 'create', 'data': self.asset_data('taken')},
+                {'op': 'create', 'data': self.asset_data('taken')},
+            ]
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result['asset']['name'] for result in response.data['results']],
+            ['taken-1', 'taken-2'],
+        )
+
+    def test_asset_may_only_appear_once(self, notify_mock):
+        self.create_asset('a', 0)
+
+        response = self.post(
+            [
+                {'op': 'patch', 'asset_id': 'a', 'data': {'name': 'A'}},
+                {'op': 'delete', 'asset_id': 'a'},
+            ]
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['results'][1]['status'], 400)
+
+    def upload(self):
+        asset_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(asset_dir.cleanup)
+        for patcher in [
+            mock.patch.dict(settings, {'assetdir': asset_dir.name}),
+            # Would read screenly.conf again and drop the patched value.
+            mock.patch.object(settings, 'load'),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        upload_path = os.path.join(asset_dir.name, 'upload.tmp')
+        with open(upload_path, 'wb') as f:
+            f.write(b'image')
+        return upload_path
+
+    def test_rejected_batch_leaves_uploads_alone(self, notify_mock):
+        upload_path = self.upload()
+
+        response = self.post(
+            [
+                {
+                    'op': 'create',
+                    'data': self.asset_data(
+                        'image', uri=upload_path, ext='.png', mimetype='image'
+                    ),
+                },
+                {'op': 'delete', 'asset_id': 'missing'},
+            ]
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            os.listdir(os.path.dirname(upload_path)), ['upload.tmp']
+        )
+
+    def test_uploads_are_moved_when_applied(self, notify_mock):
+        upload_path = self.upload()
+
+        response = self.post(
+            [
+                {
+                    'op': 'create',
+                    'data': self.asset_data(
+                        'image', uri=upload_path, ext='.png', mimetype='image'
+                    ),
+                },
+            ]
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        asset = Asset.objects.get(
+            asset_id=response.data['results'][0]['asset_id']
+        )
+        self.assertTrue(os.path.isfile(asset.uri))
+        self.assertFalse(os.path.exists(upload_path))
+
+    @mock.patch('api.views.v2.save_active_assets_ordering')
+    def test_uploads_are_moved_back_on_failure(
+        self, ordering_mock, notify_mock
+    ):
+        ordering_mock.side_effect = RuntimeError
+        upload_path = self.upload()
+
+        response = self.post(
+            [
+                {
+                    'op': 'create',
+                    'data': self.asset_data(
+                        'image',
+                        uri=upload_path,
+                        ext='.png',
+                        mimetype='image',
+                    ),
+                },
+            ]
+        )
+
+        self.assertEqual(
+            response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+        self.assertTrue(os.path.isfile(upload_path))
+        self.assertEqual(Asset.objects.count(), 0)
+
+    @mock.patch('api.views.v2.remove_renditions')
+    def test_delete_removes_renditions(
+        self, remove_renditions_mock, notify_mock
+    ):
+        self.create_asset('a', 0)
+
+        response = self.post([{'op': 'delete', 'asset_id': 'a'}])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        remove_renditions_mock.assert_called_once_with('a')
+
+    def test_operation_requires_asset_id(self, notify_mock):
+        response = self.post([{'op': 'delete'}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('operations', response.data)
+
+
+@mock.patch('api.views.v2.notify_playlist_changed')
+@mock.patch('api.helpers.ingest_asset')
+class AssetIngestionViewV2Test(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def asset_data(self, **kwargs):
+        return {
+            'name': 'video',
+            'uri': 'https://example.com/video.mp4',
+            'start_date': '2019-08-24T14:15:22Z',
+            'end_date': '2099-08-24T14:15:22Z',
+            'duration': 0,
+            'mimetype': 'video',
+            'is_enabled': True,
+            'skip_asset_check': False,
+            **kwargs,
+        }
+
+    def test_create_queues_ingestion(self, ingest_mock, notify_mock):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('api:asset_list_v2'),
+                data=self.asset_data(),
+                format='json',
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.data['is_processing'])
+        self.assertEqual(response.data['processing_state'], 'queued')
+        ingest_mock.apply_async.assert_called_once_with(
+            args=[response.data['asset_id']]
+        )
+
+    def test_ready_asset_is_not_queued(self, ingest_mock, notify_mock):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('api:asset_list_v2'),
+                data=self.asset_data(
+                    uri='https://example.com',
+                    mimetype='webpage',
+                    duration=10,
+                    skip_asset_check=True,
+                ),
+                format='json',
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(response.data['is_processing'])
+        self.assertEqual(response.data['processing_state'], 'ready')
+        ingest_mock.apply_async.assert_not_called()
+
+    def test_batch_create_queues_ingestion(self, ingest_mock, notify_mock):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('api:asset_batch_v2'),
+                data={
+                    'operations': [
+                        {'op': 'create', 'data': self.asset_data()},
+                    ]
+                },
+                format='json',
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ingest_mock.apply_async.assert_called_once_with(
+            args=[response.data['results'][0]['asset_id']]
+        )
+
+
+class AssetListViewV2Test(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.asset_list_url = reverse('api:asset_list_v2')
+
+        now = timezone.now()
+        for i, (name, mimetype, is_enabled, offset) in enumerate(
+            [
+                ('beach', 'image', True, 0),
+                ('ball', 'video', True, 0),
+                ('clock', 'webpage', True, 0),
+                ('disabled', 'image', False, 0),
+                ('expired', 'image', True, -10),
+            ]
+        ):
+            Asset.objects.create(
+                asset_id=name,
+                name=name,
+                uri='https://example.com',
+                start_date=now + timedelta(days=offset - 1),
+                end_date=now + timedelta(days=offset + 1),
+                duration=10,
+                mimetype=mimetype,
+                is_enabled=is_enabled,
+                play_order=i,
+            )
+
+    def get_names(self, response):
+        return sorted(asset['name'] for asset in response.data)
+
+    def test_list_returns_every_asset(self):
+        response = self.client.get(self.asset_list_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 5)
+        active = {asset['name']: asset['is_active'] for asset in response.data}
+        self.assertEqual(
+            active,
+            {
+                'beach': True,
+                'ball': True,
+                'clock': True,
+                'disabled': False,
+                'expired': False,
+            },
+        )
+
+    def test_filters(self):
+        cases = [
+            ({'active': 'true'}, ['ball', 'beach', 'clock']),
+            ({'active': 'false'}, ['disabled', 'expired']),
+            ({'enabled': 'false'}, ['disabled']),
+            ({'mimetype': 'video,webpage'}, ['ball', 'clock']),
+            ({'name_prefix': 'b'}, ['ball', 'beach']),
+            (
+                {
+                    'scheduled_until': (
+                        timezone.now() - timedelta(days=5)
+                    ).isoformat()
+                },
+                ['expired'],
+            ),
+            (
+                {'scheduled_from': timezone.now().isoformat()},
+                ['ball', 'beach', 'clock', 'disabled'],
+            ),
+        ]
+        for params, expected in cases:
+            with self.subTest(params=params):
+                response = self.client.get(self.asset_list_url, params)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(self.get_names(response), expected)
+
+    def test_fields_projection(self):
+        response = self.client.get(
+            self.asset_list_url, {'fields': 'name,is_active'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data[0].keys()), {'name', 'is_active'})
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get(self.asset_list_url, {'fields': 'md5'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cursor_pagination(self):
+        response = self.client.get(self.asset_list_url, {'limit': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        names = [asset['name'] for asset in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            names.extend(asset['name'] for asset in response.data['results'])
+
+        self.assertEqual(
+            names, ['beach', 'ball', 'clock', 'disabled', 'expired']
+        )
+
+
+class AssetChangesViewV2Test(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.asset_list_url = reverse('api:asset_list_v2')
+        self.changes_url = reverse('api:asset_changes_v2')
+
+    def create_asset(self, asset_id, **kwargs):
+        fields = {
+            'asset_id': asset_id,
+            'name': asset_id,
+            'uri': 'https://example.com',
+            'start_date': timezone.now() - timedelta(days=1),
+            'end_date': timezone.now() + timedelta(days=1),
+            'duration': 10,
+            'mimetype': 'webpage',
+            'is_enabled': True,
+            **kwargs,
+        }
+        return Asset.objects.create(**fields)
+
+    def get_changes(self, since):
+        response = self.client.get(self.changes_url, {'since': since})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_list_not_modified(self):
+        self.create_asset('a')
+
+        response = self.client.get(self.asset_list_url)
+        etag = response['ETag']
+
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                self.asset_list_url, HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get(
+            self.asset_list_url, {'limit': 1}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.create_asset('b')
+        response = self.client.get(
+            self.asset_list_url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_etag_follows_schedule(self):
+        asset = self.create_asset('a')
+        etag = self.client.get(self.asset_list_url)['ETag']
+
+        # The asset expires without being written to.
+        Asset.objects.filter(asset_id='a').update(
+            end_date=timezone.now() - timedelta(seconds=1)
+        )
+        response = self.client.get(
+            self.asset_list_url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data[0]['is_active'])
+        self.assertEqual(asset.asset_id, response.data[0]['asset_id'])
+
+    def test_detail_not_modified(self):
+        asset = self.create_asset('a')
+        url = reverse('api:asset_detail_v2', args=['a'])
+
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        asset.name = 'renamed'
+        asset.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['name'], 'renamed')
+
+    def test_changes(self):
+        self.create_asset('a')
+        self.create_asset('b')
+        changes = self.get_changes(0)
+        self.assertEqual(changes['upserted'], ['a', 'b'])
+        self.assertEqual(changes['deleted'], [])
+
+        version = changes['version']
+        self.assertEqual(
+            self.get_changes(version),
+            {'version': version, 'upserted': [], 'deleted': []},
+        )
+
+        Asset.objects.get(asset_id='a').delete()
+        self.create_asset('c')
+        changes = self.get_changes(version)
+        self.assertEqual(changes['upserted'], ['c'])
+        self.assertEqual(changes['deleted'], ['a'])
+        self.assertGreater(changes['version'], version)
+
+    def test_reordering_is_a_change(self):
+        self.create_asset('a', play_order=0)
+        self.create_asset('b', play_order=1)
+        version = self.get_changes(0)['version']
+
+        with mock.patch('api.views.mixins.notify_playlist_changed'):
+            response = self.client.post(
+                reverse('api:playlist_order_v2'), {'ids': 'b,a'}
+            )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.assertEqual(
+            sorted(self.get_changes(version)['upserted']), ['a', 'b']
+        )
+
+    def test_unknown_version(self):
+        self.create_asset('a')
+        version = self.get_changes(0)['version']
+
+        response = self.client.get(self.changes_url, {'since': version + 1})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+
+class AssetContentViewV2Test(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.content = bytes(range(256)) * 4
+        self.file_path = os.path.join(settings['assetdir'], 'content-test')
+        with open(self.file_path, 'wb') as f:
+            f.write(self.content)
+        self.addCleanup(os.remove, self.file_path)
+
+        Asset.objects.create(
+            asset_id='a',
+            name='video.mp4',
+            uri=self.file_path,
+            mimetype='video',
+        )
+        self.url = reverse('api:asset_content_v2', args=['a'])
+
+    def download(self, **headers):
+        return self.client.get(self.url, {'download': 'true'}, **headers)
+
+    def test_small_file_is_inlined(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b64decode(response.data['content']), self.content)
+        self.assertEqual(response.data['mimetype'], 'video/mp4')
+        self.assertEqual(response.data['size'], len(self.content))
+
+    @mock.patch('api.views.mixins.ASSET_CONTENT_INLINE_MAX_BYTES', 100)
+    def test_large_file_is_not_inlined(self):
+        response = self.client.get(self.url)
+
+        self.assertNotIn('content', response.data)
+        self.assertEqual(
+            response.data['download_url'], f'{self.url}?download=true'
+        )
+
+    def test_download(self):
+        response = self.download()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('attachment', response['Content-Disposition'])
+
+    def test_download_range(self):
+        cases = [
+            ('bytes=10-19', 10, 19),
+            ('bytes=1000-', 1000, 1023),
+            ('bytes=-24', 1000, 1023),
+            ('bytes=1000-5000', 1000, 1023),
+        ]
+        for header, start, end in cases:
+            with self.subTest(header=header):
+                response = self.download(HTTP_RANGE=header)
+
+                self.assertEqual(
+                    response.status_code, status.HTTP_206_PARTIAL_CONTENT
+                )
+                self.assertEqual(
+                    b''.join(response.streaming_content),
+                    self.content[start : end + 1],
+                )
+                self.assertEqual(
+                    response['Content-Range'], f'bytes {start}-{end}/1024'
+                )
+                self.assertEqual(
+                    response['Content-Length'], str(end - start + 1)
+                )
+
+    def test_download_unsatisfiable_range(self):
+        response = self.download(HTTP_RANGE='bytes=2000-')
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+        )
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_download_stale_if_range(self):
+        etag = self.download()['ETag']
+
+        response = self.download(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+
+        response = self.download(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"x"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    @override_settings(ASSET_ACCEL_REDIRECT_LOCATION='/protected_assets/')
+    def test_download_is_handed_off_to_nginx(self):
+        response = self.download()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected_assets/content-test'
+        )
+        self.assertEqual(response.content, b'')
+
+
+class UploadViewV2Test(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        asset_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(asset_dir.cleanup)
+        for patcher in [
+            mock.patch.dict(settings, {'assetdir': asset_dir.name}),
+            # Would read screenly.conf again and drop the patched value.
+            mock.patch.object(settings, 'load'),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.content = os.urandom(1000)
+
+        # Finalized uploads' checksums are kept in Redis.
+        store = {}
+        patcher = mock.patch('api.uploads.r')
+        redis_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+        redis_mock.get.side_effect = store.get
+        redis_mock.set.side_effect = (
+            lambda key, value, **kwargs: store.__setitem__(key, value)
+        )
+
+    def create_upload(self, filename='clip.mp4', size=1000):
+        response = self.client.post(
+            reverse('api:upload_list_v2'),
+            {'filename': filename, 'size': size},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['upload_id']
+
+    def put_chunk(self, upload_id, first, last):
+        return self.client.put(
+            reverse('api:upload_detail_v2', args=[upload_id]),
+            self.content[first : last + 1],
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {first}-{last}/1000',
+        )
+
+    def finalize(self, upload_id, **data):
+        return self.client.post(
+            reverse('api:upload_finalize_v2', args=[upload_id]),
+            data,
+            format='json',
+        )
+
+    def test_chunked_upload(self):
+        upload_id = self.create_upload()
+
+        self.assertEqual(self.put_chunk(upload_id, 0, 399).data['offset'], 400)
+        # Resending part of a chunk after a dropped connection is fine.
+        self.assertEqual(
+            self.put_chunk(upload_id, 300, 999).data['offset'], 1000
+        )
+
+        md5 = hashlib.md5(self.content).hexdigest()
+        response = self.finalize(upload_id, md5=md5.upper())
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['md5'], md5)
+        self.assertEqual(response.data['ext'], '.mp4')
+        with open(response.data['uri'], 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertEqual(
+            os.listdir(os.path.join(settings['assetdir'], '.uploads')), []
+        )
+
+    def test_uploads_of_the_same_file_do_not_collide(self):
+        self.assertNotEqual(self.create_upload(), self.create_upload())
+
+    def test_progress(self):
+        upload_id = self.create_upload()
+        self.put_chunk(upload_id, 0, 99)
+
+        response = self.client.get(
+            reverse('api:upload_detail_v2', args=[upload_id])
+        )
+        self.assertEqual(response.data['offset'], 100)
+
+    def test_chunk_past_offset_is_rejected(self):
+        upload_id = self.create_upload()
+
+        response = self.put_chunk(upload_id, 100, 199)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_incomplete_upload_is_not_finalized(self):
+        upload_id = self.create_upload()
+        self.put_chunk(upload_id, 0, 99)
+
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_checksum_mismatch(self):
+        upload_id = self.create_upload()
+        self.put_chunk(upload_id, 0, 999)
+
+        response = self.finalize(upload_id, md5='0' * 32)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(
+            reverse('api:upload_detail_v2', args=[upload_id])
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_file_type(self):
+        response = self.client.post(
+            reverse('api:upload_list_v2'),
+            {'filename': 'notes.txt', 'size': 10},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unknown_upload(self):
+        for upload_id in ['0' * 32, '..']:
+            response = self.client.get(
+                reverse('api:upload_detail_v2', args=[upload_id])
+            )
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def create_asset(self, uri, ext, **data):
+        return self.client.post(
+            reverse('api:asset_list_v2'),
+            {
+                'name': 'image.png',
+                'uri': uri,
+                'ext': ext,
+                'mimetype': 'image',
+                'start_date': '2019-08-24T14:15:22Z',
+                'end_date': '2099-08-24T14:15:22Z',
+                'duration': 10,
+                'is_enabled': True,
+                'skip_asset_check': True,
+                **data,
+            },
+            format='json',
+        )
+
+    @mock.patch('api.views.v2.notify_playlist_changed')
+    def test_asset_gets_checksum(self, notify_mock):
+        upload_id = self.create_upload(filename='image.png')
+        self.put_chunk(upload_id, 0, 999)
+        upload = self.finalize(upload_id).data
+
+        response = self.create_asset(upload['uri'], upload['ext'])
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        asset = Asset.objects.get(asset_id=response.data['asset_id'])
+        self.assertEqual(asset.md5, upload['md5'])
+        self.assertTrue(asset.uri.endswith('.png'))
+
+    @mock.patch('api.views.v2.notify_playlist_changed')
+    def test_checksum_from_client_is_ignored(self, notify_mock):
+        response = self.client.post(
+            reverse('api:file_asset_v2'),
+            {'file_upload': SimpleUploadedFile('image.png', self.content)},
+        )
+
+        response = self.create_asset(
+            response.data['uri'], response.data['ext'], md5='0' * 32
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        asset = Asset.objects.get(asset_id=response.data['asset_id'])
+        self.assertIsNone(asset.md5)
+        self.assertEqual(asset.processing_state, ProcessingState.QUEUED)
+
+    def test_file_asset_writes_at_offset(self):
+        url = reverse('api:file_asset_v2')
+        uploads = [
+            SimpleUploadedFile('clip.mp4', self.content[:600]),
+            SimpleUploadedFile('clip.mp4', self.content[600:]),
+        ]
+
+        self.client.post(
+            url,
+            {'file_upload': uploads[0]},
+            HTTP_CONTENT_RANGE='bytes 0-599/1000',
+        )
+        response = self.client.post(
+            url,
+            {'file_upload': uploads[1]},
+            HTTP_CONTENT_RANGE='bytes 600-999/1000',
+        )
+
+        with open(response.data['uri'], 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_file_asset_rejects_chunk_past_offset(self):
+        response = self.client.post(
+            reverse('api:file_asset_v2'),
+            {'file_upload': SimpleUploadedFile('clip.mp4', self.content)},
+            HTTP_CONTENT_RANGE='bytes 600-999/1000',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(os.listdir(settings['assetdir']), [])
+
+
+class BackupViewV2Test(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    @mock.patch('api.views.v2.backup_helper.get_latest_backup')
+    @mock.patch('api.views.v2.create_backup')
+    def test_post_starts_task(self, create_backup_mock, latest_mock):
+        create_backup_mock.apply_async.return_value = mock.Mock(
+            id='task-id', state='PENDING'
+        )
+        latest_mock.return_value = 'anthias-backup-base.tar'
+
+        response = self.client.post(
+            reverse('api:backup_v2'), {'incremental': True}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['task_id'], 'task-id')
+        create_backup_mock.apply_async.assert_called_once_with(
+            kwargs={
+                'name': settings['player_name'],
+                'base': 'anthias-backup-base.tar',
+            }
+        )
+
+    @mock.patch('api.views.v2.AsyncResult')
+    def test_status_reports_progress(self, async_result_mock):
+        async_result_mock.return_value = mock.Mock(
+            state='PROGRESS', info={'done': 10, 'total': 40}
+        )
+
+        response = self.client.get(
+            reverse('api:backup_status_v2', args=['task-id'])
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'PROGRESS')
+        self.assertEqual(response.data['done'], 10)
+        self.assertEqual(response.data['total'], 40)
+
+    @mock.patch('api.views.v2.AsyncResult')
+    def test_status_reports_filename(self, async_result_mock):
+        async_result_mock.return_value = mock.Mock(
+            state='SUCCESS',
+            result='anthias-backup.tar',
+            **{'successful.return_value': True},
+        )
+
+        response = self.client.get(
+            reverse('api:backup_status_v2', args=['task-id'])
+        )
+
+        self.assertEqual(response.data['filename'], 'anthias-backup.tar')
+
+    @mock.patch('api.views.v2.backup_helper.iter_backup')
+    def test_download_streams_archive(self, iter_backup_mock):
+        iter_backup_mock.return_value = iter([b'first', b'second'])
+
+        response = self.client.get(reverse('api:backup_download_v2'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-tar')
+        self.assertEqual(b''.join(response.streaming_content), b'firstsecond')
+        iter_backup_mock.assert_called_once_with(mock.ANY, None)
+
+
+class RecoverViewV2Test(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        home = tempfile.TemporaryDirectory()
+        self.addCleanup(home.cleanup)
+        patcher = mock.patch.dict(os.environ, {'HOME': home.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @mock.patch('api.views.v2.start_recovery')
+    def test_post_starts_recovery(self, start_mock):
+        start_mock.return_value = mock.Mock(id='task-id', state='PENDING')
+
+        response = self.client.post(
+            reverse('api:recover_v2'),
+            {'backup_upload': SimpleUploadedFile('backup.tar', b'archive')},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['task_id'], 'task-id')
+        (location,) = start_mock.call_args.args
+        with open(location, 'rb') as f:
+            self.assertEqual(f.read(), b'archive')
+
+    @mock.patch('api.views.v2.start_recovery', return_value=None)
+    def test_post_conflicts_with_running_recovery(self, start_mock):
+        response = self.client.post(
+            reverse('api:recover_v2'),
+            {'backup_upload': SimpleUploadedFile('backup.tar', b'archive')},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        (location,) = start_mock.call_args.args
+        self.assertFalse(os.path.exists(location))
+
+    @mock.patch('api.views.v2.AsyncResult')
+    def test_status(self, async_result_mock):
+        async_result_mock.return_value = mock.Mock(
+            state='PROGRESS', info={'done': 10, 'total': 40}
+        )
+
+        response = self.client.get(
+            reverse('api:recover_status_v2', args=['task-id'])
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['done'], 10)
+
+    @mock.patch('api.views.v2.AsyncResult')
+    def test_status_reports_error(self, async_result_mock):
+        async_result_mock.return_value = mock.Mock(
+            state='FAILURE',
+            result=BackupError('Archive is wrong.'),
+        )
+
+        response = self.client.get(
+            reverse('api:recover_status_v2', args=['task-id'])
+        )
+
+        self.assertEqual(response.data['status'], 'FAILURE')
+        self.assertEqual(response.data['error'], 'Archive is wrong.')
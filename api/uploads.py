@@ -0,0 +1,223 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import uuid
+from glob import glob
+from mimetypes import guess_extension, guess_type
+from os import path
+from time import time
+
+from redis import RedisError
+from rest_framework import status
+
+from lib.redis_client import connect_to_redis
+from settings import settings
+
+UPLOAD_DIR = '.uploads'
+# Request bodies are copied to disk through a buffer of this size, so
+# memory use doesn't depend on the chunk size clients pick.
+UPLOAD_BUFFER_SIZE = 1024 * 1024
+# Sessions that haven't been written to for this long are discarded.
+UPLOAD_SESSION_MAX_AGE = 24 * 60 * 60
+
+UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+# The MD5s of finalized uploads, by path, until an asset is made of them.
+UPLOAD_MD5_KEY = 'upload:md5:{}'
+
+r = connect_to_redis()
+
+
+class UploadError(Exception):
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def get_upload_dir():
+    return path.join(settings['assetdir'], UPLOAD_DIR)
+
+
+def get_file_type(filename):
+    file_type = guess_type(filename)[0]
+
+    if not file_type or file_type.split('/')[0] not in ['image', 'video']:
+        raise UploadError('Invalid file type.')
+
+    return file_type
+
+
+def get_upload_md5(uri):
+    """
+    Returns the MD5 `UploadSession.finalize` took of the file at `uri`,
+    if it's still known. Checksums sent by clients aren't trusted, since
+    renditions are stored by MD5.
+    """
+    try:
+        return r.get(UPLOAD_MD5_KEY.format(uri))
+    except RedisError as error:
+        logging.warning('Could not get the MD5 of %s: %s', uri, error)
+        return None
+
+
+def remove_stale_sessions():
+    deadline = time() - UPLOAD_SESSION_MAX_AGE
+
+    for meta_path in glob(path.join(get_upload_dir(), '*.json')):
+        part_path = f'{path.splitext(meta_path)[0]}.part'
+        try:
+            if path.getmtime(part_path) > deadline:
+                continue
+        except OSError:
+            pass
+
+        for file_path in (meta_path, part_path):
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+        logging.info('Discarded stale upload %s', meta_path)
+
+
+class UploadSession(object):
+    """
+    A resumable upload. The file is received in chunks into
+    `<assetdir>/.uploads/<upload_id>.part`, which is only moved next to
+    the other assets once it's complete and its checksum matches.
+
+    Chunks must start at or before the current offset, so the bytes
+    received so far are always contiguous and a client that lost its
+    connection can ask for the offset and carry on from there.
+    """
+
+    def __init__(self, upload_id, filename, size):
+        self.upload_id = upload_id
+        self.filename = filename
+        self.size = size
+
+    @property
+    def part_path(self):
+        return path.join(get_upload_dir(), f'{self.upload_id}.part')
+
+    @property
+    def meta_path(self):
+        return path.join(get_upload_dir(), f'{self.upload_id}.json')
+
+    @property
+    def offset(self):
+        return path.getsize(self.part_path)
+
+    def to_dict(self):
+        return {
+            'upload_id': self.upload_id,
+            'filename': self.filename,
+            'size': self.size,
+            'offset': self.offset,
+        }
+
+    def get_extension(self):
+        return guess_extension(get_file_type(self.filename))
+
+    @classmethod
+    def create(cls, filename, size):
+        get_file_type(filename)
+
+        upload_dir = get_upload_dir()
+        os.makedirs(upload_dir, exist_ok=True)
+        remove_stale_sessions()
+
+        stats = os.statvfs(upload_dir)
+        if size > stats.f_bavail * stats.f_frsize:
+            raise UploadError(
+                'Not enough disk space.',
+                status.HTTP_507_INSUFFICIENT_STORAGE,
+            )
+
+        session = cls(uuid.uuid4().hex, filename, size)
+        open(session.part_path, 'wb').close()
+        with open(session.meta_path, 'w') as f:
+            json.dump({'filename': filename, 'size': size}, f)
+
+        return session
+
+    @classmethod
+    def get(cls, upload_id):
+        if UPLOAD_ID_RE.match(upload_id):
+            meta_path = path.join(get_upload_dir(), f'{upload_id}.json')
+            try:
+                with open(meta_path) as f:
+                    meta = json.load(f)
+                return cls(upload_id, meta['filename'], meta['size'])
+            except (OSError, ValueError, KeyError):
+                pass
+
+        raise UploadError('Upload not found.', status.HTTP_404_NOT_FOUND)
+
+    def write(self, stream, offset, length):
+        """
+        Copies `length` bytes from `stream` to `offset`. Whatever arrived
+        before the stream ended is kept. Returns the new offset.
+        """
+        if offset > self.offset:
+            raise UploadError(
+                f'Chunk starts past the current offset ({self.offset}).',
+                status.HTTP_409_CONFLICT,
+            )
+        if offset + length > self.size:
+            raise UploadError('Chunk extends past the end of the file.')
+
+        with open(self.part_path, 'r+b') as f:
+            f.seek(offset)
+            remaining = length
+            while remaining:
+                chunk = stream.read(min(UPLOAD_BUFFER_SIZE, remaining))
+                if not chunk:
+                    break
+                f.write(chunk)
+                remaining -= len(chunk)
+
+        return self.offset
+
+    def finalize(self, md5=None):
+        """
+        Checks the upload against `md5`, if given, and moves it to the
+        asset directory. Returns the new path and the MD5 of the file.
+        """
+        if self.offset != self.size:
+            raise UploadError(
+                f'Upload is incomplete ({self.offset} of {self.size} bytes).',
+                status.HTTP_409_CONFLICT,
+            )
+
+        digest = hashlib.md5()
+        with open(self.part_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(UPLOAD_BUFFER_SIZE), b''):
+                digest.update(chunk)
+        digest = digest.hexdigest()
+
+        if md5 and md5.lower() != digest:
+            self.delete()
+            raise UploadError('Checksum mismatch, the upload was discarded.')
+
+        # Same directory tree, so this is an atomic rename.
+        uri = path.join(settings['assetdir'], f'{self.upload_id}.tmp')
+        os.replace(self.part_path, uri)
+        os.remove(self.meta_path)
+
+        try:
+            r.set(
+                UPLOAD_MD5_KEY.format(uri), digest, ex=UPLOAD_SESSION_MAX_AGE
+            )
+        except RedisError as error:
+            # The asset will be hashed again when it's ingested.
+            logging.warning('Could not keep the MD5 of %s: %s', uri, error)
+
+        return uri, digest
+
+    def delete(self):
+        for file_path in (self.part_path, self.meta_path):
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
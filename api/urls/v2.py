@@ -1,10 +1,14 @@
 from django.urls import path
 
 from api.views.v2 import (
+    AssetBatchViewV2,
+    AssetChangesViewV2,
     AssetContentViewV2,
     AssetListViewV2,
     AssetsControlViewV2,
     AssetViewV2,
+    BackupDownloadViewV2,
+    BackupStatusViewV2,
     BackupViewV2,
     DeviceSettingsViewV2,
     FileAssetViewV2,
@@ -12,8 +16,12 @@ from api.views.v2 import (
     IntegrationsViewV2,
     PlaylistOrderViewV2,
     RebootViewV2,
+    RecoverStatusViewV2,
     RecoverViewV2,
     ShutdownViewV2,
+    UploadFinalizeViewV2,
+    UploadListViewV2,
+    UploadViewV2,
 )
 
 
@@ -25,6 +33,16 @@ def get_url_patterns():
             PlaylistOrderViewV2.as_view(),
             name='playlist_order_v2',
         ),
+        path(
+            'v2/assets/batch',
+            AssetBatchViewV2.as_view(),
+            name='asset_batch_v2',
+        ),
+        path(
+            'v2/assets/changes',
+            AssetChangesViewV2.as_view(),
+            name='asset_changes_v2',
+        ),
         path(
             'v2/assets/control/<str:command>',
             AssetsControlViewV2.as_view(),
@@ -36,10 +54,36 @@ def get_url_patterns():
             name='asset_detail_v2',
         ),
         path('v2/backup', BackupViewV2.as_view(), name='backup_v2'),
+        path(
+            'v2/backup/download',
+            BackupDownloadViewV2.as_view(),
+            name='backup_download_v2',
+        ),
+        path(
+            'v2/backup/<str:task_id>',
+            BackupStatusViewV2.as_view(),
+            name='backup_status_v2',
+        ),
         path('v2/recover', RecoverViewV2.as_view(), name='recover_v2'),
+        path(
+            'v2/recover/<str:task_id>',
+            RecoverStatusViewV2.as_view(),
+            name='recover_status_v2',
+        ),
         path('v2/reboot', RebootViewV2.as_view(), name='reboot_v2'),
         path('v2/shutdown', ShutdownViewV2.as_view(), name='shutdown_v2'),
         path('v2/file_asset', FileAssetViewV2.as_view(), name='file_asset_v2'),
+        path('v2/uploads', UploadListViewV2.as_view(), name='upload_list_v2'),
+        path(
+            'v2/uploads/<str:upload_id>',
+            UploadViewV2.as_view(),
+            name='upload_detail_v2',
+        ),
+        path(
+            'v2/uploads/<str:upload_id>/finalize',
+            UploadFinalizeViewV2.as_view(),
+            name='upload_finalize_v2',
+        ),
         path(
             'v2/assets/<str:asset_id>/content',
             AssetContentViewV2.as_view(),
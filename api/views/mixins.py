@@ -1,8 +1,9 @@
+import shutil
 import uuid
 from base64 import b64encode
 from inspect import cleandoc
 from mimetypes import guess_extension, guess_type
-from os import path, remove, statvfs
+from os import getenv, makedirs, path, remove, statvfs
 
 from drf_spectacular.utils import OpenApiParameter, OpenApiTypes, extend_schema
 from hurry.filesize import size
@@ -11,22 +12,32 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from hive_app.models import Asset
-from api.helpers import save_active_assets_ordering
+from api.helpers import (
+    get_snapshot,
+    notify_playlist_changed,
+    save_active_assets_ordering,
+)
 from api.serializers.mixins import (
     BackupViewSerializerMixin,
     PlaylistOrderSerializerMixin,
     RebootViewSerializerMixin,
     ShutdownViewSerializerMixin,
 )
+from api.streaming import stream_file
 from celery_tasks import reboot_anthias, shutdown_anthias
 from lib import backup_helper, diagnostics
 from lib.auth import authorized
 from lib.github import is_up_to_date
+from lib.renditions import remove_renditions
 from lib.utils import connect_to_redis
 from settings import ZmqPublisher, settings
 
 r = connect_to_redis()
 
+# Larger files are only available through `?download=true`, base64 in
+# JSON costs several times their size in memory.
+ASSET_CONTENT_INLINE_MAX_BYTES = 1024 * 1024
+
 
 class DeleteAssetViewMixin:
     @extend_schema(summary='Delete asset')
@@ -39,8 +50,10 @@ class DeleteAssetViewMixin:
                 remove(asset.uri)
         except OSError:
             pass
+        remove_renditions(asset_id)
 
         asset.delete()
+        notify_playlist_changed([asset_id])
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -60,7 +73,7 @@ class BackupViewMixin(APIView):
         responses={
             201: {
                 'type': 'string',
-                'example': 'anthias-backup-2021-09-16T15-00-00.tar.gz',
+                'example': 'anthias-backup-2021-09-16T15-00-00.tar',
                 'description': 'Backup file name',
             }
         },
@@ -72,11 +85,34 @@ class BackupViewMixin(APIView):
 
 
 class RecoverViewMixin(APIView):
+    def save_upload(self, file_upload):
+        """
+        Moves the uploaded backup out of the way of the request, in chunks
+        rather than all at once, and returns where it went.
+        """
+        filename = file_upload.name
+        if guess_type(filename)[0] != 'application/x-tar':
+            raise Exception('Incorrect file extension.')
+
+        directory = path.join(getenv('HOME'), backup_helper.static_dir)
+        makedirs(directory, exist_ok=True)
+        location = path.join(directory, f'{uuid.uuid4().hex}.part')
+
+        if hasattr(file_upload, 'temporary_file_path'):
+            # Large uploads are on disk already.
+            shutil.move(file_upload.temporary_file_path(), location)
+        else:
+            with open(location, 'wb') as f:
+                for chunk in file_upload.chunks():
+                    f.write(chunk)
+
+        return location
+
     @extend_schema(
         summary='Recover from backup',
         description=cleandoc("""
         Recover data from a backup file. The backup file must be
-        a `.tar.gz` file.
+        a `.tar` or `.tar.gz` file.
         """),
         request={
             'multipart/form-data': {
@@ -96,24 +132,21 @@ class RecoverViewMixin(APIView):
     @authorized
     def post(self, request):
         publisher = ZmqPublisher.get_instance()
-        file_upload = request.data.get('backup_upload')
-        filename = file_upload.name
+        location = self.save_upload(request.data.get('backup_upload'))
 
-        if guess_type(filename)[0] != 'application/x-tar':
-            raise Exception('Incorrect file extension.')
         try:
-            publisher.send_to_viewer('stop')
-            location = path.join('static', filename)
-
-            with open(location, 'wb') as f:
-                f.write(file_upload.read())
-
-            backup_helper.recover(location)
+            staged = backup_helper.stage_backup(location)
+        finally:
+            remove(location)
 
-            return Response('Recovery successful.')
+        publisher.send_to_viewer('stop')
+        try:
+            backup_helper.apply_backup(staged)
         finally:
             publisher.send_to_viewer('play')
 
+        return Response('Recovery successful.')
+
 
 class RebootViewMixin(APIView):
     serializer_class = RebootViewSerializerMixin
@@ -168,23 +201,32 @@ class FileAssetViewMixin(APIView):
         if file_type.split('/')[0] not in ['image', 'video']:
             raise Exception('Invalid file type.')
 
-        file_path = (
-            path.join(
-                settings['assetdir'],
-                uuid.uuid5(uuid.NAMESPACE_URL, filename).hex,
-            )
-            + '.tmp'
-        )
-
         if 'Content-Range' in request.headers:
+            # Chunks of the same file have to end up in the same place, so
+            # the name is derived from the filename. Use `/api/v2/uploads`
+            # to upload files with the same name in parallel.
+            file_id = uuid.uuid5(uuid.NAMESPACE_URL, filename).hex
             range_str = request.headers['Content-Range']
             start_bytes = int(range_str.split(' ')[1].split('-')[0])
-            with open(file_path, 'ab') as f:
-                f.seek(start_bytes)
-                f.write(file_upload.read())
         else:
-            with open(file_path, 'wb') as f:
-                f.write(file_upload.read())
+            file_id = uuid.uuid4().hex
+            start_bytes = 0
+
+        file_path = path.join(settings['assetdir'], file_id) + '.tmp'
+
+        offset = path.getsize(file_path) if path.exists(file_path) else 0
+        if start_bytes > offset:
+            # The earlier chunks are gone, the upload has to start over.
+            return Response(
+                {'error': f'Chunk starts past the current offset ({offset}).'},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        # Append mode ignores `seek()`, so open for update instead.
+        with open(file_path, 'r+b' if start_bytes else 'wb') as f:
+            f.seek(start_bytes)
+            for chunk in file_upload.chunks():
+                f.write(chunk)
 
         return Response({'uri': file_path, 'ext': guess_extension(file_type)})
 
@@ -196,9 +238,17 @@ class AssetContentViewMixin(APIView):
         The content of the asset.
         `type` can either be `file` or `url`.
 
-        In case of a file, the fields `mimetype`, `filename`, and `content`
-        will be present. In case of a URL, the field `url` will be present.
+        In case of a file, the fields `mimetype`, `filename`, `size` and
+        `download_url` will be present, as well as the base64-encoded
+        `content` for files of up to 1 MB. In case of a URL, the field
+        `url` will be present.
+
+        With `download=true` the file itself is sent as an attachment.
+        `Range` requests are supported, so downloads can be resumed.
         """),
+        parameters=[
+            OpenApiParameter('download', OpenApiTypes.BOOL),
+        ],
         responses={
             200: {
                 'type': 'object',
@@ -207,6 +257,8 @@ class AssetContentViewMixin(APIView):
                     'url': {'type': 'string'},
                     'filename': {'type': 'string'},
                     'mimetype': {'type': 'string'},
+                    'size': {'type': 'integer'},
+                    'download_url': {'type': 'string'},
                     'content': {'type': 'string'},
                 },
             }
@@ -219,19 +271,25 @@ class AssetContentViewMixin(APIView):
         if path.isfile(asset.uri):
             filename = asset.name
 
-            with open(asset.uri, 'rb') as f:
-                content = f.read()
-
             mimetype = guess_type(filename)[0]
             if not mimetype:
                 mimetype = 'application/octet-stream'
 
+            if request.query_params.get('download') in ('true', '1'):
+                return stream_file(request, asset.uri, filename, mimetype)
+
+            file_size = path.getsize(asset.uri)
             result = {
                 'type': 'file',
                 'filename': filename,
-                'content': b64encode(content).decode(),
                 'mimetype': mimetype,
+                'size': file_size,
+                'download_url': f'{request.path}?download=true',
             }
+
+            if file_size <= ASSET_CONTENT_INLINE_MAX_BYTES:
+                with open(asset.uri, 'rb') as f:
+                    result['content'] = b64encode(f.read()).decode()
         else:
             result = {'type': 'url', 'url': asset.uri}
 
@@ -248,6 +306,7 @@ class PlaylistOrderViewMixin(APIView):
     def post(self, request):
         asset_ids = request.data.get('ids', '').split(',')
         save_active_assets_ordering(asset_ids)
+        notify_playlist_changed(asset_ids)
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -284,8 +343,34 @@ class AssetsControlViewMixin(APIView):
 
 
 class InfoViewMixin(APIView):
+    snapshot_name = 'info'
+
+    def collect(self):
+        # Calculate disk space
+        slash = statvfs('/')
+        free_space = size(slash.f_bavail * slash.f_frsize)
+
+        return {
+            'loadavg': diagnostics.get_load_avg()['15 min'],
+            'free_space': free_space,
+            'up_to_date': is_up_to_date(),
+        }
+
     @extend_schema(
         summary='Get system information',
+        description=cleandoc("""
+        Everything but `display_power` comes from a snapshot that is
+        collected again in the background once `stale_after` has
+        passed. Pass `refresh=1` to collect it right away.
+        """),
+        parameters=[
+            OpenApiParameter(
+                name='refresh',
+                location=OpenApiParameter.QUERY,
+                type=OpenApiTypes.BOOL,
+                required=False,
+            )
+        ],
         responses={
             200: {
                 'type': 'object',
@@ -295,6 +380,8 @@ class InfoViewMixin(APIView):
                     'free_space': {'type': 'string'},
                     'display_power': {'type': 'string'},
                     'up_to_date': {'type': 'boolean'},
+                    'collected_at': {'type': 'string', 'format': 'date-time'},
+                    'stale_after': {'type': 'string', 'format': 'date-time'},
                 },
                 'example': {
                     'viewlog': 'Not yet implemented',
@@ -302,25 +389,26 @@ class InfoViewMixin(APIView):
                     'free_space': '10G',
                     'display_power': 'on',
                     'up_to_date': True,
+                    'collected_at': '2024-01-01T12:00:00+00:00',
+                    'stale_after': '2024-01-01T12:00:30+00:00',
                 },
             }
         },
     )
     @authorized
     def get(self, request):
-        viewlog = 'Not yet implemented'
-
-        # Calculate disk space
-        slash = statvfs('/')
-        free_space = size(slash.f_bavail * slash.f_frsize)
-        display_power = r.get('display_power')
+        snapshot = get_snapshot(
+            self.snapshot_name,
+            self.collect,
+            refresh=request.query_params.get('refresh') in ('true', '1'),
+        )
 
         return Response(
             {
-                'viewlog': viewlog,
-                'loadavg': diagnostics.get_load_avg()['15 min'],
-                'free_space': free_space,
-                'display_power': display_power,
-                'up_to_date': is_up_to_date(),
+                'viewlog': 'Not yet implemented',
+                **snapshot['data'],
+                'display_power': r.get('display_power'),
+                'collected_at': snapshot['collected_at'],
+                'stale_after': snapshot['stale_after'],
             }
         )
@@ -1,3 +1,5 @@
+import uuid
+
 from drf_spectacular.utils import (
     OpenApiExample,
     OpenApiRequest,
@@ -11,7 +13,9 @@ from rest_framework.views import APIView
 from hive_app.models import Asset
 from api.helpers import (
     AssetCreationError,
+    notify_playlist_changed,
     parse_request,
+    queue_ingestion,
 )
 from api.serializers import (
     AssetSerializer,
@@ -101,6 +105,7 @@ class AssetViewV1(APIView, DeleteAssetViewMixin):
                 serializer.errors, status=status.HTTP_400_BAD_REQUEST
             )
 
+        notify_playlist_changed([asset.asset_id])
         asset.refresh_from_db()
         return Response(AssetSerializer(asset).data)
 
@@ -138,6 +143,8 @@ class AssetListViewV1(APIView):
             return Response(error.errors, status=status.HTTP_400_BAD_REQUEST)
 
         asset = Asset.objects.create(**serializer.data)
+        queue_ingestion([asset])
+        notify_playlist_changed([asset.asset_id])
 
         return Response(
             AssetSerializer(asset).data, status=status.HTTP_201_CREATED
@@ -187,9 +194,10 @@ class ViewerCurrentAssetViewV1(APIView):
         collector = ZmqCollector.get_instance()
 
         publisher = ZmqPublisher.get_instance()
-        publisher.send_to_viewer('current_asset_id')
+        request_id = uuid.uuid4().hex
+        publisher.send_to_viewer(f'current_asset_id&{request_id}')
 
-        collector_result = collector.recv_json(2000)
+        collector_result = collector.recv_json(2000, request_id)
         current_asset_id = collector_result.get('current_asset_id')
 
         if not current_asset_id:
@@ -4,7 +4,12 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from hive_app.models import Asset
-from api.helpers import AssetCreationError, parse_request
+from api.helpers import (
+    AssetCreationError,
+    notify_playlist_changed,
+    parse_request,
+    queue_ingestion,
+)
 from api.serializers import (
     AssetSerializer,
     UpdateAssetSerializer,
@@ -42,6 +47,8 @@ class AssetListViewV1_1(APIView):
             return Response(error.errors, status=status.HTTP_400_BAD_REQUEST)
 
         asset = Asset.objects.create(**serializer.data)
+        queue_ingestion([asset])
+        notify_playlist_changed([asset.asset_id])
 
         return Response(
             AssetSerializer(asset).data, status=status.HTTP_201_CREATED
@@ -79,5 +86,6 @@ class AssetViewV1_1(APIView, DeleteAssetViewMixin):
                 serializer.errors, status=status.HTTP_400_BAD_REQUEST
             )
 
+        notify_playlist_changed([asset.asset_id])
         asset.refresh_from_db()
         return Response(AssetSerializer(asset).data)
@@ -7,6 +7,8 @@ from hive_app.models import Asset
 from api.helpers import (
     AssetCreationError,
     get_active_asset_ids,
+    notify_playlist_changed,
+    queue_ingestion,
     save_active_assets_ordering,
 )
 from api.serializers import (
@@ -49,11 +51,14 @@ class AssetListViewV1_2(APIView):
 
         active_asset_ids = get_active_asset_ids()
         asset = Asset.objects.create(**serializer.data)
+        queue_ingestion([asset])
 
         if asset.is_active():
             active_asset_ids.insert(asset.play_order, asset.asset_id)
 
         save_active_assets_ordering(active_asset_ids)
+        # Re-ordering may have shifted every active asset.
+        notify_playlist_changed([asset.asset_id, *active_asset_ids])
         asset.refresh_from_db()
 
         return Response(
@@ -98,6 +103,8 @@ class AssetViewV1_2(APIView, DeleteAssetViewMixin):
             active_asset_ids.insert(asset.play_order, asset.asset_id)
 
         save_active_assets_ordering(active_asset_ids)
+        # Re-ordering may have shifted every active asset.
+        notify_playlist_changed([asset.asset_id, *active_asset_ids])
         asset.refresh_from_db()
 
         return Response(AssetSerializer(asset).data)
@@ -1,32 +1,58 @@
 import hashlib
 import ipaddress
 import logging
+import re
 from datetime import timedelta
-from os import getenv, statvfs
+from inspect import cleandoc
+from io import BytesIO
+from os import getenv, remove, rename
 from platform import machine
 
 import psutil
-from drf_spectacular.utils import extend_schema
-from hurry.filesize import size
+from celery.result import AsyncResult
+from drf_spectacular.utils import OpenApiParameter, OpenApiTypes, extend_schema
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from hive_app.helpers import add_default_assets, remove_default_assets
-from hive_app.models import Asset
+from hive_app.models import Asset, AssetChange
 from api.helpers import (
     AssetCreationError,
+    annotate_active,
     get_active_asset_ids,
+    get_active_filter,
+    get_snapshot,
+    make_etag,
+    not_modified,
+    notify_playlist_changed,
+    queue_ingestion,
     save_active_assets_ordering,
+    start_recovery,
 )
+from api.pagination import AssetCursorPagination
+from api.serializers import get_unique_name
 from api.serializers.v2 import (
+    AssetBatchSerializerV2,
+    AssetChangesQuerySerializerV2,
+    AssetChangesSerializerV2,
+    AssetListQuerySerializerV2,
     AssetSerializerV2,
+    BackupTaskSerializerV2,
+    CreateBackupSerializerV2,
     CreateAssetSerializerV2,
+    CreateUploadSerializerV2,
     DeviceSettingsSerializerV2,
+    FinalizeUploadSerializerV2,
     IntegrationsSerializerV2,
+    RecoveryTaskSerializerV2,
     UpdateAssetSerializerV2,
     UpdateDeviceSettingsSerializerV2,
+    UploadSerializerV2,
 )
+from api.uploads import UploadError, UploadSession
 from api.views.mixins import (
     AssetContentViewMixin,
     AssetsControlViewMixin,
@@ -39,12 +65,14 @@ from api.views.mixins import (
     RecoverViewMixin,
     ShutdownViewMixin,
 )
-from lib import device_helper, diagnostics
+from celery_tasks import celery, create_backup
+from lib import backup_helper, device_helper, diagnostics
 from lib.auth import authorized
-from lib.github import is_up_to_date
+from lib.renditions import remove_renditions
 from lib.utils import (
     connect_to_redis,
     get_node_ip,
+    get_node_ip_updated_at,
     get_node_mac_address,
     is_balena_app,
 )
@@ -52,18 +80,102 @@ from settings import ZmqPublisher, settings
 
 r = connect_to_redis()
 
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
 
 class AssetListViewV2(APIView):
     serializer_class = AssetSerializerV2
+    pagination_class = AssetCursorPagination
+
+    def get_queryset(self, params):
+        queryset = annotate_active(Asset.objects.all())
+
+        if params['active'] is not None:
+            active_filter = get_active_filter()
+            queryset = (
+                queryset.filter(active_filter)
+                if params['active']
+                else queryset.exclude(active_filter)
+            )
+        if params['enabled'] is not None:
+            queryset = queryset.filter(is_enabled=params['enabled'])
+        if params.get('mimetype'):
+            queryset = queryset.filter(mimetype__in=params['mimetype'])
+        if params.get('name_prefix'):
+            queryset = queryset.filter(name__startswith=params['name_prefix'])
+        if params.get('scheduled_from'):
+            queryset = queryset.filter(end_date__gt=params['scheduled_from'])
+        if params.get('scheduled_until'):
+            queryset = queryset.filter(
+                start_date__lt=params['scheduled_until']
+            )
+
+        if params.get('fields'):
+            model_fields = {field.name for field in Asset._meta.fields}
+            queryset = queryset.only(
+                'asset_id',
+                *(
+                    field
+                    for field in params['fields']
+                    if field in model_fields
+                ),
+            )
+
+        return queryset
 
     @extend_schema(
-        summary='List assets', responses={200: AssetSerializerV2(many=True)}
+        summary='List assets',
+        description=cleandoc("""
+        Without `cursor` or `limit` every matching asset is returned as a
+        list. With either, results are paginated in play order and wrapped
+        in an object with `next`, `previous` and `results`.
+
+        Responses carry an `ETag`; send it back in `If-None-Match` to get a
+        `304` while nothing has changed.
+        """),
+        parameters=[
+            AssetListQuerySerializerV2,
+            OpenApiParameter('cursor', OpenApiTypes.STR),
+            OpenApiParameter('limit', OpenApiTypes.INT),
+        ],
+        responses={200: AssetSerializerV2(many=True)},
     )
     @authorized
     def get(self, request):
-        queryset = Asset.objects.all()
-        serializer = AssetSerializerV2(queryset, many=True)
-        return Response(serializer.data)
+        query_serializer = AssetListQuerySerializerV2(
+            data=request.query_params
+        )
+        if not query_serializer.is_valid():
+            return Response(
+                query_serializer.errors, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Schedules make assets (in)active without any write, so the set
+        # of active assets is part of the ETag too.
+        etag = make_etag(
+            AssetChange.current_version(),
+            get_active_asset_ids(),
+            sorted(request.query_params.lists()),
+        )
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        params = query_serializer.validated_data
+        queryset = self.get_queryset(params)
+        fields = params.get('fields')
+
+        if 'cursor' in request.query_params or 'limit' in request.query_params:
+            paginator = self.pagination_class()
+            page = paginator.paginate_queryset(queryset, request, view=self)
+            serializer = AssetSerializerV2(page, many=True, fields=fields)
+            response = paginator.get_paginated_response(serializer.data)
+        else:
+            serializer = AssetSerializerV2(queryset, many=True, fields=fields)
+            response = Response(serializer.data)
+
+        response['ETag'] = etag
+        return response
 
     @extend_schema(
         summary='Create asset',
@@ -84,12 +196,15 @@ class AssetListViewV2(APIView):
 
         active_asset_ids = get_active_asset_ids()
         asset = Asset.objects.create(**serializer.data)
+        queue_ingestion([asset])
         asset.refresh_from_db()
 
         if asset.is_active():
             active_asset_ids.insert(asset.play_order, asset.asset_id)
 
         save_active_assets_ordering(active_asset_ids)
+        # Re-ordering may have shifted every active asset.
+        notify_playlist_changed([asset.asset_id, *active_asset_ids])
         asset.refresh_from_db()
 
         return Response(
@@ -105,8 +220,14 @@ class AssetViewV2(APIView, DeleteAssetViewMixin):
     @authorized
     def get(self, request, asset_id):
         asset = Asset.objects.get(asset_id=asset_id)
+        change = AssetChange.objects.filter(asset_id=asset_id).first()
+        etag = make_etag(change and change.id, asset.is_active())
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
         serializer = self.serializer_class(asset)
-        return Response(serializer.data)
+        return Response(serializer.data, headers={'ETag': etag})
 
     def update(self, request, asset_id, partial=False):
         asset = Asset.objects.get(asset_id=asset_id)
@@ -134,6 +255,8 @@ class AssetViewV2(APIView, DeleteAssetViewMixin):
             active_asset_ids.insert(asset.play_order, asset.asset_id)
 
         save_active_assets_ordering(active_asset_ids)
+        # Re-ordering may have shifted every active asset.
+        notify_playlist_changed([asset.asset_id, *active_asset_ids])
         asset.refresh_from_db()
 
         return Response(AssetSerializerV2(asset).data)
@@ -157,12 +280,574 @@ class AssetViewV2(APIView, DeleteAssetViewMixin):
         return self.update(request, asset_id, partial=False)
 
 
+class AssetBatchViewV2(APIView):
+    @extend_schema(
+        summary='Create, update and delete assets in bulk',
+        description=cleandoc("""
+        Apply a list of operations in a single transaction. Each operation
+        is one of:
+        * `{"op": "create", "data": {...}}` - same fields as creating an
+          asset
+        * `{"op": "patch", "asset_id": "...", "data": {...}}` - same fields
+          as updating an asset
+        * `{"op": "delete", "asset_id": "..."}`
+
+        All operations are validated before any of them is applied. If one
+        fails, nothing is changed and the response lists the errors; the
+        other operations are reported with status 424. The play order is
+        recomputed once for the whole batch.
+        """),
+        request=AssetBatchSerializerV2,
+        responses={
+            200: {
+                'type': 'object',
+                'properties': {'results': {'type': 'array'}},
+            },
+            400: {
+                'type': 'object',
+                'properties': {'results': {'type': 'array'}},
+            },
+        },
+    )
+    @authorized
+    def post(self, request):
+        serializer = AssetBatchSerializerV2(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        operations = serializer.validated_data['operations']
+        results, prepared, file_moves = self.validate_operations(operations)
+
+        if any(result['status'] >= 400 for result in results):
+            for result in results:
+                if result['status'] < 400:
+                    result['status'] = status.HTTP_424_FAILED_DEPENDENCY
+            return Response(
+                {'results': results}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        changed_asset_ids, active_asset_ids, assets = self.apply_operations(
+            operations, prepared, file_moves
+        )
+
+        for result in results:
+            if result['status'] != status.HTTP_204_NO_CONTENT:
+                result['asset'] = AssetSerializerV2(
+                    assets[result['asset_id']]
+                ).data
+
+        # Re-ordering may have shifted every active asset.
+        notify_playlist_changed([*changed_asset_ids, *active_asset_ids])
+
+        return Response({'results': results})
+
+    def validate_operations(self, operations):
+        """
+        Checks every operation without side effects. Uploaded files are
+        only moved into place by `apply_operations`.
+        """
+        referenced_ids = [
+            operation['asset_id']
+            for operation in operations
+            if operation['op'] != 'create'
+        ]
+        existing_assets = Asset.objects.in_bulk(referenced_ids)
+        taken_names = set(Asset.objects.values_list('name', flat=True))
+
+        results = []
+        prepared = []
+        file_moves = []
+        seen_ids = set()
+
+        for operation in operations:
+            op = operation['op']
+            asset_id = operation.get('asset_id')
+            result = {'op': op, 'asset_id': asset_id}
+            results.append(result)
+            prepared.append(None)
+
+            if op != 'create':
+                if asset_id not in existing_assets:
+                    result['status'] = status.HTTP_404_NOT_FOUND
+                    result['errors'] = {'error': 'Asset not found.'}
+                    continue
+                if asset_id in seen_ids:
+                    result['status'] = status.HTTP_400_BAD_REQUEST
+                    result['errors'] = {
+                        'error': 'Asset appears more than once in the batch.'
+                    }
+                    continue
+                seen_ids.add(asset_id)
+
+            if op == 'delete':
+                prepared[-1] = existing_assets[asset_id]
+                result['status'] = status.HTTP_204_NO_CONTENT
+                continue
+
+            try:
+                if op == 'create':
+                    # Names are made unique below, against the rest of the
+                    # batch as well.
+                    item_serializer = CreateAssetSerializerV2(
+                        data=operation['data'], defer_file_move=True
+                    )
+                else:
+                    item_serializer = UpdateAssetSerializerV2(
+                        existing_assets[asset_id],
+                        data=operation['data'],
+                        partial=True,
+                    )
+                is_valid = item_serializer.is_valid()
+            except Exception as error:
+                result['status'] = status.HTTP_400_BAD_REQUEST
+                result['errors'] = {'error': str(error)}
+                continue
+
+            if not is_valid:
+                result['status'] = status.HTTP_400_BAD_REQUEST
+                result['errors'] = item_serializer.errors
+                continue
+
+            if op == 'create':
+                fields = dict(item_serializer.data)
+                fields['name'] = get_unique_name(fields['name'], taken_names)
+                taken_names.add(fields['name'])
+                prepared[-1] = fields
+                if item_serializer.file_move:
+                    file_moves.append(item_serializer.file_move)
+                result['asset_id'] = fields['asset_id']
+                result['status'] = status.HTTP_201_CREATED
+            else:
+                prepared[-1] = item_serializer
+                result['status'] = status.HTTP_200_OK
+
+        return results, prepared, file_moves
+
+    def apply_operations(self, operations, prepared, file_moves):
+        changed_asset_ids = []
+        deleted_assets = []
+        moved = []
+
+        try:
+            with transaction.atomic():
+                for source, destination in file_moves:
+                    rename(source, destination)
+                    moved.append((source, destination))
+
+                active_asset_ids = get_active_asset_ids()
+
+                created_assets = Asset.objects.bulk_create(
+                    [
+                        Asset(**item)
+                        for operation, item in zip(operations, prepared)
+                        if operation['op'] == 'create'
+                    ]
+                )
+                AssetChange.record(asset.asset_id for asset in created_assets)
+                queue_ingestion(created_assets)
+
+                for operation, item in zip(operations, prepared):
+                    if operation['op'] == 'patch':
+                        item.save()
+                    elif operation['op'] == 'delete':
+                        deleted_assets.append(item)
+
+                Asset.objects.filter(
+                    asset_id__in=[asset.asset_id for asset in deleted_assets]
+                ).delete()
+
+                for operation, item in zip(operations, prepared):
+                    if operation['op'] == 'create':
+                        changed_asset_ids.append(item['asset_id'])
+                    else:
+                        changed_asset_ids.append(operation['asset_id'])
+
+                assets = Asset.objects.in_bulk(changed_asset_ids)
+
+                # Replay the batch against the playlist in request order, the
+                # same way the single-asset endpoints place each asset. Patches
+                # that don't set a play_order keep their current position.
+                for operation, asset_id in zip(operations, changed_asset_ids):
+                    asset = assets.get(asset_id)
+                    is_active = asset is not None and asset.is_active()
+                    keep_position = (
+                        operation['op'] == 'patch'
+                        and 'play_order' not in operation['data']
+                        and asset_id in active_asset_ids
+                    )
+
+                    if keep_position and is_active:
+                        continue
+                    if asset_id in active_asset_ids:
+                        active_asset_ids.remove(asset_id)
+                    if is_active:
+                        active_asset_ids.insert(asset.play_order, asset_id)
+
+                save_active_assets_ordering(active_asset_ids)
+                assets = Asset.objects.in_bulk(changed_asset_ids)
+        except BaseException:
+            # Nothing was saved, so the uploads go back where they were.
+            for source, destination in moved:
+                try:
+                    rename(destination, source)
+                except OSError:
+                    pass
+            raise
+
+        for asset in deleted_assets:
+            remove_renditions(asset.asset_id)
+            try:
+                if asset.uri.startswith(settings['assetdir']):
+                    remove(asset.uri)
+            except OSError:
+                pass
+
+        return changed_asset_ids, active_asset_ids, assets
+
+
+class AssetChangesViewV2(APIView):
+    @extend_schema(
+        summary='List asset changes',
+        description=cleandoc("""
+        Lists the ids of the assets created, updated or deleted since
+        `since`, a `version` returned by an earlier call (or `0`). Fetch
+        the upserted assets and drop the deleted ones, then pass the new
+        `version` next time.
+
+        A `410` means `since` is unknown to this device, e.g. after a
+        backup was restored; fetch the full asset list instead.
+        """),
+        parameters=[AssetChangesQuerySerializerV2],
+        responses={200: AssetChangesSerializerV2},
+    )
+    @authorized
+    def get(self, request):
+        query_serializer = AssetChangesQuerySerializerV2(
+            data=request.query_params
+        )
+        if not query_serializer.is_valid():
+            return Response(
+                query_serializer.errors, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        since = query_serializer.validated_data['since']
+        version = AssetChange.current_version()
+        if since > version:
+            return Response(
+                {'error': 'Unknown version, fetch the full asset list.'},
+                status=status.HTTP_410_GONE,
+            )
+
+        changes = AssetChange.objects.filter(
+            id__gt=since, id__lte=version
+        ).values_list('asset_id', 'deleted')
+
+        return Response(
+            {
+                'version': version,
+                'upserted': [
+                    asset_id for asset_id, deleted in changes if not deleted
+                ],
+                'deleted': [
+                    asset_id for asset_id, deleted in changes if deleted
+                ],
+            }
+        )
+
+
+class UploadListViewV2(APIView):
+    @extend_schema(
+        summary='Start a resumable upload',
+        description=cleandoc("""
+        Starts an upload session for an image or video of `size` bytes.
+        Send the file in chunks with `PUT /api/v2/uploads/{upload_id}`,
+        then finalize the session to get a `uri` that can be used to
+        create an asset, like the one returned by `/api/v2/file_asset`.
+        """),
+        request=CreateUploadSerializerV2,
+        responses={201: UploadSerializerV2},
+    )
+    @authorized
+    def post(self, request):
+        serializer = CreateUploadSerializerV2(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            session = UploadSession.create(**serializer.validated_data)
+        except UploadError as error:
+            return Response({'error': str(error)}, status=error.status_code)
+
+        return Response(session.to_dict(), status=status.HTTP_201_CREATED)
+
+
+class UploadViewV2(APIView):
+    @extend_schema(
+        summary='Get upload progress',
+        description=cleandoc("""
+        `offset` is the number of bytes received so far. After a dropped
+        connection, resume the upload from there.
+        """),
+        responses={200: UploadSerializerV2},
+    )
+    @authorized
+    def get(self, request, upload_id):
+        try:
+            session = UploadSession.get(upload_id)
+        except UploadError as error:
+            return Response({'error': str(error)}, status=error.status_code)
+
+        return Response(session.to_dict())
+
+    @extend_schema(
+        summary='Upload a chunk',
+        description=cleandoc("""
+        The request body is written at the offset given by the
+        `Content-Range: bytes <first>-<last>/<size>` header. A chunk may
+        not start past the current `offset`. Without `Content-Range` the
+        body is the whole file.
+        """),
+        request={'application/octet-stream': {'format': 'binary'}},
+        responses={200: UploadSerializerV2},
+    )
+    @authorized
+    def put(self, request, upload_id):
+        try:
+            session = UploadSession.get(upload_id)
+            offset, length = self.get_range(request, session)
+            # No stream means an empty body.
+            session.write(request.stream or BytesIO(), offset, length)
+        except UploadError as error:
+            return Response({'error': str(error)}, status=error.status_code)
+
+        return Response(session.to_dict())
+
+    def get_range(self, request, session):
+        content_range = request.headers.get('Content-Range')
+        if content_range is None:
+            return 0, session.size
+
+        match = CONTENT_RANGE_RE.match(content_range)
+        if not match:
+            raise UploadError('Invalid Content-Range header.')
+
+        first, last, size = (int(value) for value in match.groups())
+        if size != session.size or first > last:
+            raise UploadError('Content-Range does not match the upload.')
+
+        return first, last - first + 1
+
+    @extend_schema(summary='Cancel an upload')
+    @authorized
+    def delete(self, request, upload_id):
+        try:
+            UploadSession.get(upload_id).delete()
+        except UploadError as error:
+            return Response({'error': str(error)}, status=error.status_code)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadFinalizeViewV2(APIView):
+    @extend_schema(
+        summary='Finalize an upload',
+        description=cleandoc("""
+        Completes the upload. If `md5` is given and the received file
+        doesn't match, the upload is discarded. Pass the returned `uri`
+        and `ext` on when creating the asset, which then gets the MD5
+        without the file being read again.
+        """),
+        request=FinalizeUploadSerializerV2,
+        responses={
+            200: {
+                'type': 'object',
+                'properties': {
+                    'uri': {'type': 'string'},
+                    'ext': {'type': 'string'},
+                    'md5': {'type': 'string'},
+                },
+            }
+        },
+    )
+    @authorized
+    def post(self, request, upload_id):
+        serializer = FinalizeUploadSerializerV2(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            session = UploadSession.get(upload_id)
+            ext = session.get_extension()
+            uri, md5 = session.finalize(serializer.validated_data.get('md5'))
+        except UploadError as error:
+            return Response({'error': str(error)}, status=error.status_code)
+
+        return Response({'uri': uri, 'ext': ext, 'md5': md5})
+
+
 class BackupViewV2(BackupViewMixin):
-    pass
+    @extend_schema(
+        summary='Create backup',
+        description=cleandoc("""
+        Starts a backup of the settings, the assets and the asset
+        metadata, and returns the ID of the task making it. Poll
+        `/api/v2/backup/{task_id}` for its progress and, once it's done,
+        the name of the file. With `incremental`, only the assets that
+        changed since the last backup are included.
+        """),
+        request=CreateBackupSerializerV2,
+        responses={202: BackupTaskSerializerV2},
+    )
+    @authorized
+    def post(self, request):
+        serializer = CreateBackupSerializerV2(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        base = (
+            backup_helper.get_latest_backup()
+            if serializer.validated_data['incremental']
+            else None
+        )
+        task = create_backup.apply_async(
+            kwargs={'name': settings['player_name'], 'base': base}
+        )
+        return Response(
+            {'task_id': task.id, 'status': task.state},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+def get_task_state(task_id):
+    """The state of a backup or recovery task, with its progress."""
+    result = AsyncResult(task_id, app=celery)
+    data = {'task_id': task_id, 'status': result.state}
+
+    if result.state == 'PROGRESS':
+        data.update(result.info)
+    elif result.state == 'FAILURE':
+        data['error'] = str(result.result)
+
+    return data, result
+
+
+class BackupStatusViewV2(APIView):
+    @extend_schema(
+        summary='Get backup progress',
+        description=cleandoc("""
+        `done` and `total` are the bytes archived so far and in all,
+        `filename` is set once the backup is done.
+        """),
+        responses={200: BackupTaskSerializerV2},
+    )
+    @authorized
+    def get(self, request, task_id):
+        data, result = get_task_state(task_id)
+        if result.state == 'SUCCESS':
+            data['filename'] = result.result
+
+        return Response(data)
+
+
+class BackupDownloadViewV2(APIView):
+    @extend_schema(
+        summary='Download backup',
+        description=cleandoc("""
+        Sends a backup as it's made, without storing it on the device
+        first. With `incremental=true`, only the assets that changed
+        since the last backup kept on the device are included. Downloads
+        aren't kept, so later backups can't be based on them.
+        """),
+        parameters=[
+            OpenApiParameter(
+                name='incremental',
+                type=OpenApiTypes.BOOL,
+                location=OpenApiParameter.QUERY,
+            ),
+        ],
+        responses={
+            (200, 'application/x-tar'): OpenApiTypes.BINARY,
+        },
+    )
+    @authorized
+    def get(self, request):
+        incremental = request.query_params.get('incremental') in (
+            'true',
+            '1',
+        )
+        base = backup_helper.get_latest_backup() if incremental else None
+        archive_name = backup_helper.get_archive_name(settings['player_name'])
+
+        response = StreamingHttpResponse(
+            backup_helper.iter_backup(archive_name, base),
+            content_type='application/x-tar',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{archive_name}"'
+        )
+        # Stops nginx from buffering the archive to disk.
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
 
 class RecoverViewV2(RecoverViewMixin):
-    pass
+    @extend_schema(
+        summary='Recover from backup',
+        description=cleandoc("""
+        Uploads a `.tar` or `.tar.gz` backup and returns the ID of the
+        task restoring it. Poll `/api/v2/recover/{task_id}` for its
+        progress. The viewer keeps playing until the backup has been
+        checked, and only pauses while it's swapped in.
+        """),
+        request={
+            'multipart/form-data': {
+                'type': 'object',
+                'properties': {
+                    'backup_upload': {'type': 'string', 'format': 'binary'}
+                },
+            }
+        },
+        responses={202: RecoveryTaskSerializerV2},
+    )
+    @authorized
+    def post(self, request):
+        location = self.save_upload(request.data.get('backup_upload'))
+
+        task = start_recovery(location)
+        if task is None:
+            remove(location)
+            return Response(
+                {'error': 'A backup is already being restored.'},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        return Response(
+            {'task_id': task.id, 'status': task.state},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class RecoverStatusViewV2(APIView):
+    @extend_schema(
+        summary='Get recovery progress',
+        description=cleandoc("""
+        `done` and `total` are the bytes of the backup read so far and in
+        all. `status` is `SUCCESS` once the backup has been restored.
+        """),
+        responses={200: RecoveryTaskSerializerV2},
+    )
+    @authorized
+    def get(self, request, task_id):
+        data, _ = get_task_state(task_id)
+        return Response(data)
 
 
 class RebootViewV2(RebootViewMixin):
@@ -203,35 +888,41 @@ class DeviceSettingsViewV2(APIView):
             logging.error(f'Failed to reload settings: {str(e)}')
             # Continue with existing settings if reload fails
 
-        return Response(
-            {
-                'player_name': settings['player_name'],
-                'audio_output': settings['audio_output'],
-                'default_duration': int(settings['default_duration']),
-                'default_streaming_duration': int(
-                    settings['default_streaming_duration']
-                ),
-                'date_format': settings['date_format'],
-                'auth_backend': settings['auth_backend'],
-                'show_splash': settings['show_splash'],
-                'default_assets': settings['default_assets'],
-                'shuffle_playlist': settings['shuffle_playlist'],
-                'use_24_hour_clock': settings['use_24_hour_clock'],
-                'debug_logging': settings['debug_logging'],
-                'username': (
-                    settings['user']
-                    if settings['auth_backend'] == 'auth_basic'
-                    else ''
-                ),
-            }
-        )
+        data = {
+            'player_name': settings['player_name'],
+            'audio_output': settings['audio_output'],
+            'default_duration': int(settings['default_duration']),
+            'default_streaming_duration': int(
+                settings['default_streaming_duration']
+            ),
+            'date_format': settings['date_format'],
+            'auth_backend': settings['auth_backend'],
+            'show_splash': settings['show_splash'],
+            'default_assets': settings['default_assets'],
+            'shuffle_playlist': settings['shuffle_playlist'],
+            'use_24_hour_clock': settings['use_24_hour_clock'],
+            'debug_logging': settings['debug_logging'],
+            'username': (
+                settings['user']
+                if settings['auth_backend'] == 'auth_basic'
+                else ''
+            ),
+        }
+        etag = make_etag(data)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
 
-    def update_auth_settings(self, data, auth_backend, current_pass_correct):
-        if auth_backend == '':
-            return
+        return Response(data, headers={'ETag': etag})
 
+    def update_auth_settings(self, data, auth_backend, current_pass_correct):
+        """
+        Returns the changes to the credentials, to be saved along with the
+        other settings.
+        """
+        changes = {}
         if auth_backend != 'auth_basic':
-            return
+            return changes
 
         new_user = data.get('username', '')
         new_pass = data.get('password', '').encode('utf-8')
@@ -248,7 +939,7 @@ class DeviceSettingsViewV2(APIView):
                 if not current_pass_correct:
                     raise ValueError('Incorrect current password.')
 
-                settings['user'] = new_user
+                changes['user'] = new_user
 
             if new_pass:
                 if current_pass_correct is None:
@@ -261,7 +952,7 @@ class DeviceSettingsViewV2(APIView):
                 if new_pass2 != new_pass:
                     raise ValueError('New passwords do not match!')
 
-                settings['password'] = new_pass
+                changes['password'] = new_pass
 
         else:
             if new_user:
@@ -269,11 +960,13 @@ class DeviceSettingsViewV2(APIView):
                     raise ValueError('New passwords do not match!')
                 if not new_pass:
                     raise ValueError('Must provide password')
-                settings['user'] = new_user
-                settings['password'] = new_pass
+                changes['user'] = new_user
+                changes['password'] = new_pass
             else:
                 raise ValueError('Must provide username')
 
+        return changes
+
     @extend_schema(
         summary='Update device settings',
         request=UpdateDeviceSettingsSerializerV2,
@@ -322,40 +1015,39 @@ class DeviceSettingsViewV2(APIView):
                 ].check_password(current_password)
             next_auth_backend = settings.auth_backends[auth_backend]
 
-            self.update_auth_settings(
-                data, next_auth_backend.name, current_pass_correct
-            )
-            settings['auth_backend'] = auth_backend
-
-            # Update settings
-            if 'player_name' in data:
-                settings['player_name'] = data['player_name']
-            if 'default_duration' in data:
-                settings['default_duration'] = data['default_duration']
-            if 'default_streaming_duration' in data:
-                settings['default_streaming_duration'] = data[
-                    'default_streaming_duration'
-                ]
-            if 'audio_output' in data:
-                settings['audio_output'] = data['audio_output']
-            if 'date_format' in data:
-                settings['date_format'] = data['date_format']
-            if 'show_splash' in data:
-                settings['show_splash'] = data['show_splash']
+            changes = {
+                'auth_backend': auth_backend,
+                **self.update_auth_settings(
+                    data, next_auth_backend.name, current_pass_correct
+                ),
+            }
+            for field in [
+                'player_name',
+                'default_duration',
+                'default_streaming_duration',
+                'audio_output',
+                'date_format',
+                'show_splash',
+                'default_assets',
+                'shuffle_playlist',
+                'use_24_hour_clock',
+                'debug_logging',
+            ]:
+                if field in data:
+                    changes[field] = data[field]
+
+            had_default_assets = settings['default_assets']
+            settings.update_and_save(**changes)
+
+            # After saving, as these reload the settings.
             if 'default_assets' in data:
-                if data['default_assets'] and not settings['default_assets']:
+                if data['default_assets'] and not had_default_assets:
                     add_default_assets()
-                elif not data['default_assets'] and settings['default_assets']:
+                    notify_playlist_changed()
+                elif not data['default_assets'] and had_default_assets:
                     remove_default_assets()
-                settings['default_assets'] = data['default_assets']
-            if 'shuffle_playlist' in data:
-                settings['shuffle_playlist'] = data['shuffle_playlist']
-            if 'use_24_hour_clock' in data:
-                settings['use_24_hour_clock'] = data['use_24_hour_clock']
-            if 'debug_logging' in data:
-                settings['debug_logging'] = data['debug_logging']
-
-            settings.save()
+                    notify_playlist_changed()
+
             publisher = ZmqPublisher.get_instance()
             publisher.send_to_viewer('reload')
 
@@ -368,6 +1060,8 @@ class DeviceSettingsViewV2(APIView):
 
 
 class InfoViewV2(InfoViewMixin):
+    snapshot_name = 'info_v2'
+
     def get_anthias_version(self):
         git_branch = diagnostics.get_git_branch()
         git_short_hash = diagnostics.get_git_short_hash()
@@ -420,8 +1114,38 @@ class InfoViewV2(InfoViewMixin):
 
         return ip_addresses
 
+    def get_ip_addresses_updated_at(self):
+        updated_at = get_node_ip_updated_at()
+        return updated_at.isoformat() if updated_at else None
+
+    def collect(self):
+        return {
+            **super().collect(),
+            'anthias_version': self.get_anthias_version(),
+            'device_model': self.get_device_model(),
+            'uptime': self.get_uptime(),
+            'memory': self.get_memory(),
+            'ip_addresses': self.get_ip_addresses(),
+            'ip_addresses_updated_at': self.get_ip_addresses_updated_at(),
+            'mac_address': get_node_mac_address(),
+            'host_user': getenv('HOST_USER'),
+        }
+
     @extend_schema(
         summary='Get system information',
+        description=cleandoc("""
+        Everything but `display_power` comes from a snapshot that is
+        collected again in the background once `stale_after` has
+        passed. Pass `refresh=1` to collect it right away.
+        """),
+        parameters=[
+            OpenApiParameter(
+                name='refresh',
+                location=OpenApiParameter.QUERY,
+                type=OpenApiTypes.BOOL,
+                required=False,
+            )
+        ],
         responses={
             200: {
                 'type': 'object',
@@ -455,35 +1179,33 @@ class InfoViewV2(InfoViewMixin):
                         'type': 'array',
                         'items': {'type': 'string'},
                     },
+                    'ip_addresses_updated_at': {
+                        'type': ['string', 'null'],
+                        'format': 'date-time',
+                    },
                     'mac_address': {'type': 'string'},
                     'host_user': {'type': 'string'},
+                    'collected_at': {'type': 'string', 'format': 'date-time'},
+                    'stale_after': {'type': 'string', 'format': 'date-time'},
                 },
             }
         },
     )
     @authorized
     def get(self, request):
-        viewlog = 'Not yet implemented'
-
-        # Calculate disk space
-        slash = statvfs('/')
-        free_space = size(slash.f_bavail * slash.f_frsize)
-        display_power = r.get('display_power')
+        snapshot = get_snapshot(
+            self.snapshot_name,
+            self.collect,
+            refresh=request.query_params.get('refresh') in ('true', '1'),
+        )
 
         return Response(
             {
-                'viewlog': viewlog,
-                'loadavg': diagnostics.get_load_avg()['15 min'],
-                'free_space': free_space,
-                'display_power': display_power,
-                'up_to_date': is_up_to_date(),
-                'anthias_version': self.get_anthias_version(),
-                'device_model': self.get_device_model(),
-                'uptime': self.get_uptime(),
-                'memory': self.get_memory(),
-                'ip_addresses': self.get_ip_addresses(),
-                'mac_address': get_node_mac_address(),
-                'host_user': getenv('HOST_USER'),
+                'viewlog': 'Not yet implemented',
+                **snapshot['data'],
+                'display_power': r.get('display_power'),
+                'collected_at': snapshot['collected_at'],
+                'stale_after': snapshot['stale_after'],
             }
         )
 
@@ -1,10 +1,12 @@
+import hashlib
 import logging
 from datetime import timedelta
-from os import environ, getenv, path
+from os import environ, getenv, path, remove
 from pathlib import Path
 
 import django
 from celery import Celery
+from celery.signals import worker_ready
 from tenacity import Retrying, stop_after_attempt, wait_fixed
 
 from lib.host_commands import build_signed_hostcmd_payload
@@ -18,12 +20,19 @@ except Exception:
     logging.exception('Failed to initialize Django for Celery worker')
     raise
 
-from lib import diagnostics
+from hive_app.models import Asset, AssetChange, ProcessingState
+from lib import backup_helper, diagnostics, playlist, renditions
+from lib.backup_helper import BackupError
+from lib.messaging import ZmqRelayPublisher
 from lib.utils import (
+    download_video_from_youtube,
+    get_video_duration,
     is_balena_app,
     reboot_via_balena_supervisor,
     shutdown_via_balena_supervisor,
+    url_fails,
 )
+from settings import settings
 
 
 __author__ = 'HIVE, Inc'
@@ -44,6 +53,32 @@ CELERY_RESULT_BACKEND = _get_celery_url(
 )
 CELERY_BROKER_URL = _get_celery_url('CELERY_BROKER_URL', 'redis://redis:6379/0')
 CELERY_TASK_RESULT_EXPIRES = timedelta(hours=6)
+# Ingestion is CPU and I/O heavy, so don't let it starve the rest of the
+# device, and don't let a worker reserve tasks it can't start yet.
+CELERY_WORKER_CONCURRENCY = int(getenv('CELERY_WORKER_CONCURRENCY', 2))
+
+# The steps of `ingest_asset`, in order.
+INGEST_STEPS = [
+    ProcessingState.QUEUED,
+    ProcessingState.DOWNLOADING,
+    ProcessingState.CHECKING,
+    ProcessingState.PROBING,
+    ProcessingState.HASHING,
+    ProcessingState.SCALING,
+]
+INGEST_TIME_LIMIT = 60 * 60
+INGEST_HASH_CHUNK_SIZE = 1024 * 1024
+# Set for an asset when `ingest_asset` is queued for it. Until it
+# expires, `queue_pending_ingestion` takes the task to be waiting for a
+# worker rather than lost, and doesn't queue another one.
+INGEST_QUEUED_KEY = 'ingestion:queued:{}'
+INGEST_REQUEUE_AFTER = 60 * 60
+TRANSCODE_TIME_LIMIT = 6 * 60 * 60
+BACKUP_TIME_LIMIT = 6 * 60 * 60
+# Held from the moment a restore is queued until it's done. It expires
+# with the time limit, so a worker that was killed doesn't block the
+# next restore for longer than that.
+RECOVERY_LOCK_KEY = 'recovery:lock'
 
 r = connect_to_redis()
 celery = Celery(
@@ -51,6 +86,8 @@ celery = Celery(
     backend=CELERY_RESULT_BACKEND,
     broker=CELERY_BROKER_URL,
     result_expires=CELERY_TASK_RESULT_EXPIRES,
+    worker_concurrency=CELERY_WORKER_CONCURRENCY,
+    worker_prefetch_multiplier=1,
 )
 
 
@@ -58,6 +95,17 @@ celery = Celery(
 def setup_periodic_tasks(sender, **kwargs):
     sender.add_periodic_task(3600, cleanup.s(), name='cleanup')
     sender.add_periodic_task(60 * 5, get_display_power.s(), name='display_power')
+    sender.add_periodic_task(60 * 10, queue_pending_ingestion.s(), name='queue_pending_ingestion')
+    sender.add_periodic_task(24 * 60 * 60, update_renditions.s(), name='update_renditions')
+
+
+@worker_ready.connect
+def resume_ingestion(sender, **kwargs):
+    # Whatever was in progress when the worker went away starts over.
+    Asset.objects.filter(processing_state__in=INGEST_STEPS[1:]).update(
+        processing_state=ProcessingState.QUEUED
+    )
+    queue_pending_ingestion.delay(force=True)
 
 
 @celery.task(time_limit=30)
@@ -76,6 +124,299 @@ def cleanup():
             logging.exception('Failed deleting temporary file: %s', tmp_file)
 
 
+class IngestionCancelled(Exception):
+    pass
+
+
+def _advance(asset_id, state, **fields):
+    """
+    Moves an asset to `state`, unless it was deleted or another run got
+    further in the meantime, in which case `IngestionCancelled` is raised.
+    """
+    if state in INGEST_STEPS:
+        previous_states = INGEST_STEPS[:INGEST_STEPS.index(state)]
+    else:
+        previous_states = INGEST_STEPS
+
+    updated = Asset.objects.filter(
+        asset_id=asset_id, processing_state__in=previous_states
+    ).update(
+        processing_state=state,
+        is_processing=state in INGEST_STEPS,
+        **fields,
+    )
+    if not updated:
+        raise IngestionCancelled(asset_id)
+
+    AssetChange.record([asset_id])
+    publisher = ZmqRelayPublisher.get_instance()
+    publisher.send_to_ws_server(asset_id)
+    if state not in INGEST_STEPS:
+        # Ready or failed, the viewer may have to start or stop playing it.
+        playlist.notify_playlist_changed(publisher, [asset_id])
+
+
+def _md5(file_path):
+    digest = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(INGEST_HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# The soft limit raises inside the task, so the asset is marked as failed.
+@celery.task(
+    soft_time_limit=INGEST_TIME_LIMIT, time_limit=INGEST_TIME_LIMIT + 60
+)
+def ingest_asset(asset_id):
+    """
+    Does the slow part of adding an asset: downloads YouTube videos,
+    checks that the URL works, probes the duration of videos, hashes
+    local files and scales local images to the display. The asset is
+    marked as ready, or failed with the reason, at the end.
+    """
+    try:
+        asset = Asset.objects.get(
+            asset_id=asset_id, processing_state=ProcessingState.QUEUED
+        )
+    except Asset.DoesNotExist:
+        return
+
+    fields = {}
+    downloaded = None
+    try:
+        if asset.mimetype == 'youtube_asset':
+            _advance(asset_id, ProcessingState.DOWNLOADING)
+            downloaded, name, duration = download_video_from_youtube(
+                asset.uri, asset_id
+            )
+            fields.update(
+                uri=downloaded, name=name, duration=duration, mimetype='video'
+            )
+
+        uri = fields.get('uri', asset.uri)
+
+        if not asset.skip_asset_check:
+            _advance(asset_id, ProcessingState.CHECKING)
+            if url_fails(uri):
+                raise Exception('Could not retrieve file. Check the asset URL.')
+
+        if 'video' in fields.get('mimetype', asset.mimetype) and not fields.get(
+            'duration', asset.duration
+        ):
+            _advance(asset_id, ProcessingState.PROBING)
+            duration = get_video_duration(uri)
+            if duration is None:
+                raise Exception('Could not read the video duration.')
+            fields['duration'] = int(duration.total_seconds())
+
+        if uri.startswith('/') and not asset.md5:
+            _advance(asset_id, ProcessingState.HASHING)
+            fields['md5'] = _md5(uri)
+
+        if uri.startswith('/') and 'image' in asset.mimetype:
+            _advance(asset_id, ProcessingState.SCALING)
+            _scale_image(asset_id, uri, fields.get('md5', asset.md5))
+
+        _advance(
+            asset_id, ProcessingState.READY, processing_error=None, **fields
+        )
+        transcode_asset.delay(asset_id)
+    except IngestionCancelled:
+        logging.info('Ingestion of %s was cancelled', asset_id)
+        if downloaded:
+            try:
+                remove(downloaded)
+            except OSError:
+                pass
+    except Exception as error:
+        logging.exception('Failed to ingest %s', asset_id)
+        try:
+            _advance(
+                asset_id,
+                ProcessingState.FAILED,
+                processing_error=str(error),
+                is_enabled=False,
+            )
+        except IngestionCancelled:
+            pass
+
+
+def _scale_image(asset_id, uri, md5):
+    settings.load()
+    try:
+        renditions.render_image(uri, md5)
+    except Exception:
+        # The original is shown instead.
+        logging.exception('Failed to scale %s', asset_id)
+
+
+def mark_ingestion_queued(asset_id, force=False):
+    """
+    Records that `ingest_asset` is queued for the asset. Unless `force` is
+    set, nothing is recorded and False is returned if it was already
+    queued in the last `INGEST_REQUEUE_AFTER` seconds.
+    """
+    return bool(
+        r.set(
+            INGEST_QUEUED_KEY.format(asset_id),
+            1,
+            nx=not force,
+            ex=INGEST_REQUEUE_AFTER,
+        )
+    )
+
+
+@celery.task
+def queue_pending_ingestion(force=False):
+    """
+    Queues `ingest_asset` for the assets waiting for it, skipping those
+    it's already queued for unless `force` is set.
+    """
+    for asset_id in Asset.objects.filter(
+        processing_state=ProcessingState.QUEUED
+    ).values_list('asset_id', flat=True):
+        if mark_ingestion_queued(asset_id, force):
+            ingest_asset.delay(asset_id)
+
+
+@celery.task(
+    soft_time_limit=TRANSCODE_TIME_LIMIT,
+    time_limit=TRANSCODE_TIME_LIMIT + 60,
+)
+def transcode_asset(asset_id):
+    """
+    Makes a rendition of a local video the device can't play smoothly as
+    it is. The original keeps being played until the rendition is done.
+    """
+    settings.load()
+    profile = renditions.get_profile()
+    if profile is None:
+        return
+
+    try:
+        asset = Asset.objects.get(
+            asset_id=asset_id, processing_state=ProcessingState.READY
+        )
+    except Asset.DoesNotExist:
+        return
+
+    if 'video' not in asset.mimetype or not asset.uri.startswith('/'):
+        return
+    if renditions.lookup({'asset_id': asset_id, 'mimetype': 'video'}, profile):
+        return
+
+    try:
+        video = renditions.probe(asset.uri)
+        if not renditions.needs_rendition(video, profile):
+            return
+
+        logging.info('Transcoding %s (%s)', asset_id, video)
+        renditions.transcode(
+            asset.uri,
+            renditions.get_rendition_path(asset_id, profile),
+            video,
+            profile,
+        )
+    except Exception:
+        logging.exception('Failed to transcode %s', asset_id)
+        return
+
+    if not Asset.objects.filter(asset_id=asset_id).exists():
+        # Deleted while we were at it.
+        renditions.remove_renditions(asset_id)
+
+
+@celery.task
+def update_renditions():
+    """
+    Drops the renditions of deleted assets, and makes the ones that are
+    missing, e.g. after the resolution was changed.
+    """
+    keys = set()
+    for asset_id, md5 in Asset.objects.values_list('asset_id', 'md5'):
+        keys.update([asset_id, md5])
+    renditions.remove_orphaned_renditions(keys)
+
+    settings.load()
+    for asset_id, uri, md5 in Asset.objects.filter(
+        processing_state=ProcessingState.READY,
+        mimetype='image',
+        uri__startswith='/',
+    ).values_list('asset_id', 'uri', 'md5'):
+        asset = {'asset_id': asset_id, 'mimetype': 'image', 'md5': md5}
+        if md5 and not renditions.lookup_image(asset):
+            _scale_image(asset_id, uri, md5)
+
+    profile = renditions.get_profile()
+    if profile is None:
+        return
+
+    for asset_id in Asset.objects.filter(
+        processing_state=ProcessingState.READY,
+        mimetype='video',
+        uri__startswith='/',
+    ).values_list('asset_id', flat=True):
+        if not renditions.lookup(
+            {'asset_id': asset_id, 'mimetype': 'video'}, profile
+        ):
+            transcode_asset.delay(asset_id)
+
+
+@celery.task(bind=True, time_limit=BACKUP_TIME_LIMIT)
+def create_backup(self, name=None, base=None):
+    """
+    Writes a backup to the static files directory and returns its name.
+    The bytes archived so far are reported with the `PROGRESS` state.
+    """
+
+    def progress(done, total):
+        self.update_state(
+            state='PROGRESS', meta={'done': done, 'total': total}
+        )
+
+    return backup_helper.create_backup(name, base=base, progress=progress)
+
+
+@celery.task(bind=True, time_limit=BACKUP_TIME_LIMIT)
+def recover_backup(self, file_path):
+    """
+    Restores the backup at `file_path` and removes it. The archive is
+    read and checked while the viewer keeps playing; it's only stopped
+    while the files and the database are swapped, and then told to
+    reload everything. Nothing is swapped if the viewer can't be told to
+    stop. The bytes read so far are reported with the `PROGRESS` state.
+    """
+
+    def progress(done, total):
+        self.update_state(
+            state='PROGRESS', meta={'done': done, 'total': total}
+        )
+
+    publisher = ZmqRelayPublisher.get_instance()
+    try:
+        staged = backup_helper.stage_backup(file_path, progress)
+
+        if not publisher.wait_for_subscriber():
+            backup_helper.discard_backup(staged)
+            raise BackupError(
+                'The viewer could not be stopped, try again in a moment.'
+            )
+        publisher.send_to_viewer('stop')
+        try:
+            backup_helper.apply_backup(staged)
+            publisher.send_to_viewer('reload')
+            playlist.notify_playlist_changed(publisher)
+        finally:
+            publisher.send_to_viewer('play')
+    finally:
+        try:
+            remove(file_path)
+        except OSError:
+            pass
+        r.delete(RECOVERY_LOCK_KEY)
+
+
 @celery.task
 def reboot_anthias():
     if is_balena_app():
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class HIVEAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'hive_app'
+
+    def ready(self):
+        from hive_app import signals  # noqa: F401
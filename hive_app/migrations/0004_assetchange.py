@@ -0,0 +1,44 @@
+from django.db import migrations, models
+
+
+def record_existing_assets(apps, schema_editor):
+    Asset = apps.get_model('hive_app', 'Asset')
+    AssetChange = apps.get_model('hive_app', 'AssetChange')
+    AssetChange.objects.bulk_create(
+        [
+            AssetChange(asset_id=asset_id)
+            for asset_id in Asset.objects.values_list('asset_id', flat=True)
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hive_app', '0003_add_scheduler_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssetChange',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                ('asset_id', models.TextField(unique=True)),
+                ('deleted', models.BooleanField(default=False)),
+            ],
+            options={
+                'db_table': 'asset_changes',
+            },
+        ),
+        migrations.RunPython(
+            record_existing_assets, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hive_app', '0004_assetchange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='processing_state',
+            field=models.TextField(
+                choices=[
+                    ('queued', 'Queued'),
+                    ('downloading', 'Downloading'),
+                    ('checking', 'Checking'),
+                    ('probing', 'Probing'),
+                    ('hashing', 'Hashing'),
+                    ('ready', 'Ready'),
+                    ('failed', 'Failed'),
+                ],
+                default='ready',
+            ),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='processing_error',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
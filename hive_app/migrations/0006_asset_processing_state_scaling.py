@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hive_app', '0005_asset_processing_state'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='asset',
+            name='processing_state',
+            field=models.TextField(
+                choices=[
+                    ('queued', 'Queued'),
+                    ('downloading', 'Downloading'),
+                    ('checking', 'Checking'),
+                    ('probing', 'Probing'),
+                    ('hashing', 'Hashing'),
+                    ('scaling', 'Scaling'),
+                    ('ready', 'Ready'),
+                    ('failed', 'Failed'),
+                ],
+                default='ready',
+            ),
+        ),
+    ]
@@ -1,6 +1,9 @@
 import uuid
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Max
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 
 
@@ -8,6 +11,24 @@ def generate_asset_id():
     return uuid.uuid4().hex
 
 
+class ProcessingState(models.TextChoices):
+    """
+    Where an asset is in the ingestion pipeline (see `ingest_asset` in
+    `celery_tasks.py`). The steps run in this order, skipping the ones an
+    asset doesn't need, and end in `ready` or `failed`. `is_processing`
+    is true until then.
+    """
+
+    QUEUED = 'queued'
+    DOWNLOADING = 'downloading'
+    CHECKING = 'checking'
+    PROBING = 'probing'
+    HASHING = 'hashing'
+    SCALING = 'scaling'
+    READY = 'ready'
+    FAILED = 'failed'
+
+
 class Asset(models.Model):
     asset_id = models.TextField(
         primary_key=True, default=generate_asset_id, editable=False
@@ -21,6 +42,10 @@ class Asset(models.Model):
     mimetype = models.TextField(blank=True, null=True)
     is_enabled = models.BooleanField(default=False)
     is_processing = models.BooleanField(default=False)
+    processing_state = models.TextField(
+        choices=ProcessingState.choices, default=ProcessingState.READY
+    )
+    processing_error = models.TextField(blank=True, null=True)
     nocache = models.BooleanField(default=False)
     play_order = models.IntegerField(default=0)
     skip_asset_check = models.BooleanField(default=False)
@@ -47,3 +72,49 @@ class Asset(models.Model):
             return self.start_date < current_time < self.end_date
 
         return False
+
+
+class AssetChange(models.Model):
+    """
+    The last write to each asset. Ids are never reused, so the highest id
+    is the version of the asset list and clients can ask for whatever
+    changed since the version they last saw. Deleted assets are kept as
+    tombstones.
+    """
+
+    asset_id = models.TextField(unique=True)
+    deleted = models.BooleanField(default=False)
+
+    class Meta:
+        db_table = 'asset_changes'
+
+    @classmethod
+    def record(cls, asset_ids, deleted=False):
+        asset_ids = list(dict.fromkeys(asset_ids))
+        if not asset_ids:
+            return
+
+        with transaction.atomic():
+            cls.objects.filter(asset_id__in=asset_ids).delete()
+            cls.objects.bulk_create(
+                [
+                    cls(asset_id=asset_id, deleted=deleted)
+                    for asset_id in asset_ids
+                ]
+            )
+
+    @classmethod
+    def current_version(cls):
+        return cls.objects.aggregate(version=Max('id'))['version'] or 0
+
+
+# Bulk writes (`bulk_create()`, `bulk_update()`, `QuerySet.update()`) skip
+# these and have to call `AssetChange.record()` themselves.
+@receiver(post_save, sender=Asset)
+def record_asset_save(sender, instance, **kwargs):
+    AssetChange.record([instance.asset_id])
+
+
+@receiver(post_delete, sender=Asset)
+def record_asset_delete(sender, instance, **kwargs):
+    AssetChange.record([instance.asset_id], deleted=True)
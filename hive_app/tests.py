@@ -1,3 +1,12 @@
-from django.test import TestCase  # noqa F401
+from django.db import connection
+from django.test import TestCase
 
-# Create your tests here.
+
+class SqlitePragmasTest(TestCase):
+    def test_pragmas_are_applied(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            # NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
@@ -27,13 +27,13 @@ def react(request):
 @require_http_methods(['GET', 'POST'])
 def login(request):
     if request.method == 'POST':
+        # The credentials may have been changed by another worker.
+        settings.load()
         username = request.POST.get('username')
         password = request.POST.get('password')
 
         if settings.auth._check(username, password):
-            # Store credentials in session
-            request.session['auth_username'] = username
-            request.session['auth_password'] = password
+            settings.auth.store_session(request, username)
 
             return redirect(reverse('hive_app:react'))
         else:
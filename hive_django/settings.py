@@ -109,9 +109,25 @@ DATABASES = {
             if getenv('ENVIRONMENT') == 'test'
             else '/data/.screenly/screenly.db'
         ),
+        # The server, the viewer and the Celery workers all keep their
+        # connections open instead of opening the file for every request.
+        'CONN_MAX_AGE': int(getenv('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
     },
 }
 
+# Applied to every new SQLite connection, see `hive_app.signals`. With WAL,
+# readers don't wait for writers and the other way round; `busy_timeout`
+# makes writers wait for each other instead of failing with "database is
+# locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 64 * 1024 * 1024,
+    'cache_size': -8000,
+    'busy_timeout': 5000,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -185,3 +201,12 @@ SPECTACULAR_SETTINGS = {
 DBBACKUP_STORAGE = 'django.core.files.storage.FileSystemStorage'
 DBBACKUP_STORAGE_OPTIONS = {'location': '/data/.screenly/backups'}
 DBBACKUP_HOSTNAME = 'anthias'
+
+# Internal nginx location that serves the asset directory. When set, asset
+# downloads are handed off to nginx with `X-Accel-Redirect` instead of
+# being streamed by Django.
+ASSET_ACCEL_REDIRECT_LOCATION = getenv('ASSET_ACCEL_REDIRECT_LOCATION', '')
+
+# Seconds the diagnostics shown by the info endpoints are served from a
+# snapshot before it's collected again in the background.
+DIAGNOSTICS_SNAPSHOT_MAX_AGE = int(getenv('DIAGNOSTICS_SNAPSHOT_MAX_AGE', 30))
@@ -14,6 +14,7 @@ import subprocess
 
 import time
 from collections import deque
+from threading import Thread
 
 from lib.host_commands import (
     HOSTCMD_RATE_LIMIT_SECONDS,
@@ -22,13 +23,6 @@ from lib.host_commands import (
 from lib.redis_client import connect_to_redis
 
 import netifaces
-import requests
-from tenacity import (
-    RetryError,
-    Retrying,
-    stop_after_attempt,
-    wait_fixed,
-)
 
 # Name of redis channel to listen to
 CHANNEL_NAME = b'hostcmd'
@@ -45,6 +39,10 @@ SUPPORTED_INTERFACES = (
     'eno',
 )
 
+# Seconds between two looks at the network interfaces. Readers see the
+# addresses at most this old.
+IP_WATCH_INTERVAL = 5
+
 
 def get_ip_addresses():
     return [
@@ -59,29 +57,36 @@ def get_ip_addresses():
     ]
 
 
-def set_ip_addresses():
-    rdb = connect_to_redis(decode_responses=False)
+def set_ip_addresses(rdb=None, ip_addresses=None):
+    """
+    Stores the IP addresses, along with when they were last seen, for
+    `lib.utils.get_node_ip` to read.
+    """
+    rdb = rdb or connect_to_redis(decode_responses=False)
+    if ip_addresses is None:
+        ip_addresses = get_ip_addresses()
 
-    rdb.set('ip_addresses_ready', 'false')
-
-    try:
-        for attempt in Retrying(
-            stop=stop_after_attempt(10),
-            wait=wait_fixed(1),
-        ):
-            with attempt:
-                response = requests.get('https://1.1.1.1')
-                response.raise_for_status()
-    except RetryError:
-        logging.warning(
-            'Unable to connect to the Internet. '
-            'Proceeding with the current IP addresses available.'
-        )
+    pipeline = rdb.pipeline()
+    pipeline.set('ip_addresses', json.dumps(ip_addresses))
+    pipeline.set('ip_addresses_updated_at', time.time())
+    pipeline.execute()
 
-    rdb.set('ip_addresses_ready', 'true')
 
-    ip_addresses = get_ip_addresses()
-    rdb.set('ip_addresses', json.dumps(ip_addresses))
+def watch_ip_addresses():
+    rdb = connect_to_redis(decode_responses=False)
+    ip_addresses = None
+
+    while True:
+        try:
+            current = get_ip_addresses()
+            if current != ip_addresses:
+                logging.info('IP addresses changed: %s', current)
+            set_ip_addresses(rdb, current)
+            ip_addresses = current
+        except Exception:
+            logging.exception('Unable to update the IP addresses')
+
+        time.sleep(IP_WATCH_INTERVAL)
 
 
 # Explicit command whitelist for security reasons, keys as bytes objects
@@ -185,5 +190,7 @@ if __name__ == '__main__':
     logging.basicConfig()
     logging.getLogger().setLevel(logging.INFO)
 
+    Thread(target=watch_ip_addresses, daemon=True).start()
+
     # Loop forever processing messages
     subscriber_loop()
@@ -4,20 +4,30 @@
 from __future__ import unicode_literals
 
 import hashlib
+import hmac
 import re
 
 from django.contrib.auth.hashers import check_password as django_check_password
 from django.contrib.auth.hashers import make_password
+from django.utils.crypto import salted_hmac
 import os.path
 from abc import ABCMeta, abstractmethod
 from base64 import b64decode
 from builtins import object, str
 from functools import wraps
+from threading import Lock
+from time import monotonic
 
 from future.utils import with_metaclass
 
 LINUX_USER = os.getenv('USER', 'pi')
 
+# Credentials that passed the check are remembered for this long, so that
+# API clients sending them with every request don't pay for the password
+# hasher every time.
+VERIFIED_CREDENTIALS_TTL = 5 * 60
+VERIFIED_CREDENTIALS_MAX = 128
+
 
 class Auth(with_metaclass(ABCMeta, object)):
     @abstractmethod
@@ -102,9 +112,21 @@ class BasicAuth(Auth):
     name = 'auth_basic'
     config = {'auth_basic': {'user': '', 'password': ''}}
 
+    _verified = {}
+    _verified_lock = Lock()
+
     def __init__(self, settings):
         self.settings = settings
 
+    def _digest(self, *parts):
+        # Includes the stored password hash, so that nothing verified or
+        # issued before the password changes is accepted after it.
+        return salted_hmac(
+            'lib.auth.BasicAuth',
+            '\0'.join([*parts, self.settings['password']]),
+            algorithm='sha256',
+        ).hexdigest()
+
     def _check(self, username, password):
         """
         Check username/password combo against database.
@@ -112,9 +134,38 @@ class BasicAuth(Auth):
         :param password: str
         :return: True if the check passes.
         """
-        return self.settings['user'] == username and self.check_password(
-            password
-        )
+        if self.settings['user'] != username:
+            return False
+
+        now = monotonic()
+        with self._verified_lock:
+            expires_at = self._verified.get(self._digest(username, password))
+        if expires_at and expires_at > now:
+            return True
+
+        if not self.check_password(password):
+            return False
+
+        with self._verified_lock:
+            if len(self._verified) >= VERIFIED_CREDENTIALS_MAX:
+                self._verified.clear()
+            # After `check_password`, which may have upgraded the hash.
+            self._verified[self._digest(username, password)] = (
+                now + VERIFIED_CREDENTIALS_TTL
+            )
+        return True
+
+    def get_session_token(self, username):
+        return self._digest('session', username)
+
+    def store_session(self, request, username):
+        """
+        Marks the session as logged in as `username`, until the password
+        changes. The password itself isn't stored.
+        """
+        request.session['auth_username'] = username
+        request.session['auth_token'] = self.get_session_token(username)
+        request.session.pop('auth_password', None)
 
     def check_password(self, password):
         stored_password = self.settings['password']
@@ -123,11 +174,16 @@ class BasicAuth(Auth):
 
         if re.fullmatch(r'[a-f0-9]{64}', stored_password):
             legacy_hash = hashlib.sha256(password.encode('utf-8')).hexdigest()
-            if legacy_hash == stored_password:
-                self.settings['password'] = make_password(password)
-                self.settings.save()
-                return True
-            return False
+            if legacy_hash != stored_password:
+                return False
+
+            # Upgraded in the latest settings rather than this process'
+            # copy, which may be missing changes made elsewhere since.
+            self.settings.load()
+            if self.settings['password'] != stored_password:
+                return self.check_password(password)
+            self.settings.update_and_save(password=make_password(password))
+            return True
 
         return django_check_password(password, stored_password)
 
@@ -149,9 +205,17 @@ class BasicAuth(Auth):
 
         # Then check session for form-based login
         username = request.session.get('auth_username')
+        token = request.session.get('auth_token')
+        if username and token:
+            return username == self.settings['user'] and hmac.compare_digest(
+                token, self.get_session_token(username)
+            )
+
+        # Sessions from before the token, which kept the password
         password = request.session.get('auth_password')
-        if username and password:
-            return self._check(username, password)
+        if username and password and self._check(username, password):
+            self.store_session(request, username)
+            return True
 
         return False
 
@@ -216,6 +280,10 @@ def authorized(orig):
 
     @wraps(orig)
     def decorated(*args, **kwargs):
+        # Another worker may have changed the credentials or turned
+        # authentication on or off. Only parses screenly.conf if it
+        # changed.
+        settings.load()
         if not settings.auth:
             return orig(*args, **kwargs)
 
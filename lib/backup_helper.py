@@ -1,43 +1,488 @@
 from __future__ import unicode_literals
 
+import hashlib
+import json
 import logging
+import os
+import sqlite3
 import sys
 import tarfile
+import tempfile
 from datetime import datetime
 from os import getenv, makedirs, path, remove
+from time import monotonic
+
+from django.db import connection
+
+from settings import settings
 
 directories = ['.screenly', 'screenly_assets']
 default_archive_name = 'anthias-backup'
 static_dir = 'screenly/staticfiles'
+# The database runs in WAL mode. These belong to the live database and are
+# neither backed up nor restored.
+wal_suffixes = ('-wal', '-shm')
+# Manifests of the backups made so far, which incremental backups are
+# based on.
+manifest_dir = '.screenly/backup_manifests'
+manifest_name = 'manifest.json'
+# Where the database goes in backups, wherever it's kept.
+database_name = '.screenly/screenly.db'
+# Left out of backups: old database dumps, manifests, and files that are
+# made again from the assets or are only there while something is in
+# progress.
+excluded_paths = [
+    '.screenly/backups',
+    manifest_dir,
+    'screenly_assets/.cache',
+    'screenly_assets/.renditions',
+    'screenly_assets/.uploads',
+]
+excluded_suffixes = wal_suffixes + ('.tmp', '.part')
+chunk_size = 1024 * 1024
+# Restored files are written next to the ones they replace, under this
+# suffix, until the whole archive has been read.
+staged_suffix = '.restore.tmp'
+# How often `progress` is called, in seconds.
+progress_interval = 1
 
 
-def create_backup(name=default_archive_name):
-    home = getenv('HOME')
-    archive_name = '{}-{}.tar.gz'.format(
+class BackupError(Exception):
+    pass
+
+
+def get_archive_name(name=None):
+    return '{}-{}.tar'.format(
         name if name else default_archive_name,
         datetime.now().strftime('%Y-%m-%dT%H-%M-%S'),
     )
-    file_path = path.join(home, static_dir, archive_name)
 
-    if not path.exists(path.join(home, static_dir)):
-        makedirs(path.join(home, static_dir), exist_ok=True)
 
-    if path.isfile(file_path):
-        remove(file_path)
+def get_manifest_path(archive_name):
+    return path.join(getenv('HOME'), manifest_dir, f'{archive_name}.json')
+
 
+def load_manifest(archive_name):
     try:
-        with tarfile.open(file_path, 'w:gz') as tar:
-            for directory in directories:
-                path_to_dir = path.join(home, directory)
-                tar.add(path_to_dir, arcname=directory)
-    except IOError as e:
-        remove(file_path)
-        raise e
+        with open(get_manifest_path(archive_name)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        raise BackupError(f'No manifest for {archive_name}.')
+
+
+def get_latest_backup():
+    """
+    Returns the name of the last backup kept on this device, if any.
+    Backups whose archive was deleted since don't count.
+    """
+    home = getenv('HOME')
+    try:
+        names = os.listdir(path.join(home, manifest_dir))
+    except OSError:
+        return None
+
+    manifests = sorted(
+        (
+            name
+            for name in names
+            if name.endswith('.json')
+            and path.isfile(
+                path.join(home, static_dir, name.removesuffix('.json'))
+            )
+        ),
+        key=lambda name: path.getmtime(path.join(home, manifest_dir, name)),
+    )
+    return manifests[-1].removesuffix('.json') if manifests else None
+
+
+def is_excluded(relative_path):
+    return relative_path.endswith(excluded_suffixes) or any(
+        relative_path == excluded or relative_path.startswith(excluded + '/')
+        for excluded in excluded_paths
+    )
+
+
+def list_files(home, databases):
+    """
+    Returns the directories and the files to back up, relative to
+    `home`. `databases` are left out, the database is copied separately.
+    """
+    dirs = []
+    files = []
+    for directory in directories:
+        for root, dir_names, file_names in os.walk(path.join(home, directory)):
+            relative_root = path.relpath(root, home)
+            dir_names[:] = sorted(
+                name
+                for name in dir_names
+                if not is_excluded(path.join(relative_root, name))
+            )
+            dirs.append(relative_root)
+            for name in sorted(file_names):
+                relative_path = path.join(relative_root, name)
+                if relative_path not in databases and not is_excluded(
+                    relative_path
+                ):
+                    files.append(relative_path)
+    return dirs, files
+
+
+def get_md5(file_path):
+    digest = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_manifest(home, files, known):
+    """
+    Describes each of `files`. MD5s are taken from `known`, a previous
+    manifest, for files whose size and modification time haven't changed.
+    """
+    entries = {}
+    for relative_path in files:
+        try:
+            stat = os.stat(path.join(home, relative_path))
+        except OSError:
+            # Deleted in the meantime.
+            continue
+
+        entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        previous = known.get(relative_path, {})
+        if (
+            previous.get('size') == entry['size']
+            and previous.get('mtime_ns') == entry['mtime_ns']
+        ):
+            entry['md5'] = previous['md5']
+        else:
+            entry['md5'] = get_md5(path.join(home, relative_path))
+        entries[relative_path] = entry
+    return entries
+
+
+def snapshot_database(destination):
+    """
+    Copies the database with SQLite's backup API, which gives a
+    consistent copy while other processes keep writing to it.
+    """
+    connection.ensure_connection()
+    target = sqlite3.connect(destination)
+    try:
+        connection.connection.backup(target)
+    finally:
+        target.close()
+
+
+def make_header(name, size=0, mtime=None, mode=0o644, directory=False):
+    tarinfo = tarfile.TarInfo(name)
+    tarinfo.size = 0 if directory else size
+    tarinfo.mtime = mtime if mtime is not None else datetime.now().timestamp()
+    tarinfo.mode = mode
+    tarinfo.type = tarfile.DIRTYPE if directory else tarfile.REGTYPE
+    return tarinfo.tobuf(format=tarfile.PAX_FORMAT)
+
+
+def iter_file(file_path, size):
+    """
+    Yields exactly `size` bytes of the file, padded to whole tar blocks,
+    even if it changes while it's read.
+    """
+    remaining = size
+    with open(file_path, 'rb') as f:
+        while remaining:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    if remaining:
+        yield bytes(remaining)
+
+    padding = -size % tarfile.BLOCKSIZE
+    if padding:
+        yield bytes(padding)
+
+
+def iter_backup(archive_name, base=None, progress=None, save_manifest=False):
+    """
+    Yields a tar archive of the settings, the database and the assets,
+    chunk by chunk, so that it can be written to a file or sent as a
+    response as it's made.
+
+    Media files are already compressed, so the archive isn't. With
+    `base`, the name of an earlier backup, only the files that changed
+    since are included; the database and the settings always are. With
+    `save_manifest`, the manifest is saved for later backups to be based
+    on, which only makes sense for backups kept on the device.
+
+    `progress(done, total)` is called now and then with the number of
+    bytes of file content archived so far.
+    """
+    home = getenv('HOME')
+    live_database = path.relpath(settings['database'], home)
+    base_manifest = load_manifest(base) if base else None
+    latest = get_latest_backup()
+    known = (base_manifest or (load_manifest(latest) if latest else {})).get(
+        'files', {}
+    )
+
+    dirs, files = list_files(home, {live_database, database_name})
+    entries = make_manifest(home, files, known)
+    if base_manifest:
+        included = [
+            relative_path
+            for relative_path, entry in entries.items()
+            if known.get(relative_path, {}).get('md5') != entry['md5']
+            or relative_path.startswith('.screenly/')
+        ]
+    else:
+        included = list(entries)
+
+    manifest = {
+        'version': 1,
+        'name': archive_name,
+        'base': base,
+        'created_at': datetime.now().isoformat(),
+        'database': database_name,
+        'files': entries,
+    }
+    manifest_data = json.dumps(manifest, indent=2).encode()
+
+    total = sum(entries[relative_path]['size'] for relative_path in included)
+    done = 0
+    reported_at = monotonic()
+
+    with tempfile.NamedTemporaryFile(suffix='.db') as database_copy:
+        snapshot_database(database_copy.name)
+
+        yield make_header(manifest_name, len(manifest_data))
+        yield manifest_data
+        yield bytes(-len(manifest_data) % tarfile.BLOCKSIZE)
+
+        for directory in dirs:
+            yield make_header(directory, mode=0o755, directory=True)
+
+        database_size = path.getsize(database_copy.name)
+        yield make_header(database_name, database_size)
+        yield from iter_file(database_copy.name, database_size)
+
+    for relative_path in included:
+        entry = entries[relative_path]
+        yield make_header(
+            relative_path, entry['size'], entry['mtime_ns'] / 1e9
+        )
+        try:
+            yield from iter_file(path.join(home, relative_path), entry['size'])
+        except OSError:
+            # Deleted in the meantime, the header was already sent.
+            yield bytes(entry['size'] + (-entry['size'] % tarfile.BLOCKSIZE))
+
+        done += entry['size']
+        if progress and monotonic() - reported_at >= progress_interval:
+            progress(done, total)
+            reported_at = monotonic()
+
+    # End of archive
+    yield bytes(tarfile.BLOCKSIZE * 2)
+
+    if save_manifest:
+        manifest_path = get_manifest_path(archive_name)
+        makedirs(path.dirname(manifest_path), exist_ok=True)
+        with open(manifest_path, 'wb') as f:
+            f.write(manifest_data)
+
+    if progress:
+        progress(total, total)
+
+
+def create_backup(name=default_archive_name, base=None, progress=None):
+    """
+    Writes a backup to the static files directory and returns its name.
+    See `iter_backup`.
+    """
+    home = getenv('HOME')
+    archive_name = get_archive_name(name)
+    file_path = path.join(home, static_dir, archive_name)
+    makedirs(path.join(home, static_dir), exist_ok=True)
+
+    tmp_path = f'{file_path}.part'
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in iter_backup(
+                archive_name, base, progress, save_manifest=True
+            ):
+                f.write(chunk)
+        os.replace(tmp_path, file_path)
+    finally:
+        try:
+            remove(tmp_path)
+        except OSError:
+            pass
 
     return archive_name
 
 
-def recover(file_path):
+def get_member_path(tarinfo):
+    """
+    Returns where a member of a backup goes, relative to the home
+    directory, or raises `BackupError` if it doesn't belong in a backup.
+    """
+    name = path.normpath(tarinfo.name)
+    if name == manifest_name:
+        return name
+    if path.isabs(name) or name.split('/')[0] not in directories:
+        raise BackupError(f'Unexpected member in the archive: {tarinfo.name}')
+    return name
+
+
+def stage_backup(file_path, progress=None):
+    """
+    Reads a backup in one pass, checking each member as it goes, and
+    writes its files next to the ones they replace. Returns the staged
+    files, mapped to where they go, for `apply_backup`.
+
+    Nothing is replaced yet. If the archive turns out to be wrong, the
+    staged files are removed and `BackupError` is raised. That includes
+    incremental backups that leave out files this device doesn't have.
+
+    `progress(done, total)` is called now and then with the number of
+    bytes of the archive read so far.
+    """
+    home = getenv('HOME')
+    total = path.getsize(file_path)
+    reported_at = monotonic()
+    found = set()
+    staged = {}
+    manifest = None
+
+    try:
+        with (
+            open(file_path, 'rb') as f,
+            tarfile.open(fileobj=f, mode='r|*') as tar,
+        ):
+            for tarinfo in tar:
+                relative_path = get_member_path(tarinfo)
+                found.add(relative_path.split('/')[0])
+                if relative_path == manifest_name:
+                    try:
+                        with tar.extractfile(tarinfo) as source:
+                            manifest = json.load(source)
+                    except ValueError:
+                        raise BackupError('The manifest is damaged.')
+                    continue
+                if is_excluded(relative_path):
+                    continue
+                if not (tarinfo.isfile() or tarinfo.isdir()):
+                    logging.warning('Skipping %s, not a file', tarinfo.name)
+                    continue
+
+                destination = path.join(home, relative_path)
+                if tarinfo.isdir():
+                    makedirs(destination, exist_ok=True)
+                    continue
+
+                makedirs(path.dirname(destination), exist_ok=True)
+                staged_path = f'{destination}{staged_suffix}'
+                staged[staged_path] = destination
+                with (
+                    tar.extractfile(tarinfo) as source,
+                    open(staged_path, 'wb') as target,
+                ):
+                    for chunk in iter(lambda: source.read(chunk_size), b''):
+                        target.write(chunk)
+                        if (
+                            progress
+                            and monotonic() - reported_at >= progress_interval
+                        ):
+                            progress(f.tell(), total)
+                            reported_at = monotonic()
+                os.utime(staged_path, (tarinfo.mtime, tarinfo.mtime))
+    except tarfile.TarError as error:
+        discard_backup(staged)
+        raise BackupError(f'The archive is damaged: {error}')
+    except BaseException:
+        discard_backup(staged)
+        raise
+
+    if not found.issuperset(directories):
+        discard_backup(staged)
+        raise BackupError('Archive is wrong.')
+
+    if manifest and manifest.get('base'):
+        missing = get_missing_files(manifest, home, staged.values())
+        if missing:
+            discard_backup(staged)
+            raise BackupError(
+                f'This backup only has the files changed since '
+                f'{manifest["base"]}, and {len(missing)} of the others '
+                f'are missing. Restore {manifest["base"]} first.'
+            )
+
+    if progress:
+        progress(total, total)
+    return staged
+
+
+def get_missing_files(manifest, home, restored):
+    """
+    Returns the files listed in `manifest` that are neither `restored`
+    nor on the device as they were when the backup was made.
+    """
+    restored = set(restored)
+    missing = []
+    for relative_path, entry in manifest.get('files', {}).items():
+        file_path = path.join(home, relative_path)
+        if file_path in restored:
+            continue
+        try:
+            if path.getsize(file_path) == entry['size']:
+                continue
+        except OSError:
+            pass
+        missing.append(relative_path)
+    return missing
+
+
+def discard_backup(staged):
+    for staged_path in staged:
+        try:
+            remove(staged_path)
+        except OSError:
+            pass
+
+
+def restore_database(source_path):
+    """
+    Copies a database over the live one with SQLite's backup API, so
+    that open connections and the WAL stay consistent.
+    """
+    connection.ensure_connection()
+    source = sqlite3.connect(source_path)
+    try:
+        source.backup(connection.connection)
+    finally:
+        source.close()
+
+
+def apply_backup(staged):
+    """
+    Replaces the live files with the ones staged by `stage_backup`, and
+    the live database with the one in the backup.
+    """
+    database = path.join(getenv('HOME'), database_name)
+    try:
+        for staged_path, destination in staged.items():
+            if destination == database:
+                restore_database(staged_path)
+                remove(staged_path)
+            else:
+                os.replace(staged_path, destination)
+    finally:
+        discard_backup(staged)
+
+
+def recover(file_path, progress=None):
     home = getenv('HOME')
     if not home:
         logging.error('No HOME variable')
@@ -45,11 +490,7 @@ def recover(file_path):
         # or we can create a new class that extends Exception.
         sys.exit(1)
 
-    with tarfile.open(file_path, 'r:gz') as tar:
-        for directory in directories:
-            if directory not in tar.getnames():
-                raise Exception('Archive is wrong.')
-
-        tar.extractall(path=getenv('HOME'))
-
-    remove(file_path)
+    try:
+        apply_backup(stage_backup(file_path, progress))
+    finally:
+        remove(file_path)
@@ -1,5 +1,6 @@
 from .zmq_collector import ZmqCollector
 from .zmq_consumer import ZmqConsumer
 from .zmq_pub import ZmqPublisher
+from .zmq_relay import ZmqRelayPublisher
 
-__all__ = ['ZmqPublisher', 'ZmqConsumer', 'ZmqCollector']
+__all__ = ['ZmqPublisher', 'ZmqConsumer', 'ZmqCollector', 'ZmqRelayPublisher']
@@ -1,4 +1,5 @@
 from threading import Lock
+from time import monotonic
 
 import json
 
@@ -6,6 +7,8 @@ import zmq
 
 from lib.errors import ZmqCollectorTimeoutError
 
+from .zmq_proxy import COLLECTOR_PROXY_URL, COLLECTOR_URL, is_proxied
+
 
 _INSTANCE_LOCK = Lock()
 _INSTANCE = None
@@ -14,8 +17,13 @@ _INSTANCE = None
 class ZmqCollector:
     def __init__(self):
         self.context = zmq.Context.instance()
-        self.socket = self.context.socket(zmq.PULL)
-        self.socket.bind('tcp://0.0.0.0:5558')
+        if is_proxied():
+            self.socket = self.context.socket(zmq.SUB)
+            self.socket.setsockopt(zmq.SUBSCRIBE, b'')
+            self.socket.connect(COLLECTOR_PROXY_URL)
+        else:
+            self.socket = self.context.socket(zmq.PULL)
+            self.socket.bind(COLLECTOR_URL)
         self.poller = zmq.Poller()
         self.poller.register(self.socket, zmq.POLLIN)
 
@@ -27,7 +35,19 @@ class ZmqCollector:
                 _INSTANCE = cls()
             return _INSTANCE
 
-    def recv_json(self, timeout):
-        if self.poller.poll(timeout):
-            return json.loads(self.socket.recv(zmq.NOBLOCK))
-        raise ZmqCollectorTimeoutError
+    def recv_json(self, timeout, request_id=None):
+        """
+        Returns the next reply within `timeout` milliseconds. With
+        `request_id`, replies to other requests are skipped: behind the
+        proxy every worker gets every reply, and a reply that came too
+        late would otherwise be taken for the answer to the next request.
+        """
+        deadline = monotonic() + timeout / 1000
+        while True:
+            remaining = int((deadline - monotonic()) * 1000)
+            if remaining <= 0 or not self.poller.poll(remaining):
+                raise ZmqCollectorTimeoutError
+
+            reply = json.loads(self.socket.recv(zmq.NOBLOCK))
+            if request_id is None or reply.get('request_id') == request_id:
+                return reply
@@ -0,0 +1,52 @@
+import logging
+from multiprocessing import Process
+from os import getenv
+from threading import Thread
+
+import zmq
+
+
+# Set by `run_gunicorn.py` when it starts more than one worker. The ports
+# can only be bound once, so the proxy binds them and the workers connect
+# to it instead.
+PROXY_ENV = 'ZMQ_PROXY'
+
+PUBLISHER_URL = 'tcp://0.0.0.0:10001'
+COLLECTOR_URL = 'tcp://0.0.0.0:5558'
+PUBLISHER_PROXY_URL = 'ipc:///tmp/anthias-zmq-publisher'
+COLLECTOR_PROXY_URL = 'ipc:///tmp/anthias-zmq-collector'
+
+
+def is_proxied():
+    return getenv(PROXY_ENV) == '1'
+
+
+def proxy(frontend_type, frontend_url, backend_type, backend_url):
+    context = zmq.Context.instance()
+    frontend = context.socket(frontend_type)
+    frontend.bind(frontend_url)
+    backend = context.socket(backend_type)
+    backend.bind(backend_url)
+
+    zmq.proxy(frontend, backend)
+
+
+def run_proxy():
+    """
+    Forwards what the workers publish to the viewer and the websocket
+    server, and the replies of the viewer to every worker. Only the
+    worker waiting for a reply reads it.
+    """
+    Thread(
+        target=proxy,
+        args=(zmq.XSUB, PUBLISHER_PROXY_URL, zmq.XPUB, PUBLISHER_URL),
+        daemon=True,
+    ).start()
+    proxy(zmq.PULL, COLLECTOR_URL, zmq.PUB, COLLECTOR_PROXY_URL)
+
+
+def start_proxy():
+    process = Process(target=run_proxy, name='zmq-proxy', daemon=True)
+    process.start()
+    logging.info('Started the ZeroMQ proxy (pid %s)', process.pid)
+    return process
@@ -2,16 +2,33 @@ from threading import Lock
 
 import zmq
 
+from .zmq_proxy import PUBLISHER_PROXY_URL, PUBLISHER_URL, is_proxied
+
 
 _INSTANCE_LOCK = Lock()
 _INSTANCE = None
 
+# How long to wait, in milliseconds, for the proxy to pass on the
+# subscriptions when connecting to it. Without any, e.g. before the
+# viewer is up, there's nothing to wait for.
+PROXY_CONNECT_TIMEOUT = 1000
+
 
 class ZmqPublisher:
     def __init__(self):
         self.context = zmq.Context.instance()
-        self.socket = self.context.socket(zmq.PUB)
-        self.socket.bind('tcp://0.0.0.0:10001')
+        if is_proxied():
+            # Messages sent before the proxy has passed on the
+            # subscriptions are dropped. Unlike PUB, XPUB gets them, so it
+            # can wait for them before the first message.
+            self.socket = self.context.socket(zmq.XPUB)
+            self.socket.connect(PUBLISHER_PROXY_URL)
+            if self.socket.poll(PROXY_CONNECT_TIMEOUT):
+                while self.socket.poll(0):
+                    self.socket.recv()
+        else:
+            self.socket = self.context.socket(zmq.PUB)
+            self.socket.bind(PUBLISHER_URL)
 
     @classmethod
     def get_instance(cls):
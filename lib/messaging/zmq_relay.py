@@ -0,0 +1,74 @@
+from threading import Lock
+
+import zmq
+from zmq.utils.monitor import recv_monitor_message
+
+
+_INSTANCE_LOCK = Lock()
+_INSTANCE = None
+
+# Bound by the websocket server, so that any number of processes can
+# connect to it.
+WS_SERVER_RELAY_URL = 'tcp://anthias-websocket:10002'
+# Where the websocket server republishes what it's relayed, for the
+# viewer.
+VIEWER_RELAY_URL = 'tcp://anthias-websocket:10003'
+# How long to wait, in milliseconds, for the websocket server to
+# subscribe when connecting to it.
+RELAY_CONNECT_TIMEOUT = 1000
+
+
+class ZmqRelayPublisher:
+    """
+    Like `ZmqPublisher`, for processes other than anthias-server (e.g.
+    the Celery workers), which can't bind the publisher's port. The
+    websocket server passes the messages on to the browsers and the
+    viewer.
+    """
+
+    def __init__(self):
+        self.context = zmq.Context.instance()
+        # Messages sent before the websocket server has subscribed are
+        # dropped. Unlike PUB, XPUB gets the subscription, so it can wait
+        # for it. It doesn't hear about the websocket server going away
+        # though, the monitor does.
+        self.socket = self.context.socket(zmq.XPUB)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.setsockopt(zmq.XPUB_VERBOSE, 1)
+        self.monitor = self.socket.get_monitor_socket(zmq.EVENT_DISCONNECTED)
+        self.socket.connect(WS_SERVER_RELAY_URL)
+        self.subscribed = False
+        self.wait_for_subscriber()
+
+    def _read_events(self):
+        while self.monitor.poll(0):
+            recv_monitor_message(self.monitor)
+            self.subscribed = False
+        while self.socket.poll(0):
+            self.socket.recv()
+            self.subscribed = True
+
+    def wait_for_subscriber(self, timeout=RELAY_CONNECT_TIMEOUT):
+        """
+        Waits up to `timeout` milliseconds for the websocket server to
+        subscribe, unless it already has. Returns whether messages sent
+        now reach it.
+        """
+        self._read_events()
+        if not self.subscribed and self.socket.poll(timeout):
+            self._read_events()
+        return self.subscribed
+
+    @classmethod
+    def get_instance(cls):
+        global _INSTANCE
+        with _INSTANCE_LOCK:
+            if _INSTANCE is None:
+                _INSTANCE = cls()
+            return _INSTANCE
+
+    def send_to_ws_server(self, msg):
+        self.socket.send(f'ws_server {msg}'.encode('utf-8'))
+
+    def send_to_viewer(self, msg):
+        self.socket.send_string(f'viewer {msg}')
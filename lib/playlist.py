@@ -0,0 +1,30 @@
+import json
+import logging
+
+from redis import RedisError
+
+from lib.redis_client import connect_to_redis
+
+PLAYLIST_VERSION_KEY = 'playlist_version'
+
+r = connect_to_redis()
+
+
+def notify_playlist_changed(publisher, asset_ids=None):
+    """
+    Bump the playlist version and tell the viewer, through `publisher`,
+    which assets changed. If Redis is unavailable the viewer falls back
+    to polling the database.
+    """
+    try:
+        version = r.incr(PLAYLIST_VERSION_KEY)
+    except RedisError as error:
+        logging.warning('Could not bump playlist version: %s', error)
+        return None
+
+    payload = json.dumps(
+        {'version': version, 'asset_ids': list(asset_ids or [])}
+    )
+    publisher.send_to_viewer(f'playlist_changed&{payload}')
+
+    return version
@@ -0,0 +1,401 @@
+"""
+Playback-friendly copies of video and image assets.
+
+The Raspberry Pis only decode some codecs, resolutions and frame rates in
+hardware; anything else is decoded in software and stutters. After a local
+video has been ingested, `transcode_asset` (see `celery_tasks.py`) checks
+it against the profile of the device and, if needed, writes a rendition
+the device can play to `<assetdir>/.renditions`.
+
+Images larger than the display are scaled down, and rotated according to
+their EXIF orientation, while they are ingested, so that the webview
+doesn't have to decode a huge image every time it comes around. Image
+renditions are named after the MD5 of the original, so identical images
+share one.
+
+The viewer plays a rendition instead of the original once it exists. The
+originals are kept as they are, e.g. for downloads.
+"""
+
+import json
+import logging
+import os
+from glob import glob
+from os import getenv, path
+from subprocess import DEVNULL, check_call, check_output
+
+from lib.device_helper import get_device_type
+from settings import settings
+
+# Pillow comes with the base image (python3-pil). Without it images are
+# shown as they are.
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = ImageOps = None
+
+RENDITION_DIR = '.renditions'
+
+IMAGE_FORMATS = {
+    'jpeg': ('JPEG', '.jpg'),
+    'webp': ('WEBP', '.webp'),
+}
+# Used instead of JPEG for images with transparency.
+IMAGE_ALPHA_FORMAT = ('PNG', '.png')
+# Formats the webview shows as they are when no scaling or rotation is
+# needed.
+IMAGE_PASSTHROUGH_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+IMAGE_QUALITY = 85
+EXIF_ORIENTATION = 0x0112
+
+# What each device decodes in hardware without dropping frames. Videos
+# outside these limits are transcoded to H.264 within them. Devices that
+# aren't listed decode anything well enough and are left alone.
+RENDITION_PROFILES = {
+    'pi1': {
+        'codecs': ['h264'],
+        'max_size': (1280, 720),
+        'max_fps': 30,
+        'max_bitrate': 5000000,
+    },
+    'pi2': {
+        'codecs': ['h264'],
+        'max_size': (1920, 1080),
+        'max_fps': 30,
+        'max_bitrate': 8000000,
+    },
+    'pi3': {
+        'codecs': ['h264'],
+        'max_size': (1920, 1080),
+        'max_fps': 30,
+        'max_bitrate': 8000000,
+    },
+    'pi4': {
+        'codecs': ['h264', 'hevc'],
+        'max_size': (1920, 1080),
+        'max_fps': 60,
+        'max_bitrate': 12000000,
+    },
+    # Only HEVC is decoded in hardware, but 1080p H.264 is fine in
+    # software.
+    'pi5': {
+        'codecs': ['hevc', 'h264'],
+        'max_size': (1920, 1080),
+        'max_fps': 60,
+        'max_bitrate': 12000000,
+    },
+}
+
+
+def get_rendition_dir():
+    return path.join(settings['assetdir'], RENDITION_DIR)
+
+
+def parse_resolution(resolution):
+    try:
+        width, height = resolution.lower().split('x')
+        return int(width), int(height)
+    except (AttributeError, ValueError):
+        return None
+
+
+def get_profile(device_type=None):
+    """
+    Returns the rendition profile of the device, with `max_size` capped
+    at the configured display resolution, or None if the device doesn't
+    need renditions or they are turned off. Containers that can't see the
+    device tree go by the board their image was built for.
+    """
+    if not settings['transcode_videos']:
+        return None
+
+    profile = RENDITION_PROFILES.get(
+        device_type or getenv('DEVICE_TYPE') or get_device_type()
+    )
+    if profile is None:
+        return None
+
+    max_width, max_height = profile['max_size']
+    resolution = parse_resolution(settings['resolution'])
+    if resolution:
+        max_width = min(max_width, resolution[0])
+        max_height = min(max_height, resolution[1])
+
+    return {**profile, 'max_size': (max_width, max_height)}
+
+
+def get_profile_key(profile):
+    # Part of the file name, so that changing the resolution or the
+    # device doesn't pick up a rendition made for another profile.
+    return '{}x{}-{}'.format(*profile['max_size'], profile['max_fps'])
+
+
+def get_rendition_path(asset_id, profile):
+    return path.join(
+        get_rendition_dir(), f'{asset_id}.{get_profile_key(profile)}.mp4'
+    )
+
+
+def lookup(asset, profile):
+    """Returns the path of the rendition of `asset`, if there is one."""
+    if profile is None or 'video' not in (asset.get('mimetype') or ''):
+        return None
+
+    rendition_path = get_rendition_path(asset['asset_id'], profile)
+    return rendition_path if path.isfile(rendition_path) else None
+
+
+def get_image_size():
+    return parse_resolution(settings['resolution']) or (1920, 1080)
+
+
+def get_image_rendition_path(md5, extension):
+    width, height = get_image_size()
+    return path.join(get_rendition_dir(), f'{md5}.{width}x{height}{extension}')
+
+
+def get_image_extensions():
+    _, extension = IMAGE_FORMATS.get(
+        settings['image_rendition_format'], IMAGE_FORMATS['jpeg']
+    )
+    return [extension, IMAGE_ALPHA_FORMAT[1]]
+
+
+def lookup_image(asset):
+    """Returns the path of the rendition of the image `asset`, if any."""
+    if 'image' not in (asset.get('mimetype') or '') or not asset.get('md5'):
+        return None
+
+    for extension in get_image_extensions():
+        rendition_path = get_image_rendition_path(asset['md5'], extension)
+        if path.isfile(rendition_path):
+            return rendition_path
+    return None
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def render_image(source, md5):
+    """
+    Writes a copy of the image at `source` that fits the display, with
+    its EXIF orientation applied. Returns its path, or None if the image
+    is fine as it is.
+    """
+    if Image is None:
+        return None
+
+    max_size = get_image_size()
+    image_format, extension = IMAGE_FORMATS.get(
+        settings['image_rendition_format'], IMAGE_FORMATS['jpeg']
+    )
+
+    with Image.open(source) as image:
+        if getattr(image, 'is_animated', False):
+            return None
+
+        orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+        # Orientations 5 to 8 swap the width and the height.
+        if orientation in (5, 6, 7, 8):
+            box = (max_size[1], max_size[0])
+        else:
+            box = max_size
+
+        if (
+            image.width <= box[0]
+            and image.height <= box[1]
+            and orientation == 1
+            and image.format in IMAGE_PASSTHROUGH_FORMATS
+        ):
+            return None
+
+        if has_alpha(image) and image_format == 'JPEG':
+            image_format, extension = IMAGE_ALPHA_FORMAT
+
+        destination = get_image_rendition_path(md5, extension)
+        if path.isfile(destination):
+            return destination
+
+        # Lets the JPEG decoder skip most of the pixels of a large image.
+        image.draft('RGB', box)
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(max_size, Image.LANCZOS)
+
+        if image_format == 'JPEG':
+            image = image.convert('RGB')
+            options = {
+                'quality': IMAGE_QUALITY,
+                'progressive': True,
+                'optimize': True,
+            }
+        elif image_format == 'WEBP':
+            options = {'quality': IMAGE_QUALITY}
+        else:
+            options = {'optimize': True}
+
+        os.makedirs(path.dirname(destination), exist_ok=True)
+        tmp_path = f'{destination}.part'
+        try:
+            image.save(tmp_path, image_format, **options)
+            os.replace(tmp_path, destination)
+        finally:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    return destination
+
+
+def probe(file_path):
+    """Returns the codec, size, frame rate and bitrate of the video."""
+    output = check_output(
+        [
+            'ffprobe',
+            '-v',
+            'error',
+            '-select_streams',
+            'v:0',
+            '-show_entries',
+            'stream=codec_name,width,height,avg_frame_rate,bit_rate'
+            ':format=bit_rate',
+            '-of',
+            'json',
+            file_path,
+        ]
+    )
+    info = json.loads(output)
+    stream = info['streams'][0]
+
+    numerator, _, denominator = stream.get('avg_frame_rate', '0/1').partition(
+        '/'
+    )
+    try:
+        fps = float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        fps = 0
+
+    bitrate = stream.get('bit_rate') or info.get('format', {}).get('bit_rate')
+
+    return {
+        'codec': stream.get('codec_name'),
+        'width': int(stream.get('width', 0)),
+        'height': int(stream.get('height', 0)),
+        'fps': fps,
+        'bitrate': int(bitrate) if bitrate else 0,
+    }
+
+
+def needs_rendition(video, profile):
+    max_width, max_height = profile['max_size']
+    return (
+        video['codec'] not in profile['codecs']
+        or video['width'] > max_width
+        or video['height'] > max_height
+        or video['fps'] > profile['max_fps'] + 1
+        or video['bitrate'] > profile['max_bitrate']
+    )
+
+
+def fit(width, height, max_width, max_height):
+    """Scales down to fit `max_width`x`max_height`, keeping even sizes."""
+    scale = min(1, max_width / width, max_height / height)
+    return int(width * scale) // 2 * 2, int(height * scale) // 2 * 2
+
+
+def transcode(source, destination, video, profile):
+    """
+    Writes an H.264 rendition of `source` within `profile` to
+    `destination`. The file only appears once it's complete.
+    """
+    width, height = fit(video['width'], video['height'], *profile['max_size'])
+    bitrate = min(
+        video['bitrate'] or profile['max_bitrate'], profile['max_bitrate']
+    )
+    tmp_path = f'{destination}.part'
+
+    filters = [f'scale={width}:{height}']
+    if video['fps'] > profile['max_fps'] + 1:
+        filters.append(f'fps={profile["max_fps"]}')
+
+    os.makedirs(path.dirname(destination), exist_ok=True)
+    try:
+        check_call(
+            [
+                'nice',
+                '-n',
+                '19',
+                'ffmpeg',
+                '-nostdin',
+                '-y',
+                '-i',
+                source,
+                '-map',
+                '0:v:0',
+                '-map',
+                '0:a:0?',
+                '-vf',
+                ','.join(filters),
+                '-c:v',
+                'libx264',
+                '-preset',
+                'veryfast',
+                '-profile:v',
+                'high',
+                '-level:v',
+                '4.1' if profile['max_fps'] <= 30 else '4.2',
+                '-pix_fmt',
+                'yuv420p',
+                '-b:v',
+                str(bitrate),
+                '-maxrate',
+                str(bitrate),
+                '-bufsize',
+                str(bitrate * 2),
+                '-c:a',
+                'aac',
+                '-b:a',
+                '128k',
+                '-movflags',
+                '+faststart',
+                '-f',
+                'mp4',
+                tmp_path,
+            ],
+            stdout=DEVNULL,
+            stderr=DEVNULL,
+        )
+        os.replace(tmp_path, destination)
+    finally:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def remove_renditions(asset_id):
+    for rendition_path in glob(
+        path.join(get_rendition_dir(), f'{asset_id}.*')
+    ):
+        try:
+            os.remove(rendition_path)
+        except OSError:
+            pass
+
+
+def remove_orphaned_renditions(keys):
+    """
+    Removes the renditions that don't belong to `keys`, the ids of the
+    video assets and the MD5s of the image assets.
+    """
+    for rendition_path in glob(path.join(get_rendition_dir(), '*')):
+        key = path.basename(rendition_path).split('.')[0]
+        if key not in keys:
+            logging.info('Removing orphaned rendition %s', rendition_path)
+            try:
+                os.remove(rendition_path)
+            except OSError:
+                pass
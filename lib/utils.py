@@ -1,7 +1,6 @@
 from __future__ import absolute_import, unicode_literals
 
 import json
-import logging
 import os
 import random
 import re
@@ -10,27 +9,19 @@ from builtins import range, str
 from datetime import datetime, timedelta
 from os import getenv, path, utime
 from platform import machine
-from subprocess import call, check_output
-from threading import Thread
-from time import sleep
+from subprocess import check_call, check_output
 from urllib.parse import urlparse
 
 import certifi
 import pytz
+import redis
 import requests
 import sh
 from future import standard_library
-from tenacity import (
-    RetryError,
-    Retrying,
-    stop_after_attempt,
-    wait_fixed,
-)
-
-from hive_app.models import Asset
+
 from lib.host_commands import build_signed_hostcmd_payload
 from lib.redis_client import connect_to_redis
-from settings import ZmqPublisher, settings
+from settings import settings
 
 standard_library.install_aliases()
 
@@ -143,6 +134,10 @@ def get_node_ip():
     and an environment variable set by `install.sh` for other environments.
     The reason for this is because we can't retrieve the host IP from
     within Docker.
+
+    Elsewhere, the host agent keeps the addresses it sees up to date in
+    Redis, so this returns the last known ones without waiting. See
+    `get_node_ip_updated_at` for how recent they are.
     """
 
     if is_balena_app():
@@ -152,59 +147,37 @@ def get_node_ip():
         return 'Unknown'
     else:
         r = connect_to_redis()
-        max_retries = 60
-        retries = 0
-
-        while True:
-            environment = getenv('ENVIRONMENT', None)
-            if environment in ['development', 'test']:
-                break
-
-            is_ready = r.get('host_agent_ready') or 'false'
+        ip_addresses = r.get('ip_addresses')
 
-            if json.loads(is_ready):
-                break
+        if ip_addresses:
+            return ' '.join(json.loads(ip_addresses))
 
-            if retries >= max_retries:
-                logging.info(
-                    'host_agent_service is not ready after %d retries',
-                    max_retries,
-                )
-                break
+        # The host agent hasn't stored any yet, e.g. it was just
+        # started. Ask it to, for the next caller.
+        r.publish('hostcmd', build_signed_hostcmd_payload('set_ip_addresses'))
 
-            retries += 1
-            sleep(1)
+        if os.getenv('MY_IP'):
+            return os.getenv('MY_IP')
 
-        r.publish('hostcmd', build_signed_hostcmd_payload('set_ip_addresses'))
+    return 'Unable to retrieve IP.'
 
-        try:
-            for attempt in Retrying(
-                stop=stop_after_attempt(20),
-                wait=wait_fixed(1),
-            ):
-                environment = getenv('ENVIRONMENT', None)
-                if environment in ['development', 'test']:
-                    break
-
-                with attempt:
-                    ip_addresses_ready = r.get('ip_addresses_ready') or 'false'
-                    if json.loads(ip_addresses_ready):
-                        break
-                    else:
-                        raise Exception(
-                            'Internet connection is not available.'
-                        )
-        except RetryError:
-            logging.warning('Internet connection is not available. ')
 
-        ip_addresses = r.get('ip_addresses')
+def get_node_ip_updated_at():
+    """
+    Returns when the host agent last saw the addresses returned by
+    `get_node_ip`, or None if that isn't known.
+    """
+    if is_balena_app():
+        return None
 
-        if ip_addresses:
-            return ' '.join(json.loads(ip_addresses))
-        elif os.getenv('MY_IP'):
-            return os.getenv('MY_IP')
+    try:
+        updated_at = connect_to_redis().get('ip_addresses_updated_at')
+    except redis.RedisError:
+        return None
 
-    return 'Unable to retrieve IP.'
+    if not updated_at:
+        return None
+    return datetime.fromtimestamp(float(updated_at), pytz.utc)
 
 
 def get_node_mac_address():
@@ -418,48 +391,26 @@ def url_fails(url):
 
 
 def download_video_from_youtube(uri, asset_id):
-    home = getenv('HOME')
-    name = check_output(['yt-dlp', '-O', 'title', uri])
+    """
+    Downloads a YouTube video to the asset directory. Returns its path,
+    title and duration. Blocks until the download is done, so only call
+    it from a Celery task.
+    """
     info = json.loads(check_output(['yt-dlp', '-j', uri]))
-    duration = info['duration']
-
-    location = path.join(home, 'screenly_assets', f'{asset_id}.mp4')
-    thread = YoutubeDownloadThread(location, uri, asset_id)
-    thread.daemon = True
-    thread.start()
-
-    return location, str(name.decode('utf-8')), duration
-
-
-class YoutubeDownloadThread(Thread):
-    def __init__(self, location, uri, asset_id):
-        Thread.__init__(self)
-        self.location = location
-        self.uri = uri
-        self.asset_id = asset_id
-
-    def run(self):
-        publisher = ZmqPublisher.get_instance()
-        call(
-            [
-                'yt-dlp',
-                '-S',
-                'vcodec:h264,fps,res:1080,acodec:m4a',
-                '-o',
-                self.location,
-                self.uri,
-            ]
-        )
-
-        try:
-            asset = Asset.objects.get(asset_id=self.asset_id)
-            asset.is_processing = 0
-            asset.save()
-        except Asset.DoesNotExist:
-            logging.warning('Asset %s not found', self.asset_id)
-            return
+    location = path.join(getenv('HOME'), 'screenly_assets', f'{asset_id}.mp4')
+
+    check_call(
+        [
+            'yt-dlp',
+            '-S',
+            'vcodec:h264,fps,res:1080,acodec:m4a',
+            '-o',
+            location,
+            uri,
+        ]
+    )
 
-        publisher.send_to_ws_server(self.asset_id)
+    return location, info['title'], info['duration']
 
 
 def template_handle_unicode(value):
@@ -1,16 +1,75 @@
+from os import environ, getenv
+
+import psutil
 from gunicorn.app.base import Application
 
 from hive_django import wsgi
+from lib.device_helper import get_device_type
+from lib.messaging.zmq_proxy import PROXY_ENV, start_proxy
+from lib.utils import string_to_bool
 from settings import LISTEN, PORT
 
+# The Pi 1 and 2 can't spare the memory for a second worker.
+SINGLE_WORKER_DEVICES = ['pi1', 'pi2']
+# One worker per GB of memory, the rest is left to the viewer and the
+# other containers.
+MEMORY_PER_WORKER = 1 << 30
+MAX_WORKERS = 4
+
+
+def get_default_workers():
+    if (getenv('DEVICE_TYPE') or get_device_type()) in SINGLE_WORKER_DEVICES:
+        return 1
+
+    by_memory = psutil.virtual_memory().total // MEMORY_PER_WORKER
+    return max(1, min(psutil.cpu_count() or 1, by_memory, MAX_WORKERS))
+
+
+def get_options():
+    """
+    The defaults fit the device, each can be overridden with the
+    matching `GUNICORN_*` environment variable.
+    """
+    workers = int(getenv('GUNICORN_WORKERS') or get_default_workers())
+
+    options = {
+        'bind': f'{LISTEN}:{PORT}',
+        'workers': workers,
+        # `gevent` serves many slow clients with little memory, but
+        # anything that blocks without yielding (e.g. ZeroMQ) holds up
+        # every request of the worker.
+        'worker_class': getenv('GUNICORN_WORKER_CLASS', 'gthread'),
+        'threads': int(getenv('GUNICORN_THREADS', 4)),
+        'worker_connections': int(getenv('GUNICORN_WORKER_CONNECTIONS', 100)),
+        'timeout': int(getenv('GUNICORN_TIMEOUT', 20)),
+        'keepalive': int(getenv('GUNICORN_KEEPALIVE', 5)),
+        # Recycles workers now and then, staggered so that they don't all
+        # restart at once.
+        'max_requests': int(getenv('GUNICORN_MAX_REQUESTS', 1000)),
+        'max_requests_jitter': int(
+            getenv('GUNICORN_MAX_REQUESTS_JITTER', 100)
+        ),
+        # Workers share the memory of the loaded app until they write to
+        # it.
+        'preload_app': string_to_bool(
+            getenv('GUNICORN_PRELOAD', str(workers > 1))
+        ),
+    }
+
+    if workers > 1:
+        options['on_starting'] = on_starting
+
+    return options
+
+
+def on_starting(server):
+    environ[PROXY_ENV] = '1'
+    start_proxy()
+
 
 class GunicornApplication(Application):
     def init(self, parser, opts, args):
-        return {
-            'bind': f'{LISTEN}:{PORT}',
-            'threads': 2,
-            'timeout': 20,
-        }
+        return get_options()
 
     def load(self):
         return wsgi.application
@@ -4,9 +4,13 @@ from __future__ import unicode_literals
 
 import configparser
 import logging
+import os
+import tempfile
 from builtins import str
 from collections import UserDict
-from os import getenv, makedirs, path
+from io import StringIO
+from os import getenv, makedirs, path, stat
+from threading import RLock
 
 from lib.auth import BasicAuth, NoAuth
 from lib.messaging import ZmqCollector, ZmqConsumer, ZmqPublisher
@@ -35,6 +39,10 @@ DEFAULTS = {
         'shuffle_playlist': False,
         'verify_ssl': True,
         'default_assets': False,
+        'playlist_poll_interval': 30,
+        'asset_cache_max_bytes': 2 * 1024**3,
+        'transcode_videos': True,
+        'image_rendition_format': 'jpeg',
     },
 }
 CONFIGURABLE_SETTINGS = DEFAULTS['viewer'].copy()
@@ -63,6 +71,15 @@ class HIVESettings(UserDict):
     """HIVE' Settings."""
 
     def __init__(self, *args, **kwargs):
+        # What screenly.conf looked like when it was last parsed, and
+        # whether a setting was changed in memory since.
+        self.file_signature = None
+        self.modified = False
+        # Goes up every time screenly.conf is parsed.
+        self.version = 0
+        # Keeps a thread from reloading while another one is in the middle
+        # of changing and saving the settings.
+        self.lock = RLock()
         UserDict.__init__(self, *args, **kwargs)
         self.home = getenv('HOME')
         self.conf_file = self.get_configfile()
@@ -81,14 +98,18 @@ class HIVESettings(UserDict):
         else:
             self.load()
 
+    def __setitem__(self, key, value):
+        self.modified = True
+        UserDict.__setitem__(self, key, value)
+
     def _get(self, config, section, field, default):
         try:
             if isinstance(default, bool):
-                self[field] = config.getboolean(section, field)
+                value = config.getboolean(section, field)
             elif isinstance(default, int):
-                self[field] = config.getint(section, field)
+                value = config.getint(section, field)
             else:
-                self[field] = config.get(section, field)
+                value = config.get(section, field)
         except configparser.Error as e:
             logging.debug(
                 "Could not parse setting '%s.%s': %s. "
@@ -98,9 +119,17 @@ class HIVESettings(UserDict):
                 str(e),
                 default,
             )
-            self[field] = default
+            value = default
         if field in ['database', 'assetdir']:
-            self[field] = str(path.join(self.home, self[field]))
+            value = str(path.join(self.home, value))
+        return value
+
+    def get_file_signature(self):
+        try:
+            conf_stat = stat(self.conf_file)
+        except OSError:
+            return None
+        return conf_stat.st_ino, conf_stat.st_mtime_ns, conf_stat.st_size
 
     def _set(self, config, section, field, default):
         if isinstance(default, bool):
@@ -110,15 +139,37 @@ class HIVESettings(UserDict):
         else:
             config.set(section, field, str(self.get(field, default)))
 
-    def load(self):
-        """Loads the latest settings from screenly.conf into memory."""
-        logging.debug('Reading config-file...')
-        config = configparser.ConfigParser()
-        config.read(self.conf_file)
+    def load(self, force=False):
+        """
+        Loads the latest settings from screenly.conf into memory. The file
+        is only parsed again if it changed since the last time, so this is
+        cheap enough to call before every use of the settings.
+        """
+        with self.lock:
+            file_signature = self.get_file_signature()
+            if (
+                not force
+                and not self.modified
+                and file_signature is not None
+                and file_signature == self.file_signature
+            ):
+                return
 
-        for section, defaults in list(DEFAULTS.items()):
-            for field, default in list(defaults.items()):
-                self._get(config, section, field, default)
+            logging.debug('Reading config-file...')
+            config = configparser.ConfigParser()
+            config.read(self.conf_file)
+
+            data = {}
+            for section, defaults in list(DEFAULTS.items()):
+                for field, default in list(defaults.items()):
+                    data[field] = self._get(config, section, field, default)
+
+            # Swapped in as a whole, so that other threads see either the
+            # old or the new settings and never a mix of both.
+            self.data = data
+            self.file_signature = file_signature
+            self.modified = False
+            self.version += 1
 
     def use_defaults(self):
         for defaults in list(DEFAULTS.items()):
@@ -126,17 +177,76 @@ class HIVESettings(UserDict):
                 self[field] = default
 
     def save(self):
-        # Write new settings to disk.
+        """
+        Writes the settings to screenly.conf, unless they are the same as
+        what's in it. The file is replaced in one go, so a power cut
+        leaves either the old or the new settings, never a partial file.
+        """
         config = configparser.ConfigParser()
         for section, defaults in list(DEFAULTS.items()):
             config.add_section(section)
             for field, default in list(defaults.items()):
                 self._set(config, section, field, default)
-        makedirs(self.get_configdir(), exist_ok=True)
-        with open(self.conf_file, 'w') as f:
-            config.write(f)
+        content = StringIO()
+        config.write(content)
+        content = content.getvalue()
+
+        try:
+            with open(self.conf_file) as f:
+                unchanged = f.read() == content
+        except OSError:
+            unchanged = False
+
+        if not unchanged:
+            self._write(content)
         self.load()
 
+    def _write(self, content):
+        conf_dir = path.dirname(self.conf_file)
+        makedirs(conf_dir, exist_ok=True)
+
+        # mkstemp creates the file readable by its owner only.
+        try:
+            mode = stat(self.conf_file).st_mode & 0o777
+        except FileNotFoundError:
+            mode = 0o644
+
+        # A temp file of its own, so that processes saving at the same
+        # time don't write into each other's.
+        fd, tmp_file = tempfile.mkstemp(
+            dir=conf_dir, prefix=f'{path.basename(self.conf_file)}.'
+        )
+        try:
+            with os.fdopen(fd, 'w') as f:
+                os.fchmod(f.fileno(), mode)
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.conf_file)
+        except BaseException:
+            try:
+                os.unlink(tmp_file)
+            except OSError:
+                pass
+            raise
+
+        # Makes the rename itself durable.
+        dir_fd = os.open(conf_dir, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    def update_and_save(self, **fields):
+        """
+        Sets all of `fields` and saves them with a single write, e.g.
+        `settings.update_and_save(player_name='Lobby', show_splash=False)`.
+        """
+        with self.lock:
+            for field, value in fields.items():
+                self[field] = value
+            self.save()
+
     def get_configdir(self):
         return path.join(self.home, CONFIG_DIR)
 
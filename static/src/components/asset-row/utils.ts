@@ -202,28 +202,12 @@ export const handleDownload = async (
     if (result.type === 'url') {
       window.open(result.url)
     } else if (result.type === 'file') {
-      // Convert base64 to byte array
-      const content = atob(result.content)
-      const bytes = new Uint8Array(content.length)
-      for (let i = 0; i < content.length; i++) {
-        bytes[i] = content.charCodeAt(i)
-      }
-
-      const mimetype = result.mimetype
-      const filename = result.filename
-
-      // Create blob and download
-      const blob = new Blob([bytes], { type: mimetype })
-      const url = URL.createObjectURL(blob)
-
+      // Let the browser stream the file instead of decoding base64.
       const a = document.createElement('a')
       document.body.appendChild(a)
-      a.download = filename
-      a.href = url
+      a.download = result.filename
+      a.href = result.download_url
       a.click()
-
-      // Clean up
-      URL.revokeObjectURL(url)
       a.remove()
     }
   } catch {}
@@ -32,9 +32,13 @@ export const Backup = () => {
     uploadButton.disabled = true
 
     try {
-      const result = await dispatch(createBackup()).unwrap()
+      const result = await dispatch(
+        createBackup((percent) => {
+          backupButton.textContent = `Preparing archive... ${percent}%`
+        }),
+      ).unwrap()
       if (result) {
-        window.location.href = `/static_with_mime/${result}?mime=application/x-tgz`
+        window.location.href = `/static_with_mime/${result}?mime=application/x-tar`
       }
     } catch (err) {
       await Swal.fire({
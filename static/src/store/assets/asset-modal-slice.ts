@@ -9,6 +9,71 @@ import {
 } from '@/types'
 import { getMimetype } from '@/components/add-asset-modal/file-upload-utils'
 
+const UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+const UPLOAD_MAX_RETRIES = 5
+
+interface UploadSession {
+  upload_id: string
+  size: number
+  offset: number
+}
+
+const requestJson = async (url: string, init?: RequestInit) => {
+  const response = await fetch(url, init)
+  if (!response.ok) {
+    throw new Error(`Upload failed with status ${response.status}`)
+  }
+  return response.json()
+}
+
+// Sends one chunk starting at `offset`. Resolves with the upload session
+// as seen by the server once the chunk has been written.
+const sendChunk = (
+  uploadId: string,
+  file: File,
+  offset: number,
+  onProgress: (loaded: number) => void,
+): Promise<UploadSession> => {
+  const end = Math.min(offset + UPLOAD_CHUNK_SIZE, file.size)
+  const xhr = new XMLHttpRequest()
+
+  return new Promise((resolve, reject) => {
+    xhr.upload.addEventListener('progress', (e) => {
+      onProgress(offset + e.loaded)
+    })
+
+    xhr.addEventListener('load', () => {
+      if (xhr.status >= 200 && xhr.status < 300) {
+        try {
+          resolve(JSON.parse(xhr.responseText))
+        } catch {
+          reject(new Error('Invalid JSON response'))
+        }
+      } else {
+        reject(new Error(`Upload failed with status ${xhr.status}`))
+      }
+    })
+
+    xhr.addEventListener('error', () => {
+      reject(new Error('Network error during upload'))
+    })
+
+    xhr.addEventListener('abort', () => {
+      reject(new Error('Upload aborted'))
+    })
+
+    xhr.open('PUT', `/api/v2/uploads/${uploadId}`)
+    if (file.size > 0) {
+      xhr.setRequestHeader(
+        'Content-Range',
+        `bytes ${offset}-${end - 1}/${file.size}`,
+      )
+    }
+    xhr.setRequestHeader('Content-Type', 'application/octet-stream')
+    xhr.send(file.slice(offset, end))
+  })
+}
+
 // Async thunks for API operations
 export const uploadFile = createAsyncThunk(
   'assetModal/uploadFile',
@@ -17,49 +82,44 @@ export const uploadFile = createAsyncThunk(
     { dispatch, getState, rejectWithValue },
   ) => {
     try {
-      const formData = new FormData()
-      formData.append('file_upload', file)
+      const session: UploadSession = await requestJson('/api/v2/uploads', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ filename: file.name, size: file.size }),
+      })
+      const uploadUrl = `/api/v2/uploads/${session.upload_id}`
 
-      // Create XMLHttpRequest for progress tracking
-      const xhr = new XMLHttpRequest()
+      const onProgress = (loaded: number) => {
+        if (file.size > 0) {
+          dispatch(setUploadProgress(Math.round((loaded / file.size) * 100)))
+        }
+      }
 
-      const uploadPromise = new Promise((resolve, reject) => {
-        xhr.upload.addEventListener('progress', (e) => {
-          if (e.lengthComputable) {
-            const progress = Math.round((e.loaded / e.total) * 100)
-            dispatch(setUploadProgress(progress))
+      // Send the file in chunks. After a failure, ask the server how much
+      // it got and carry on from there.
+      let offset = 0
+      let retries = 0
+      do {
+        try {
+          offset = (
+            await sendChunk(session.upload_id, file, offset, onProgress)
+          ).offset
+          retries = 0
+        } catch (error) {
+          if (++retries > UPLOAD_MAX_RETRIES) {
+            throw error
           }
-        })
-
-        xhr.addEventListener('load', () => {
-          if (xhr.status >= 200 && xhr.status < 300) {
-            try {
-              const response = JSON.parse(xhr.responseText)
-              resolve(response)
-            } catch {
-              reject(new Error('Invalid JSON response'))
-            }
-          } else {
-            reject(new Error(`Upload failed with status ${xhr.status}`))
-          }
-        })
-
-        xhr.addEventListener('error', () => {
-          reject(new Error('Network error during upload'))
-        })
+          await new Promise((resolve) => setTimeout(resolve, 1000 * retries))
+          offset = (await requestJson(uploadUrl)).offset
+        }
+      } while (offset < file.size)
 
-        xhr.addEventListener('abort', () => {
-          reject(new Error('Upload aborted'))
-        })
+      const response = await requestJson(`${uploadUrl}/finalize`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({}),
       })
 
-      // Start the upload
-      xhr.open('POST', '/api/v2/file_asset')
-      xhr.send(formData)
-
-      // Wait for upload to complete
-      const response = await uploadPromise
-
       // Get mimetype and duration
       const mimetype = getMimetype(file.name)
       const mimetypeString = Array.isArray(mimetype) ? mimetype[0] : mimetype
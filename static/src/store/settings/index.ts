@@ -92,9 +92,14 @@ export const updateSettings = createAsyncThunk(
   },
 )
 
+const BACKUP_POLL_INTERVAL = 1000
+
 export const createBackup = createAsyncThunk(
   'settings/createBackup',
-  async (_, { rejectWithValue }) => {
+  async (
+    onProgress: ((percent: number) => void) | undefined,
+    { rejectWithValue },
+  ) => {
     try {
       const response = await fetch('/api/v2/backup', {
         method: 'POST',
@@ -104,8 +109,29 @@ export const createBackup = createAsyncThunk(
         throw new Error('Failed to create backup')
       }
 
-      const data = await response.json()
-      return data
+      // The backup is made in the background, poll until it's done.
+      const { task_id: taskId } = await response.json()
+      for (;;) {
+        await new Promise((resolve) =>
+          setTimeout(resolve, BACKUP_POLL_INTERVAL),
+        )
+
+        const statusResponse = await fetch(`/api/v2/backup/${taskId}`)
+        if (!statusResponse.ok) {
+          throw new Error('Failed to get backup progress')
+        }
+
+        const data = await statusResponse.json()
+        if (data.status === 'SUCCESS') {
+          return data.filename
+        }
+        if (data.status === 'FAILURE') {
+          throw new Error(data.error || 'Failed to create backup')
+        }
+        if (data.status === 'PROGRESS' && data.total && onProgress) {
+          onProgress(Math.floor((data.done / data.total) * 100))
+        }
+      }
     } catch (error) {
       return rejectWithValue((error as Error).message)
     }
@@ -114,7 +140,7 @@ export const createBackup = createAsyncThunk(
 
 export const uploadBackup = createAsyncThunk(
   'settings/uploadBackup',
-  async (file: File, { rejectWithValue }) => {
+  async (file: File, { dispatch, rejectWithValue }) => {
     try {
       const formData = new FormData()
       formData.append('backup_upload', file)
@@ -130,7 +156,32 @@ export const uploadBackup = createAsyncThunk(
         throw new Error(data.error || 'Failed to upload backup')
       }
 
-      return data
+      // The backup is restored in the background, poll until it's done.
+      for (;;) {
+        await new Promise((resolve) =>
+          setTimeout(resolve, BACKUP_POLL_INTERVAL),
+        )
+
+        const statusResponse = await fetch(
+          `/api/v2/recover/${data.task_id}`,
+        )
+        const state = await statusResponse.json()
+        if (!statusResponse.ok) {
+          throw new Error(state.error || 'Failed to get recovery progress')
+        }
+
+        if (state.status === 'SUCCESS') {
+          return 'Recovery successful.'
+        }
+        if (state.status === 'FAILURE') {
+          throw new Error(state.error || 'Failed to restore backup')
+        }
+        if (state.status === 'PROGRESS' && state.total) {
+          dispatch(
+            setUploadProgress(Math.floor((state.done / state.total) * 100)),
+          )
+        }
+      }
     } catch (error) {
       return rejectWithValue((error as Error).message)
     }
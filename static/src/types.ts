@@ -219,6 +219,7 @@ export interface SaveAssetParams {
 export interface FileData {
   uri: string
   ext: string
+  md5: string
 }
 
 export interface FormData {
@@ -0,0 +1,110 @@
+import hashlib
+import logging
+import shutil
+import tempfile
+import unittest
+from os import path
+
+import mock
+
+from viewer.asset_cache import AssetCache
+
+logging.disable(logging.CRITICAL)
+
+
+def make_asset(asset_id, uri, **kwargs):
+    return {
+        'asset_id': asset_id,
+        'uri': uri,
+        'mimetype': 'image',
+        'nocache': False,
+        **kwargs,
+    }
+
+
+def make_response(content=b'', status_code=200, headers=None):
+    response = mock.MagicMock()
+    response.__enter__.return_value = response
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.iter_content.return_value = [content]
+    return response
+
+
+class AssetCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = AssetCache(directory=self.directory, max_bytes=10)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    @mock.patch('requests.get')
+    def test_download_should_store_blob_by_md5(self, get_mock):
+        get_mock.return_value = make_response(b'image', headers={'ETag': 'x'})
+        asset = make_asset('a', 'https://example.com/a.png')
+
+        self.cache.download(asset)
+
+        digest = hashlib.md5(b'image').hexdigest()
+        self.assertEqual(
+            self.cache.lookup(asset),
+            path.join(self.directory, f'{digest}.png'),
+        )
+
+    @mock.patch('requests.get')
+    def test_revalidation_should_send_validators(self, get_mock):
+        asset = make_asset('a', 'https://example.com/a.png')
+        get_mock.return_value = make_response(
+            b'image', headers={'ETag': 'x', 'Last-Modified': 'yesterday'}
+        )
+        self.cache.download(asset)
+
+        get_mock.return_value = make_response(status_code=304)
+        self.cache.download(asset)
+
+        headers = get_mock.call_args[1]['headers']
+        self.assertEqual(headers['If-None-Match'], 'x')
+        self.assertEqual(headers['If-Modified-Since'], 'yesterday')
+        self.assertIsNotNone(self.cache.lookup(asset))
+
+    @mock.patch('requests.get')
+    def test_least_recently_used_blob_should_be_evicted(self, get_mock):
+        first = make_asset('a', 'https://example.com/a.png')
+        second = make_asset('b', 'https://example.com/b.png')
+        third = make_asset('c', 'https://example.com/c.png')
+
+        for asset, content in [(first, b'aaaa'), (second, b'bbbb')]:
+            get_mock.return_value = make_response(content)
+            self.cache.download(asset)
+
+        self.cache.lookup(first)
+        get_mock.return_value = make_response(b'cccc')
+        self.cache.download(third)
+
+        self.assertIsNotNone(self.cache.lookup(first))
+        self.assertIsNone(self.cache.lookup(second))
+        self.assertIsNotNone(self.cache.lookup(third))
+        self.assertEqual(self.cache.size, 8)
+
+    def test_nocache_and_web_assets_should_not_be_cached(self):
+        with mock.patch.object(self.cache.executor, 'submit') as submit:
+            self.cache.prefetch(
+                [
+                    make_asset('a', 'https://example.com/a.png', nocache=True),
+                    make_asset('b', 'https://example.com', mimetype='webpage'),
+                    make_asset('c', '/data/screenly_assets/c.png'),
+                ]
+            )
+
+        submit.assert_not_called()
+
+    @mock.patch('requests.get')
+    def test_index_should_survive_restart(self, get_mock):
+        asset = make_asset('a', 'https://example.com/a.png')
+        get_mock.return_value = make_response(b'image')
+        self.cache.download(asset)
+
+        cache = AssetCache(directory=self.directory, max_bytes=10)
+
+        self.assertEqual(cache.lookup(asset), self.cache.lookup(asset))
@@ -1,10 +1,18 @@
 import hashlib
+import os
+import subprocess
+import sys
+import tempfile
+from base64 import b64encode
 from unittest import TestCase
 
+import mock
 from django.conf import settings as django_settings
+from django.contrib.auth.hashers import check_password as django_check_password
 from django.contrib.auth.hashers import make_password
+from django.http import HttpRequest
 
-from lib.auth import BasicAuth
+from lib.auth import BasicAuth, authorized
 
 if not django_settings.configured:
     django_settings.configure(
@@ -12,10 +20,20 @@ if not django_settings.configured:
     )
 
 
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
 class DummySettings(dict):
+    def load(self):
+        pass
+
     def save(self):
         self['saved'] = True
 
+    def update_and_save(self, **fields):
+        self.update(fields)
+        self.save()
+
 
 class BasicAuthTest(TestCase):
     def test_legacy_sha256_password_is_migrated(self):
@@ -28,8 +46,129 @@ class BasicAuthTest(TestCase):
         self.assertTrue(settings.get('saved'))
         self.assertNotEqual(len(settings['password']), 64)
 
+    def test_legacy_password_changed_elsewhere_is_not_upgraded(self):
+        legacy_password = hashlib.sha256(b'secret').hexdigest()
+        settings = DummySettings(user='admin', password=legacy_password)
+
+        def load():
+            settings['password'] = make_password('changed')
+
+        settings.load = load
+        auth = BasicAuth(settings)
+
+        self.assertFalse(auth.check_password('secret'))
+        self.assertFalse(settings.get('saved'))
+
     def test_modern_hash_is_checked(self):
         settings = DummySettings(user='admin', password=make_password('secret'))
         auth = BasicAuth(settings)
         self.assertTrue(auth.check_password('secret'))
         self.assertFalse(auth.check_password('bad'))
+
+
+class VerifiedCredentialsTest(TestCase):
+    def setUp(self):
+        self.settings = DummySettings(
+            user='admin', password=make_password('secret')
+        )
+        self.auth = BasicAuth(self.settings)
+        BasicAuth._verified.clear()
+        self.addCleanup(BasicAuth._verified.clear)
+
+    def test_password_is_hashed_once(self):
+        with mock.patch(
+            'lib.auth.django_check_password', wraps=django_check_password
+        ) as m_check_password:
+            self.assertTrue(self.auth._check('admin', 'secret'))
+            self.assertTrue(self.auth._check('admin', 'secret'))
+            self.assertFalse(self.auth._check('admin', 'bad'))
+            self.assertFalse(self.auth._check('other', 'secret'))
+
+        self.assertEqual(m_check_password.call_count, 2)
+
+    def test_password_change_invalidates_cache(self):
+        self.assertTrue(self.auth._check('admin', 'secret'))
+
+        self.settings['password'] = make_password('changed')
+
+        self.assertFalse(self.auth._check('admin', 'secret'))
+        self.assertTrue(self.auth._check('admin', 'changed'))
+
+    def test_session_token(self):
+        request = mock.Mock(headers={}, session={})
+        self.auth.store_session(request, 'admin')
+
+        self.assertNotIn('auth_password', request.session)
+        with mock.patch('lib.auth.django_check_password') as m_check_password:
+            self.assertTrue(self.auth.is_authenticated(request))
+        m_check_password.assert_not_called()
+
+        self.settings['password'] = make_password('changed')
+        self.assertFalse(self.auth.is_authenticated(request))
+
+    def test_password_session_is_upgraded(self):
+        request = mock.Mock(
+            headers={},
+            session={'auth_username': 'admin', 'auth_password': 'secret'},
+        )
+
+        self.assertTrue(self.auth.is_authenticated(request))
+        self.assertNotIn('auth_password', request.session)
+        self.assertIn('auth_token', request.session)
+
+
+class CredentialsChangedElsewhereTest(TestCase):
+    def setUp(self):
+        from settings import HIVESettings
+
+        home = tempfile.TemporaryDirectory()
+        self.addCleanup(home.cleanup)
+        self.home = home.name
+
+        with mock.patch.dict(os.environ, {'HOME': self.home}):
+            self.settings = HIVESettings()
+        self.settings.update_and_save(
+            auth_backend='auth_basic',
+            user='admin',
+            password=make_password('secret'),
+        )
+
+        BasicAuth._verified.clear()
+        self.addCleanup(BasicAuth._verified.clear)
+
+        with mock.patch('settings.settings', self.settings):
+            self.view = authorized(lambda request: 'ok')
+
+    def request(self, password):
+        request = HttpRequest()
+        request.session = {}
+        credentials = b64encode(f'admin:{password}'.encode('utf-8'))
+        request.META['HTTP_AUTHORIZATION'] = 'Basic ' + credentials.decode()
+        with mock.patch.object(
+            BasicAuth, 'authenticate', return_value='login'
+        ):
+            return self.view(request)
+
+    def change_password_in_another_process(self, password):
+        legacy_password = hashlib.sha256(password.encode('utf-8')).hexdigest()
+        subprocess.run(
+            [
+                sys.executable,
+                '-c',
+                'from settings import HIVESettings; '
+                'HIVESettings().update_and_save('
+                f'password={legacy_password!r})',
+            ],
+            cwd=REPO_DIR,
+            env={**os.environ, 'HOME': self.home},
+            check=True,
+        )
+
+    def test_old_password_is_rejected(self):
+        self.assertEqual(self.request('secret'), 'ok')
+
+        self.change_password_in_another_process('changed')
+
+        self.assertEqual(self.request('secret'), 'login')
+        self.assertEqual(self.request('changed'), 'ok')
+        self.assertNotEqual(len(self.settings['password']), 64)
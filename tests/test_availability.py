@@ -0,0 +1,75 @@
+import logging
+from unittest import TestCase
+
+import mock
+
+from viewer.availability import AvailabilityProber
+
+logging.disable(logging.CRITICAL)
+
+REMOTE_URI = 'https://example.com/image.png'
+
+
+class AvailabilityProberTest(TestCase):
+    def create_prober(self, check, **kwargs):
+        self.check = mock.Mock(side_effect=check)
+        return AvailabilityProber(check=self.check, **kwargs)
+
+    def wait(self, prober):
+        prober.executor.shutdown(wait=True)
+
+    def test_unknown_uri_should_be_optimistic_and_probed(self):
+        prober = self.create_prober(lambda uri: True)
+
+        self.assertTrue(prober.is_available(REMOTE_URI))
+        self.wait(prober)
+
+        self.assertFalse(prober.is_available(REMOTE_URI))
+        stats = prober.get_stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['failures'], 1)
+
+    def test_prefetch_should_skip_local_and_unchecked_assets(self):
+        prober = self.create_prober(lambda uri: False)
+        prober.prefetch(
+            [
+                {'uri': '/data/screenly_assets/a.png'},
+                {'uri': REMOTE_URI, 'skip_asset_check': True},
+            ]
+        )
+        self.wait(prober)
+
+        self.check.assert_not_called()
+
+    def test_fresh_result_should_not_be_probed_again(self):
+        prober = self.create_prober(lambda uri: False, ttl=60)
+        prober.prefetch([{'uri': REMOTE_URI}])
+        prober.executor.shutdown(wait=True)
+
+        prober.prefetch([{'uri': REMOTE_URI}])
+
+        self.check.assert_called_once_with(REMOTE_URI)
+        self.assertTrue(prober.is_available(REMOTE_URI))
+
+    def test_failures_should_back_off_exponentially(self):
+        prober = self.create_prober(
+            lambda uri: True, retry_delay=10, max_retry_delay=25
+        )
+
+        with mock.patch('viewer.availability.monotonic', return_value=100):
+            for _ in range(3):
+                prober.probe(REMOTE_URI)
+                retry_in = prober.cache[REMOTE_URI]['expires'] - 100
+
+        self.assertEqual(retry_in, 25)
+        self.assertEqual(prober.cache[REMOTE_URI]['failures'], 3)
+
+    def test_crashing_check_should_count_as_unavailable(self):
+        def check(uri):
+            raise ValueError
+
+        prober = self.create_prober(check)
+        prober.probe(REMOTE_URI)
+
+        self.assertFalse(prober.is_available(REMOTE_URI))
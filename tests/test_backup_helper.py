@@ -1,11 +1,22 @@
+import io
+import json
 import shutil
+import tarfile
 import unittest
 from datetime import datetime
-from os import getenv, path
+from os import getenv, listdir, makedirs, path, remove
 
 import mock
 
-from lib.backup_helper import create_backup, recover, static_dir
+from lib.backup_helper import (
+    BackupError,
+    create_backup,
+    get_latest_backup,
+    manifest_dir,
+    manifest_name,
+    recover,
+    static_dir,
+)
 
 home = getenv('HOME')
 
@@ -13,9 +24,7 @@ home = getenv('HOME')
 class BackupHelperTest(unittest.TestCase):
     def setUp(self):
         self.dt = datetime(2016, 7, 19, 12, 42, 12)
-        self.expected_archive_name = (
-            'anthias-backup-2016-07-19T12-42-12.tar.gz'
-        )
+        self.expected_archive_name = 'anthias-backup-2016-07-19T12-42-12.tar'
         self.assertFalse(path.isdir(path.join(home, static_dir)))
 
     def tearDown(self):
@@ -23,6 +32,22 @@ class BackupHelperTest(unittest.TestCase):
             path.join(home, 'screenly'),
             ignore_errors=True,
         )
+        shutil.rmtree(path.join(home, manifest_dir), ignore_errors=True)
+        for name in ['unchanged.jpg', 'changed.jpg']:
+            try:
+                remove(path.join(home, 'screenly_assets', name))
+            except OSError:
+                pass
+
+    def write_asset(self, name, content):
+        with open(path.join(home, 'screenly_assets', name), 'wb') as f:
+            f.write(content)
+
+    def read_archive(self, archive_name):
+        file_path = path.join(home, static_dir, archive_name)
+        with tarfile.open(file_path) as tar:
+            manifest = json.load(tar.extractfile(manifest_name))
+            return tar.getnames(), manifest
 
     def get_patched_datetime(self):
         return mock.patch('lib.backup_helper.datetime')
@@ -41,3 +66,132 @@ class BackupHelperTest(unittest.TestCase):
         self.assertTrue(path.isfile(file_path))
         recover(file_path)
         self.assertFalse(path.isfile(file_path))
+
+    def test_full_backup(self):
+        self.write_asset('unchanged.jpg', b'unchanged')
+
+        names, manifest = self.read_archive(create_backup())
+
+        self.assertEqual(names[0], manifest_name)
+        self.assertIn('.screenly', names)
+        self.assertIn('screenly_assets', names)
+        self.assertIn('.screenly/screenly.db', names)
+        self.assertIn('screenly_assets/unchanged.jpg', names)
+        self.assertIsNone(manifest['base'])
+        self.assertEqual(
+            manifest['files']['screenly_assets/unchanged.jpg']['size'], 9
+        )
+
+    def test_incremental_backup(self):
+        self.write_asset('unchanged.jpg', b'unchanged')
+        self.write_asset('changed.jpg', b'before')
+        with self.get_patched_datetime() as mock_datetime:
+            mock_datetime.now.return_value = self.dt
+            base = create_backup()
+        self.assertEqual(get_latest_backup(), base)
+
+        self.write_asset('changed.jpg', b'after')
+        names, manifest = self.read_archive(create_backup(base=base))
+
+        self.assertEqual(manifest['base'], base)
+        self.assertIn('screenly_assets/changed.jpg', names)
+        self.assertNotIn('screenly_assets/unchanged.jpg', names)
+        self.assertIn('.screenly/screenly.db', names)
+        # Still listed, so that the next backup can be based on this one.
+        self.assertIn('screenly_assets/unchanged.jpg', manifest['files'])
+
+    def test_deleted_backups_are_not_used_as_base(self):
+        base = create_backup()
+        remove(path.join(home, static_dir, base))
+
+        self.assertIsNone(get_latest_backup())
+
+    def make_incremental_backup(self):
+        self.write_asset('unchanged.jpg', b'unchanged')
+        self.write_asset('changed.jpg', b'before')
+        with self.get_patched_datetime() as mock_datetime:
+            mock_datetime.now.return_value = self.dt
+            base = create_backup()
+        self.write_asset('changed.jpg', b'after')
+        return path.join(home, static_dir, create_backup(base=base))
+
+    def test_recover_incremental_backup(self):
+        file_path = self.make_incremental_backup()
+        self.write_asset('changed.jpg', b'later')
+
+        recover(file_path)
+
+        with open(path.join(home, 'screenly_assets', 'changed.jpg')) as f:
+            self.assertEqual(f.read(), 'after')
+
+    def test_recover_incremental_backup_requires_base_files(self):
+        file_path = self.make_incremental_backup()
+        remove(path.join(home, 'screenly_assets', 'unchanged.jpg'))
+        self.write_asset('changed.jpg', b'later')
+
+        with self.assertRaises(BackupError):
+            recover(file_path)
+
+        with open(path.join(home, 'screenly_assets', 'changed.jpg')) as f:
+            self.assertEqual(f.read(), 'later')
+
+    def make_archive(self, members):
+        makedirs(path.join(home, static_dir), exist_ok=True)
+        file_path = path.join(home, static_dir, 'upload.tar')
+        with tarfile.open(file_path, 'w') as tar:
+            for name, content in members:
+                tarinfo = tarfile.TarInfo(name)
+                tarinfo.size = len(content)
+                tar.addfile(tarinfo, io.BytesIO(content))
+        return file_path
+
+    def test_recover_restores_files(self):
+        self.write_asset('changed.jpg', b'before')
+        file_path = self.make_archive(
+            [
+                ('.screenly/screenly.conf.sample', b''),
+                ('screenly_assets/changed.jpg', b'after'),
+            ]
+        )
+        progress = mock.Mock()
+        self.addCleanup(
+            remove, path.join(home, '.screenly/screenly.conf.sample')
+        )
+
+        recover(file_path, progress)
+
+        with open(path.join(home, 'screenly_assets', 'changed.jpg')) as f:
+            self.assertEqual(f.read(), 'after')
+        progress.assert_called_with(mock.ANY, mock.ANY)
+        self.assertFalse(path.isfile(file_path))
+
+    def test_recover_rejects_unexpected_members(self):
+        self.write_asset('changed.jpg', b'before')
+        file_path = self.make_archive(
+            [
+                ('screenly_assets/changed.jpg', b'after'),
+                ('.screenly/../../etc/passwd', b''),
+            ]
+        )
+
+        with self.assertRaises(BackupError):
+            recover(file_path)
+
+        # Nothing was replaced, and nothing is left behind.
+        with open(path.join(home, 'screenly_assets', 'changed.jpg')) as f:
+            self.assertEqual(f.read(), 'before')
+        self.assertEqual(
+            listdir(path.join(home, 'screenly_assets')), ['changed.jpg']
+        )
+
+    def test_recover_requires_both_directories(self):
+        file_path = self.make_archive(
+            [('screenly_assets/changed.jpg', b'after')]
+        )
+
+        with self.assertRaises(BackupError):
+            recover(file_path)
+
+        self.assertFalse(
+            path.exists(path.join(home, 'screenly_assets', 'changed.jpg'))
+        )
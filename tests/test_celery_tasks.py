@@ -1,14 +1,29 @@
 from __future__ import unicode_literals
 
+import hashlib
 import os
+import tempfile
 import unittest
+from datetime import timedelta
 from pathlib import Path
 
+import mock
+from django.test import TestCase
+from django.utils import timezone
+
 os.environ.setdefault('HOSTCMD_SIGNING_SECRET', 'test-secret')
 os.environ.setdefault('ENVIRONMENT', 'test')
 
 from celery_tasks import celery as celeryapp
-from celery_tasks import cleanup
+from celery_tasks import (
+    cleanup,
+    ingest_asset,
+    queue_pending_ingestion,
+    recover_backup,
+    transcode_asset,
+)
+from hive_app.models import Asset, ProcessingState
+from lib.backup_helper import BackupError
 
 
 class CeleryTasksTestCase(unittest.TestCase):
@@ -31,3 +46,303 @@ class TestCleanup(CeleryTasksTestCase):
         cleanup.apply()
         tmp_files = list(self.assets_path.rglob('*.tmp'))
         self.assertEqual(len(tmp_files), 0)
+
+
+@mock.patch('celery_tasks.playlist', mock.MagicMock())
+@mock.patch('celery_tasks.ZmqRelayPublisher', mock.MagicMock())
+@mock.patch('celery_tasks.transcode_asset', mock.MagicMock())
+@mock.patch('celery_tasks.url_fails', return_value=False)
+class TestIngestAsset(TestCase):
+    def create_asset(self, **kwargs):
+        fields = {
+            'name': 'asset',
+            'uri': 'https://example.com/video.mp4',
+            'start_date': timezone.now() - timedelta(days=1),
+            'end_date': timezone.now() + timedelta(days=1),
+            'duration': 0,
+            'mimetype': 'video',
+            'is_enabled': True,
+            'is_processing': True,
+            'processing_state': ProcessingState.QUEUED,
+            **kwargs,
+        }
+        return Asset.objects.create(**fields)
+
+    @mock.patch(
+        'celery_tasks.get_video_duration',
+        return_value=timedelta(seconds=42.5),
+    )
+    def test_video_is_probed(self, m_duration, m_url_fails):
+        asset = self.create_asset()
+
+        ingest_asset(asset.asset_id)
+
+        asset.refresh_from_db()
+        m_url_fails.assert_called_once_with('https://example.com/video.mp4')
+        self.assertEqual(asset.duration, 42)
+        self.assertEqual(asset.processing_state, ProcessingState.READY)
+        self.assertFalse(asset.is_processing)
+
+    @mock.patch(
+        'celery_tasks.download_video_from_youtube',
+        return_value=('/data/screenly_assets/a.mp4', 'Title', 60),
+    )
+    def test_youtube_video_is_downloaded(self, m_download, m_url_fails):
+        asset = self.create_asset(
+            uri='https://www.youtube.com/watch?v=a',
+            mimetype='youtube_asset',
+            skip_asset_check=True,
+            md5='0' * 32,
+        )
+
+        ingest_asset(asset.asset_id)
+
+        asset.refresh_from_db()
+        self.assertEqual(asset.uri, '/data/screenly_assets/a.mp4')
+        self.assertEqual(asset.name, 'Title')
+        self.assertEqual(asset.duration, 60)
+        self.assertEqual(asset.mimetype, 'video')
+        self.assertEqual(asset.processing_state, ProcessingState.READY)
+        m_url_fails.assert_not_called()
+
+    @mock.patch('celery_tasks.settings.load', mock.Mock())
+    @mock.patch('celery_tasks.renditions.render_image')
+    def test_local_image_is_hashed_and_scaled(
+        self, m_render_image, m_url_fails
+    ):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(b'image')
+            f.flush()
+            asset = self.create_asset(
+                uri=f.name, mimetype='image', duration=10
+            )
+
+            ingest_asset(asset.asset_id)
+
+        asset.refresh_from_db()
+        md5 = hashlib.md5(b'image').hexdigest()
+        self.assertEqual(asset.md5, md5)
+        self.assertEqual(asset.processing_state, ProcessingState.READY)
+        m_render_image.assert_called_once_with(f.name, md5)
+
+    def test_viewer_is_told_once_the_asset_is_ready(self, m_url_fails):
+        asset = self.create_asset(mimetype='webpage', duration=10)
+
+        with mock.patch('celery_tasks.playlist') as m_playlist:
+            ingest_asset(asset.asset_id)
+
+        m_playlist.notify_playlist_changed.assert_called_once_with(
+            mock.ANY, [asset.asset_id]
+        )
+
+    def test_failure_is_recorded(self, m_url_fails):
+        m_url_fails.return_value = True
+        asset = self.create_asset(mimetype='webpage', duration=10)
+
+        ingest_asset(asset.asset_id)
+
+        asset.refresh_from_db()
+        self.assertEqual(asset.processing_state, ProcessingState.FAILED)
+        self.assertEqual(
+            asset.processing_error,
+            'Could not retrieve file. Check the asset URL.',
+        )
+        self.assertFalse(asset.is_processing)
+        self.assertFalse(asset.is_enabled)
+
+    def test_ready_assets_are_skipped(self, m_url_fails):
+        asset = self.create_asset(processing_state=ProcessingState.READY)
+
+        ingest_asset(asset.asset_id)
+
+        m_url_fails.assert_not_called()
+
+    @mock.patch('celery_tasks.remove')
+    @mock.patch(
+        'celery_tasks.download_video_from_youtube',
+        return_value=('/data/screenly_assets/a.mp4', 'Title', 60),
+    )
+    def test_deleted_asset_is_cancelled(
+        self, m_download, m_remove, m_url_fails
+    ):
+        asset = self.create_asset(
+            uri='https://www.youtube.com/watch?v=a',
+            mimetype='youtube_asset',
+        )
+        m_url_fails.side_effect = lambda uri: asset.delete() and False
+
+        ingest_asset(asset.asset_id)
+
+        m_remove.assert_called_once_with('/data/screenly_assets/a.mp4')
+        self.assertFalse(Asset.objects.exists())
+
+
+@mock.patch('celery_tasks.ingest_asset')
+class TestQueuePendingIngestion(TestCase):
+    def setUp(self):
+        for asset_id, processing_state in [
+            ('queued', ProcessingState.QUEUED),
+            ('ready', ProcessingState.READY),
+        ]:
+            Asset.objects.create(
+                asset_id=asset_id,
+                name=asset_id,
+                uri='https://example.com/image.png',
+                mimetype='image',
+                processing_state=processing_state,
+            )
+
+        keys = set()
+
+        def set_key(key, value, nx=False, ex=None):
+            if nx and key in keys:
+                return None
+            keys.add(key)
+            return True
+
+        patcher = mock.patch('celery_tasks.r')
+        patcher.start().set.side_effect = set_key
+        self.addCleanup(patcher.stop)
+
+    def test_queued_assets_are_queued_once(self, m_ingest_asset):
+        queue_pending_ingestion()
+        queue_pending_ingestion()
+
+        m_ingest_asset.delay.assert_called_once_with('queued')
+
+    def test_force_queues_again(self, m_ingest_asset):
+        queue_pending_ingestion()
+        queue_pending_ingestion(force=True)
+
+        self.assertEqual(
+            m_ingest_asset.delay.call_args_list,
+            [mock.call('queued'), mock.call('queued')],
+        )
+
+
+@mock.patch('celery_tasks.settings.load', mock.Mock())
+@mock.patch('celery_tasks.renditions.transcode')
+@mock.patch('celery_tasks.renditions.probe')
+class TestTranscodeAsset(TestCase):
+    def setUp(self):
+        self.asset_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.asset_dir.cleanup)
+        patcher = mock.patch.dict(
+            'celery_tasks.settings',
+            {
+                'assetdir': self.asset_dir.name,
+                'resolution': '1920x1080',
+                'transcode_videos': True,
+            },
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.dict(os.environ, {'DEVICE_TYPE': 'pi3'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.asset = Asset.objects.create(
+            name='video',
+            uri='/data/screenly_assets/video.mp4',
+            mimetype='video',
+            duration=10,
+        )
+
+    def test_video_is_transcoded(self, m_probe, m_transcode):
+        video = {
+            'codec': 'hevc',
+            'width': 3840,
+            'height': 2160,
+            'fps': 30,
+            'bitrate': 20000000,
+        }
+        m_probe.return_value = video
+
+        transcode_asset(self.asset.asset_id)
+
+        m_transcode.assert_called_once()
+        source, destination, _, profile = m_transcode.call_args[0]
+        self.assertEqual(source, self.asset.uri)
+        self.assertEqual(
+            destination,
+            os.path.join(
+                self.asset_dir.name,
+                '.renditions',
+                f'{self.asset.asset_id}.1920x1080-30.mp4',
+            ),
+        )
+
+    def test_playable_video_is_left_alone(self, m_probe, m_transcode):
+        m_probe.return_value = {
+            'codec': 'h264',
+            'width': 1280,
+            'height': 720,
+            'fps': 30,
+            'bitrate': 3000000,
+        }
+
+        transcode_asset(self.asset.asset_id)
+
+        m_transcode.assert_not_called()
+
+    def test_disabled(self, m_probe, m_transcode):
+        with mock.patch.dict(
+            'celery_tasks.settings', {'transcode_videos': False}
+        ):
+            transcode_asset(self.asset.asset_id)
+
+        m_probe.assert_not_called()
+
+
+@mock.patch('celery_tasks.remove', mock.Mock())
+@mock.patch('celery_tasks.r', mock.MagicMock())
+@mock.patch('celery_tasks.playlist', mock.MagicMock())
+@mock.patch('celery_tasks.ZmqRelayPublisher')
+@mock.patch('celery_tasks.backup_helper')
+class TestRecoverBackup(unittest.TestCase):
+    def test_viewer_is_only_stopped_for_the_swap(
+        self, m_backup_helper, m_publisher
+    ):
+        calls = mock.Mock()
+        m_backup_helper.stage_backup.side_effect = (
+            lambda *args: calls.stage() or {}
+        )
+        m_backup_helper.apply_backup.side_effect = lambda staged: calls.apply()
+        m_publisher.get_instance.return_value.send_to_viewer.side_effect = (
+            lambda command: getattr(calls, command)()
+        )
+
+        recover_backup('/tmp/backup.tar')
+
+        self.assertEqual(
+            [name for name, _, _ in calls.mock_calls],
+            ['stage', 'stop', 'apply', 'reload', 'play'],
+        )
+
+    def test_wrong_archive_leaves_viewer_playing(
+        self, m_backup_helper, m_publisher
+    ):
+        m_backup_helper.stage_backup.side_effect = BackupError(
+            'Archive is wrong.'
+        )
+
+        with self.assertRaises(BackupError):
+            recover_backup('/tmp/backup.tar')
+
+        m_backup_helper.apply_backup.assert_not_called()
+        m_publisher.get_instance.return_value.send_to_viewer.assert_not_called()
+
+    def test_unreachable_viewer_leaves_files_alone(
+        self, m_backup_helper, m_publisher
+    ):
+        publisher = m_publisher.get_instance.return_value
+        publisher.wait_for_subscriber.return_value = False
+
+        with self.assertRaises(BackupError):
+            recover_backup('/tmp/backup.tar')
+
+        m_backup_helper.discard_backup.assert_called_once_with(
+            m_backup_helper.stage_backup.return_value
+        )
+        m_backup_helper.apply_backup.assert_not_called()
+        publisher.send_to_viewer.assert_not_called()
@@ -0,0 +1,90 @@
+import logging
+import os
+import unittest
+from threading import Timer
+from time import monotonic
+
+import zmq
+
+from viewer.event_loop import EventLoop, LoopEvent
+from viewer.zmq import ZmqSubscriber
+
+logging.disable(logging.CRITICAL)
+
+
+class EventLoopTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = EventLoop()
+
+    def test_run_times_out(self):
+        start = monotonic()
+        self.assertFalse(self.loop.run(until=lambda: False, timeout=0.05))
+        self.assertGreaterEqual(monotonic() - start, 0.05)
+
+    def test_run_returns_when_condition_holds(self):
+        self.assertTrue(self.loop.run(until=lambda: True, timeout=10))
+
+    def test_wake_from_another_thread(self):
+        event = LoopEvent(self.loop)
+        Timer(0.05, event.set).start()
+
+        start = monotonic()
+        self.assertTrue(event.wait(timeout=10))
+        self.assertLess(monotonic() - start, 5)
+
+    def test_cleared_event_waits_for_timeout(self):
+        event = LoopEvent(self.loop)
+        event.set()
+        event.clear()
+        self.assertFalse(event.wait(timeout=0.01))
+
+    def test_reader_callback(self):
+        read_fd, write_fd = os.pipe()
+        self.addCleanup(os.close, read_fd)
+        self.addCleanup(os.close, write_fd)
+        received = []
+        self.loop.add_reader(
+            read_fd, lambda: received.append(os.read(read_fd, 10))
+        )
+
+        os.write(write_fd, b'hello')
+        self.loop.run(until=lambda: received, timeout=10)
+        self.assertEqual(received, [b'hello'])
+
+        self.loop.remove_reader(read_fd)
+        os.write(write_fd, b'again')
+        self.loop.run(timeout=0.01)
+        self.assertEqual(received, [b'hello'])
+
+
+class ZmqSubscriberTest(unittest.TestCase):
+    def test_commands_run_from_the_loop(self):
+        loop = EventLoop()
+        received = []
+        commands = {
+            'next': lambda parameter: received.append(('next', parameter)),
+            'asset': lambda parameter: received.append(('asset', parameter)),
+            'unknown': lambda parameter: received.append('unknown'),
+        }
+
+        context = zmq.Context.instance()
+        publisher = context.socket(zmq.PUB)
+        self.addCleanup(publisher.close, 0)
+        port = publisher.bind_to_random_port('tcp://127.0.0.1')
+
+        subscriber = ZmqSubscriber(None, commands, f'tcp://127.0.0.1:{port}')
+        self.addCleanup(subscriber.socket.close, 0)
+        loop.add_reader(subscriber.socket, subscriber.handle)
+
+        # Subscriptions propagate asynchronously; resend until one lands.
+        for _ in range(50):
+            publisher.send(b'viewer next')
+            if loop.run(until=lambda: received, timeout=0.1):
+                break
+
+        publisher.send(b'viewer asset&abc')
+        publisher.send(b'viewer bogus')
+        loop.run(until=lambda: 'unknown' in received, timeout=10)
+
+        self.assertIn(('asset', 'abc'), received)
+        self.assertEqual(received[-1], 'unknown')
@@ -0,0 +1,117 @@
+import logging
+import unittest
+
+import mock
+
+from viewer import media_player
+
+logging.disable(logging.CRITICAL)
+
+
+@mock.patch('viewer.media_player.get_device_type', return_value='pi4')
+@mock.patch('viewer.media_player.vlc.Instance')
+class VLCMediaPlayerTest(unittest.TestCase):
+    def test_hardware_decode_options(self, m_instance, m_device_type):
+        media_player.VLCMediaPlayer()
+
+        options = m_instance.call_args[0][0]
+        self.assertIn('--codec=drm_avcodec,any', options)
+
+    def test_set_asset_does_not_reload_settings(
+        self, m_instance, m_device_type
+    ):
+        player = media_player.VLCMediaPlayer()
+        m_player = player.player
+        m_player.audio_output_device_set.reset_mock()
+
+        with mock.patch.object(media_player.settings, 'load') as m_load:
+            player.set_asset('/videos/a.mp4', 10)
+            m_load.assert_not_called()
+        m_player.audio_output_device_set.assert_not_called()
+
+    def test_reload_switches_audio_device(self, m_instance, m_device_type):
+        with mock.patch.dict(media_player.settings, {'audio_output': 'hdmi'}):
+            player = media_player.VLCMediaPlayer()
+        m_player = player.player
+        m_player.audio_output_device_set.reset_mock()
+
+        with mock.patch.dict(media_player.settings, {'audio_output': 'local'}):
+            player.reload()
+            player.reload()
+
+        m_player.audio_output_device_set.assert_called_once_with(
+            'alsa', 'plughw:CARD=Headphones'
+        )
+
+    def test_media_is_reused(self, m_instance, m_device_type):
+        player = media_player.VLCMediaPlayer()
+        m_vlc = m_instance.return_value
+        m_vlc.media_new.side_effect = lambda uri: mock.Mock(name=uri)
+
+        player.preload('/videos/a.mp4')
+        player.set_asset('/videos/a.mp4', 10)
+        player.set_asset('/videos/b.mp4', 10)
+        player.set_asset('/videos/a.mp4', 10)
+
+        self.assertEqual(m_vlc.media_new.call_count, 2)
+        first, second = player.player.set_media.call_args_list[0::2]
+        self.assertIs(first[0][0], second[0][0])
+
+    def test_media_pool_is_bounded(self, m_instance, m_device_type):
+        player = media_player.VLCMediaPlayer()
+
+        with mock.patch.object(media_player, 'MEDIA_POOL_SIZE', 2):
+            for name in ('a', 'b', 'c'):
+                player.preload(f'/videos/{name}.mp4')
+
+        self.assertEqual(
+            list(player.media_pool), ['/videos/b.mp4', '/videos/c.mp4']
+        )
+
+
+class MPVMediaPlayerTest(unittest.TestCase):
+    def setUp(self):
+        self.m_popen = mock.patch.object(
+            media_player.subprocess, 'Popen'
+        ).start()
+        self.m_popen.return_value.poll.return_value = None
+        self.m_socket = mock.patch.object(
+            media_player.socket, 'socket'
+        ).start()
+        self.m_socket.return_value.makefile.return_value = []
+        self.addCleanup(mock.patch.stopall)
+
+    def sent_commands(self):
+        return [
+            call[0][0]
+            for call in self.m_socket.return_value.sendall.call_args_list
+        ]
+
+    def test_process_is_reused_across_assets(self):
+        player = media_player.MPVMediaPlayer()
+
+        player.set_asset('/videos/a.mp4', 10)
+        player.play()
+        player.stop()
+        player.set_asset('/videos/b.mp4', 10)
+        player.play()
+
+        self.m_popen.assert_called_once()
+        self.assertEqual(
+            self.sent_commands(),
+            [
+                b'{"command": ["loadfile", "/videos/a.mp4", "replace"]}\n',
+                b'{"command": ["stop"]}\n',
+                b'{"command": ["loadfile", "/videos/b.mp4", "replace"]}\n',
+            ],
+        )
+
+    def test_process_is_restarted_after_exit(self):
+        player = media_player.MPVMediaPlayer()
+        player.set_asset('/videos/a.mp4', 10)
+        player.play()
+
+        self.m_popen.return_value.poll.return_value = 1
+        player.play()
+
+        self.assertEqual(self.m_popen.call_count, 2)
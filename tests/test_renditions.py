@@ -0,0 +1,190 @@
+import json
+import os
+import tempfile
+import unittest
+
+import mock
+
+from lib import renditions
+
+H264_1080P = {
+    'codec': 'h264',
+    'width': 1920,
+    'height': 1080,
+    'fps': 30,
+    'bitrate': 6000000,
+}
+
+
+class RenditionProfileTest(unittest.TestCase):
+    def setUp(self):
+        self.settings = {'resolution': '1920x1080', 'transcode_videos': True}
+        patcher = mock.patch.dict(renditions.settings, self.settings)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_profile_is_capped_at_resolution(self):
+        renditions.settings['resolution'] = '1280x720'
+
+        profile = renditions.get_profile('pi4')
+
+        self.assertEqual(profile['max_size'], (1280, 720))
+        self.assertEqual(
+            renditions.RENDITION_PROFILES['pi4']['max_size'], (1920, 1080)
+        )
+
+    def test_no_profile(self):
+        self.assertIsNone(renditions.get_profile('x86'))
+
+        renditions.settings['transcode_videos'] = False
+        self.assertIsNone(renditions.get_profile('pi3'))
+
+    def test_needs_rendition(self):
+        profile = renditions.get_profile('pi3')
+
+        self.assertFalse(renditions.needs_rendition(H264_1080P, profile))
+        for changes in (
+            {'codec': 'hevc'},
+            {'width': 3840, 'height': 2160},
+            {'fps': 60},
+            {'bitrate': 40000000},
+        ):
+            with self.subTest(changes=changes):
+                self.assertTrue(
+                    renditions.needs_rendition(
+                        {**H264_1080P, **changes}, profile
+                    )
+                )
+
+        self.assertFalse(
+            renditions.needs_rendition(
+                {**H264_1080P, 'codec': 'hevc'}, renditions.get_profile('pi4')
+            )
+        )
+
+    def test_fit(self):
+        self.assertEqual(renditions.fit(3840, 2160, 1920, 1080), (1920, 1080))
+        self.assertEqual(renditions.fit(1080, 1920, 1920, 1080), (606, 1080))
+        self.assertEqual(renditions.fit(640, 360, 1920, 1080), (640, 360))
+
+    def test_lookup(self):
+        profile = renditions.get_profile('pi3')
+        asset = {'asset_id': 'abc', 'mimetype': 'video'}
+
+        with tempfile.TemporaryDirectory() as asset_dir:
+            renditions.settings['assetdir'] = asset_dir
+            self.assertIsNone(renditions.lookup(asset, profile))
+
+            rendition_path = renditions.get_rendition_path('abc', profile)
+            os.makedirs(os.path.dirname(rendition_path))
+            open(rendition_path, 'w').close()
+
+            self.assertEqual(renditions.lookup(asset, profile), rendition_path)
+            self.assertIsNone(renditions.lookup(asset, None))
+            self.assertIsNone(
+                renditions.lookup({**asset, 'mimetype': 'image'}, profile)
+            )
+
+            renditions.remove_orphaned_renditions({'other'})
+            self.assertIsNone(renditions.lookup(asset, profile))
+
+    @mock.patch('lib.renditions.check_output')
+    def test_probe(self, m_check_output):
+        m_check_output.return_value = json.dumps(
+            {
+                'streams': [
+                    {
+                        'codec_name': 'hevc',
+                        'width': 3840,
+                        'height': 2160,
+                        'avg_frame_rate': '60000/1001',
+                    }
+                ],
+                'format': {'bit_rate': '25000000'},
+            }
+        )
+
+        video = renditions.probe('/videos/a.mp4')
+
+        self.assertEqual(video['codec'], 'hevc')
+        self.assertEqual((video['width'], video['height']), (3840, 2160))
+        self.assertAlmostEqual(video['fps'], 59.94, places=2)
+        self.assertEqual(video['bitrate'], 25000000)
+
+
+@unittest.skipIf(renditions.Image is None, 'Pillow is not installed')
+class ImageRenditionTest(unittest.TestCase):
+    def setUp(self):
+        self.asset_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.asset_dir.cleanup)
+        patcher = mock.patch.dict(
+            renditions.settings,
+            {
+                'assetdir': self.asset_dir.name,
+                'resolution': '1920x1080',
+                'image_rendition_format': 'jpeg',
+            },
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def save_image(self, size, mode='RGB', image_format='JPEG', **kwargs):
+        image_path = os.path.join(self.asset_dir.name, 'original')
+        renditions.Image.new(mode, size).save(
+            image_path, image_format, **kwargs
+        )
+        return image_path
+
+    def test_large_image_is_scaled(self):
+        source = self.save_image((4000, 3000))
+
+        rendition_path = renditions.render_image(source, 'abc')
+
+        self.assertTrue(rendition_path.endswith('/abc.1920x1080.jpg'))
+        with renditions.Image.open(rendition_path) as image:
+            self.assertEqual(image.size, (1440, 1080))
+            self.assertTrue(image.info.get('progressive'))
+        self.assertEqual(
+            renditions.lookup_image(
+                {'asset_id': 'a', 'mimetype': 'image', 'md5': 'abc'}
+            ),
+            rendition_path,
+        )
+
+    def test_exif_orientation_is_applied(self):
+        exif = renditions.Image.Exif()
+        exif[renditions.EXIF_ORIENTATION] = 6
+        source = self.save_image((400, 300), exif=exif)
+
+        rendition_path = renditions.render_image(source, 'abc')
+
+        with renditions.Image.open(rendition_path) as image:
+            self.assertEqual(image.size, (300, 400))
+
+    def test_small_image_is_left_alone(self):
+        source = self.save_image((800, 600))
+
+        self.assertIsNone(renditions.render_image(source, 'abc'))
+        self.assertIsNone(
+            renditions.lookup_image(
+                {'asset_id': 'a', 'mimetype': 'image', 'md5': 'abc'}
+            )
+        )
+
+    def test_transparency_is_kept(self):
+        source = self.save_image((4000, 3000), 'RGBA', 'PNG')
+
+        rendition_path = renditions.render_image(source, 'abc')
+
+        self.assertTrue(rendition_path.endswith('.png'))
+        with renditions.Image.open(rendition_path) as image:
+            self.assertEqual(image.mode, 'RGBA')
+
+    def test_webp(self):
+        renditions.settings['image_rendition_format'] = 'webp'
+        source = self.save_image((4000, 3000))
+
+        rendition_path = renditions.render_image(source, 'abc')
+
+        with renditions.Image.open(rendition_path) as image:
+            self.assertEqual(image.format, 'WEBP')
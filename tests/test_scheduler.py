@@ -1,14 +1,20 @@
 import logging
 import os
+import random
 from datetime import timedelta
 
+import mock
 import time_machine
 from django.test import TestCase
 from django.utils import timezone
 
 from hive_app.models import Asset
 from settings import settings
-from viewer.scheduling import Scheduler, generate_asset_list
+from viewer.scheduling import (
+    ScheduleIndex,
+    Scheduler,
+    generate_asset_list,
+)
 
 logging.disable(logging.CRITICAL)
 
@@ -24,6 +30,7 @@ ASSET_X = {
     'is_enabled': 1,
     'nocache': 0,
     'is_processing': 0,
+    'md5': None,
     'play_order': 1,
     'skip_asset_check': 0,
 }
@@ -41,6 +48,7 @@ ASSET_Y = {
     'is_enabled': 1,
     'nocache': 0,
     'is_processing': 0,
+    'md5': None,
     'play_order': 0,
     'skip_asset_check': 0,
 }
@@ -56,6 +64,7 @@ ASSET_Z = {
     'is_enabled': 1,
     'nocache': 0,
     'is_processing': 0,
+    'md5': None,
     'play_order': 2,
     'skip_asset_check': 0,
 }
@@ -71,6 +80,7 @@ ASSET_TOMORROW = {
     'is_enabled': 1,
     'nocache': 0,
     'is_processing': 0,
+    'md5': None,
     'play_order': 2,
     'skip_asset_check': 0,
 }
@@ -116,6 +126,14 @@ class SchedulerTest(TestCase):
 
         self.assertEqual([expected_y, expected_x], [ASSET_Y, ASSET_X])
 
+    def test_get_upcoming_assets_should_not_advance(self):
+        self.create_assets([ASSET_X, ASSET_Y])
+        scheduler = Scheduler()
+        scheduler.get_next_asset()
+
+        self.assertEqual(scheduler.get_upcoming_assets(3), [ASSET_X, ASSET_Y])
+        self.assertEqual(scheduler.get_next_asset(), ASSET_X)
+
     def test_keep_same_position_on_playlist_update(self):
         self.create_assets([ASSET_X, ASSET_Y])
         scheduler = Scheduler()
@@ -145,6 +163,16 @@ class SchedulerTest(TestCase):
 
         self.assertEqual(0, Scheduler().get_db_mtime())
 
+    def test_get_db_mtime_should_include_wal(self):
+        settings['database'] = FAKE_DB_PATH
+        wal_path = f'{FAKE_DB_PATH}-wal'
+        self.addCleanup(os.remove, wal_path)
+        with open(FAKE_DB_PATH, 'a'), open(wal_path, 'a'):
+            os.utime(FAKE_DB_PATH, (0, 0))
+            os.utime(wal_path, (0, 100))
+
+        self.assertEqual(100, Scheduler().get_db_mtime())
+
     def test_playlist_should_be_updated_after_deadline_reached(self):
         self.create_assets([ASSET_X, ASSET_Y])
         _, deadline = generate_asset_list()
@@ -157,3 +185,129 @@ class SchedulerTest(TestCase):
 
         self.assertEqual([ASSET_X], scheduler.assets)
         traveller.stop()
+
+    def test_playlist_should_be_updated_when_version_changes(self):
+        self.create_assets([ASSET_X, ASSET_Y])
+        scheduler = Scheduler()
+
+        self.create_assets([ASSET_Z])
+        scheduler.refresh_playlist()
+        self.assertEqual([ASSET_Y, ASSET_X], scheduler.assets)
+
+        scheduler.notify_playlist_changed(1)
+        scheduler.refresh_playlist()
+        self.assertEqual([ASSET_Y, ASSET_X, ASSET_Z], scheduler.assets)
+        self.assertEqual(1, scheduler.playlist_version)
+
+    def test_playlist_should_not_be_rebuilt_for_applied_version(self):
+        self.create_assets([ASSET_X, ASSET_Y])
+        scheduler = Scheduler()
+        scheduler.notify_playlist_changed(1)
+        scheduler.refresh_playlist()
+
+        with mock.patch(
+            'viewer.scheduling.generate_asset_list'
+        ) as generate_mock:
+            scheduler.notify_playlist_changed(1)
+            scheduler.refresh_playlist()
+
+        generate_mock.assert_not_called()
+
+    def test_db_mtime_should_only_be_polled_after_interval(self):
+        self.create_assets([ASSET_X, ASSET_Y])
+        scheduler = Scheduler()
+
+        with mock.patch.object(
+            scheduler, 'get_db_mtime', return_value=0
+        ) as mtime_mock:
+            for _ in range(10):
+                scheduler.get_next_asset()
+            mtime_mock.assert_not_called()
+
+            scheduler.last_db_mtime_check -= settings['playlist_poll_interval']
+            scheduler.get_next_asset()
+            mtime_mock.assert_called_once()
+
+    def test_playlist_should_be_updated_incrementally_for_changed_assets(
+        self,
+    ):
+        self.create_assets([ASSET_X, ASSET_Y])
+        scheduler = Scheduler()
+
+        Asset.objects.filter(asset_id=ASSET_X['asset_id']).update(
+            is_enabled=False
+        )
+        with mock.patch.object(
+            ScheduleIndex, 'from_database'
+        ) as from_database_mock:
+            scheduler.notify_playlist_changed(1, [ASSET_X['asset_id']])
+            scheduler.refresh_playlist()
+
+        from_database_mock.assert_not_called()
+        self.assertEqual([ASSET_Y], scheduler.assets)
+
+
+class ScheduleIndexTest(TestCase):
+    def setUp(self):
+        self.now = timezone.now().replace(microsecond=0)
+        self.random = random.Random(1)
+
+    def random_asset(self, asset_id):
+        start = self.now + timedelta(hours=self.random.randint(-48, 48))
+        end = start + timedelta(hours=self.random.randint(0, 24))
+        return {
+            'asset_id': asset_id,
+            'start_date': start,
+            'end_date': end,
+            'is_enabled': self.random.random() > 0.1,
+            'is_processing': False,
+            'play_order': self.random.randint(0, 10),
+        }
+
+    def assert_matches_brute_force(self, index, assets):
+        enabled = [asset for asset in assets.values() if asset['is_enabled']]
+        for hours in range(-50, 75):
+            moment = self.now + timedelta(hours=hours)
+            active = sorted(
+                (
+                    asset
+                    for asset in enabled
+                    if asset['start_date'] < moment < asset['end_date']
+                ),
+                key=lambda asset: (asset['play_order'], asset['asset_id']),
+            )
+            upcoming = [
+                date
+                for asset in enabled
+                for date in (asset['start_date'], asset['end_date'])
+                if date > moment
+            ]
+
+            self.assertEqual(active, index.active_at(moment))
+            self.assertEqual(
+                min(upcoming, default=None), index.next_change_after(moment)
+            )
+
+    def test_lookups_should_match_brute_force(self):
+        assets = {str(i): self.random_asset(str(i)) for i in range(200)}
+        index = ScheduleIndex.from_assets(assets.values())
+
+        self.assert_matches_brute_force(index, assets)
+
+    def test_incremental_updates_should_match_full_build(self):
+        assets = {str(i): self.random_asset(str(i)) for i in range(50)}
+        index = ScheduleIndex.from_assets(assets.values())
+
+        for _ in range(200):
+            asset_id = str(self.random.randint(0, 60))
+            if self.random.random() < 0.3:
+                assets.pop(asset_id, None)
+                index.remove(asset_id)
+            else:
+                assets[asset_id] = self.random_asset(asset_id)
+                index.upsert(assets[asset_id])
+
+        self.assert_matches_brute_force(index, assets)
+        rebuilt = ScheduleIndex.from_assets(assets.values())
+        self.assertEqual(rebuilt.boundaries, index.boundaries)
+        self.assertEqual(rebuilt.segments, index.segments)
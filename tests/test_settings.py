@@ -6,6 +6,8 @@ import sys
 from contextlib import contextmanager
 from unittest import TestCase
 
+import mock
+
 user_home_dir = os.getenv('HOME')
 
 settings1 = """
@@ -129,3 +131,67 @@ class SettingsTest(TestCase):
                 self.assertEqual(settings['verify_ssl'], True)
                 # no out of thin air changes?
                 self.assertEqual(settings['audio_output'], 'hdmi')
+
+    def test_load_only_parses_changed_file(self):
+        with fake_settings(settings1) as (mod_settings, settings):
+            version = settings.version
+
+            settings.load()
+            self.assertEqual(settings.version, version)
+
+            with open(CONFIG_FILE, 'a') as f:
+                f.write('\n')
+            settings.load()
+            self.assertEqual(settings.version, version + 1)
+            self.assertEqual(settings['player_name'], 'new player')
+
+    def test_load_discards_unsaved_changes(self):
+        with fake_settings(settings1) as (mod_settings, settings):
+            settings['player_name'] = 'unsaved'
+
+            settings.load()
+
+            self.assertEqual(settings['player_name'], 'new player')
+
+    def test_unchanged_settings_are_not_written(self):
+        with fake_settings(settings1) as (mod_settings, settings):
+            settings.save()
+            inode = os.stat(CONFIG_FILE).st_ino
+
+            settings.update_and_save(player_name='new player')
+
+            self.assertEqual(os.stat(CONFIG_FILE).st_ino, inode)
+
+    def test_update_and_save(self):
+        with fake_settings(settings1) as (mod_settings, settings):
+            settings.update_and_save(player_name='Lobby', default_duration=5)
+
+            self.assertEqual(os.listdir(CONFIG_DIR), ['screenly.conf'])
+            with open(CONFIG_FILE) as f:
+                saved = f.read()
+            self.assertIn('player_name = Lobby', saved)
+            self.assertIn('default_duration = 5', saved)
+            self.assertEqual(settings['player_name'], 'Lobby')
+
+    def test_failed_save_leaves_no_temp_file(self):
+        with fake_settings(settings1) as (mod_settings, settings):
+            with mock.patch.object(
+                mod_settings.os, 'replace', side_effect=OSError
+            ):
+                with self.assertRaises(OSError):
+                    settings.update_and_save(player_name='Lobby')
+
+            self.assertEqual(os.listdir(CONFIG_DIR), ['screenly.conf'])
+            with open(CONFIG_FILE) as f:
+                self.assertNotIn('Lobby', f.read())
+
+    def test_load_picks_up_changes_from_another_instance(self):
+        with fake_settings(settings1) as (mod_settings, settings):
+            # E.g. another gunicorn worker, or the viewer.
+            other = mod_settings.HIVESettings()
+            other.update_and_save(player_name='Lobby')
+            self.assertEqual(settings['player_name'], 'new player')
+
+            settings.load()
+
+            self.assertEqual(settings['player_name'], 'Lobby')
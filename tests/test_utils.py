@@ -3,9 +3,17 @@
 import unittest
 from datetime import datetime
 
+import mock
 from django.test import TestCase
 
-from lib.utils import handler, string_to_bool, template_handle_unicode, url_fails
+from lib.utils import (
+    get_node_ip,
+    get_node_ip_updated_at,
+    handler,
+    string_to_bool,
+    template_handle_unicode,
+    url_fails,
+)
 
 url_fail = 'http://doesnotwork.example.com'
 url_redir = 'http://example.com'
@@ -41,6 +49,31 @@ class StringToBoolTest(unittest.TestCase):
             string_to_bool('maybe')
 
 
+@mock.patch('lib.utils.is_balena_app', mock.MagicMock(return_value=False))
+@mock.patch('lib.utils.connect_to_redis')
+class NodeIpTest(unittest.TestCase):
+    def test_cached_addresses(self, m_connect_to_redis):
+        m_connect_to_redis.return_value.get.side_effect = {
+            'ip_addresses': '["192.168.1.100", "fe80::1"]',
+            'ip_addresses_updated_at': '1468932120.5',
+        }.get
+
+        self.assertEqual(get_node_ip(), '192.168.1.100 fe80::1')
+        self.assertEqual(
+            get_node_ip_updated_at().isoformat(),
+            '2016-07-19T12:42:00.500000+00:00',
+        )
+        m_connect_to_redis.return_value.publish.assert_not_called()
+
+    @mock.patch.dict('os.environ', {'MY_IP': '10.0.0.5'})
+    def test_no_addresses_yet(self, m_connect_to_redis):
+        m_connect_to_redis.return_value.get.return_value = None
+
+        self.assertEqual(get_node_ip(), '10.0.0.5')
+        self.assertIsNone(get_node_ip_updated_at())
+        m_connect_to_redis.return_value.publish.assert_called_once()
+
+
 class URLHelperTest(TestCase):
     def test_url_1(self):
         self.assertTrue(url_fails(url_fail))
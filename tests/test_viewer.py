@@ -9,6 +9,7 @@ from time import sleep
 import mock
 
 import viewer
+from viewer.playback import TransitionTimer
 from viewer.scheduling import Scheduler
 
 logging.disable(logging.CRITICAL)
@@ -73,13 +74,16 @@ class TestLoadBrowser(ViewerTestCase):
         self.p_loadb.stop()
 
     def test_load_browser(self):
-        self.m_cmd.return_value.return_value.process.stdout = (
-            b'HIVE service start'
-        )
+        def start_webview(*args, **kwargs):
+            kwargs['_out']('HIVE service start\n')
+            return mock.DEFAULT
+
+        self.m_cmd.return_value.side_effect = start_webview
         self.p_cmd.start()
         self.u.load_browser()
         self.p_cmd.stop()
         self.m_cmd.assert_called_once_with('HIVEWebview')
+        self.assertTrue(self.u.webview_ready.is_set())
 
 
 class TestWatchdog(ViewerTestCase):
@@ -102,3 +106,96 @@ class TestWatchdog(ViewerTestCase):
         self.u.watchdog()
         mtime2 = os.path.getmtime(self.u.utils.WATCHDOG_PATH)
         self.assertGreater(mtime2, mtime)
+
+
+class TestPreload(ViewerTestCase):
+    def setUp(self):
+        super(TestPreload, self).setUp()
+        self.m_browser_bus = mock.Mock(name='browser_bus')
+        self.m_asset_cache = mock.Mock(name='asset_cache')
+        self.m_asset_cache.lookup.return_value = None
+        self.m_media_player = mock.Mock(name='media_player')
+
+        self.patches = [
+            mock.patch.object(self.u, 'browser_bus', self.m_browser_bus),
+            mock.patch.object(self.u, 'asset_cache', self.m_asset_cache),
+            mock.patch.object(self.u, 'webview_can_preload', True),
+            mock.patch.object(self.u, 'rendition_profile', None),
+            mock.patch.object(
+                self.u.MediaPlayerProxy,
+                'get_instance',
+                return_value=self.m_media_player,
+            ),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        super(TestPreload, self).tearDown()
+
+    def test_preload_image(self):
+        self.u.preload_asset({'uri': 'http://a/1.png', 'mimetype': 'image'})
+        self.m_browser_bus.preloadImage.assert_called_once_with(
+            'http://a/1.png'
+        )
+
+    def test_preload_webpage(self):
+        self.u.preload_asset({'uri': 'http://a/', 'mimetype': 'webpage'})
+        self.m_browser_bus.preloadPage.assert_called_once_with('http://a/')
+
+    def test_preload_video_uses_cached_copy(self):
+        self.m_asset_cache.lookup.return_value = '/cache/abc.mp4'
+        self.u.preload_asset({'uri': 'http://a/1.mp4', 'mimetype': 'video'})
+        self.m_media_player.preload.assert_called_once_with('/cache/abc.mp4')
+
+    def test_preload_video_prefers_rendition(self):
+        self.m_asset_cache.lookup.return_value = '/cache/abc.mp4'
+        with mock.patch.object(
+            self.u.renditions, 'lookup', return_value='/renditions/a.mp4'
+        ):
+            self.u.preload_asset(
+                {'asset_id': 'a', 'uri': '/a.mp4', 'mimetype': 'video'}
+            )
+        self.m_media_player.preload.assert_called_once_with(
+            '/renditions/a.mp4'
+        )
+
+    def test_old_webview_disables_preloading(self):
+        del self.m_browser_bus.preloadImage
+        asset = {'uri': 'http://a/1.png', 'mimetype': 'image'}
+
+        self.u.preload_asset(asset)
+        self.assertFalse(self.u.webview_can_preload)
+
+        self.u.preload_asset(asset)
+        self.m_asset_cache.lookup.assert_called_with(asset)
+
+
+class TestTransitionTimer(unittest.TestCase):
+    def test_stop_without_start(self):
+        timer = TransitionTimer()
+        self.assertIsNone(timer.stop())
+        self.assertEqual(timer.get_stats()['count'], 0)
+
+    def test_stats(self):
+        timer = TransitionTimer()
+        with mock.patch('viewer.playback.monotonic', side_effect=[10, 10.5]):
+            timer.start()
+            self.assertEqual(timer.stop(), 0.5)
+
+        with mock.patch('viewer.playback.monotonic', return_value=20):
+            timer.start()
+        self.assertAlmostEqual(timer.stop(at=20.1), 0.1)
+
+        stats = timer.get_stats()
+        self.assertEqual(stats['count'], 2)
+        self.assertEqual(stats['max'], 0.5)
+        self.assertAlmostEqual(stats['avg'], 0.3)
+
+    def test_cancel(self):
+        timer = TransitionTimer()
+        timer.start()
+        timer.cancel()
+        self.assertIsNone(timer.stop())
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Plays a video and its rendition for this device one after the other and
+reports the CPU used and the frames dropped by each, e.g.
+
+    python3 -m tools.benchmark_renditions /data/screenly_assets/clip.mp4
+
+Run it in the viewer container, with nothing else on screen. The player is
+picked like `MediaPlayerProxy` does: VLC on the Pi 1 to 4, mpv otherwise.
+"""
+
+import argparse
+import json
+import socket
+import subprocess
+import tempfile
+from os import path
+from time import monotonic, sleep
+
+import psutil
+
+from lib import renditions
+from lib.device_helper import get_device_type
+from settings import settings
+from viewer.media_player import (
+    MPV_DEFAULT_HW_DECODE_OPTIONS,
+    MPV_HW_DECODE_OPTIONS,
+    VLC_HW_DECODE_OPTIONS,
+)
+
+MPV_SOCKET = '/tmp/mpv-benchmark.sock'
+
+
+def play_with_vlc(file_path, duration, device_type):
+    import vlc
+
+    process = psutil.Process()
+    instance = vlc.Instance(VLC_HW_DECODE_OPTIONS.get(device_type, []))
+    player = instance.media_player_new()
+    media = instance.media_new(file_path)
+    player.set_media(media)
+
+    cpu_before = sum(process.cpu_times()[:2])
+    started_at = monotonic()
+    player.play()
+    sleep(duration)
+
+    stats = vlc.MediaStats()
+    media.get_stats(stats)
+    cpu = sum(process.cpu_times()[:2]) - cpu_before
+    elapsed = monotonic() - started_at
+    player.stop()
+    instance.release()
+
+    return {
+        'cpu_percent': round(100 * cpu / elapsed, 1),
+        'decoded_frames': stats.decoded_video,
+        'displayed_frames': stats.displayed_pictures,
+        'dropped_frames': stats.lost_pictures,
+    }
+
+
+def mpv_get_properties(connection, names):
+    for name in names:
+        connection.sendall(
+            json.dumps({'command': ['get_property', name]}).encode() + b'\n'
+        )
+
+    values = []
+    for line in connection.makefile('rb'):
+        message = json.loads(line)
+        if 'event' not in message:
+            values.append(message.get('data') or 0)
+            if len(values) == len(names):
+                return values
+
+
+def play_with_mpv(file_path, duration, device_type):
+    mpv = subprocess.Popen(
+        [
+            'mpv',
+            '--fs',
+            '--no-terminal',
+            '--no-osc',
+            f'--input-ipc-server={MPV_SOCKET}',
+            file_path,
+        ]
+        + MPV_HW_DECODE_OPTIONS.get(
+            device_type, MPV_DEFAULT_HW_DECODE_OPTIONS
+        ),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    process = psutil.Process(mpv.pid)
+
+    try:
+        started_at = monotonic()
+        sleep(duration)
+
+        cpu = sum(process.cpu_times()[:2])
+        elapsed = monotonic() - started_at
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(MPV_SOCKET)
+        with connection:
+            shown, dropped, decoder_dropped = mpv_get_properties(
+                connection,
+                [
+                    'estimated-frame-number',
+                    'frame-drop-count',
+                    'decoder-frame-drop-count',
+                ],
+            )
+        result = {
+            'cpu_percent': round(100 * cpu / elapsed, 1),
+            'decoded_frames': None,
+            'displayed_frames': shown,
+            'dropped_frames': dropped + decoder_dropped,
+        }
+    finally:
+        mpv.terminate()
+        mpv.wait()
+
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('video')
+    parser.add_argument(
+        '--duration',
+        type=int,
+        default=30,
+        help='Seconds to play each version for (default: 30).',
+    )
+    parser.add_argument(
+        '--device-type',
+        default=get_device_type(),
+        help='Profile to make the rendition for (default: this device).',
+    )
+    args = parser.parse_args()
+
+    settings['transcode_videos'] = True
+    profile = renditions.get_profile(args.device_type)
+    if profile is None:
+        print(f'{args.device_type} plays videos as they are, nothing to do.')
+        return 0
+
+    video = renditions.probe(args.video)
+    print(f'Original: {video}')
+    if not renditions.needs_rendition(video, profile):
+        print('The video already fits the profile, no rendition needed.')
+        return 0
+
+    if args.device_type in ['pi1', 'pi2', 'pi3', 'pi4']:
+        play = play_with_vlc
+    else:
+        play = play_with_mpv
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        rendition_path = path.join(tmp_dir, 'rendition.mp4')
+
+        started_at = monotonic()
+        renditions.transcode(args.video, rendition_path, video, profile)
+        print(f'Transcoded in {monotonic() - started_at:.1f}s')
+        print(f'Rendition: {renditions.probe(rendition_path)}')
+
+        results = {
+            'original': play(args.video, args.duration, args.device_type),
+            'rendition': play(rendition_path, args.duration, args.device_type),
+        }
+
+    print(f'{"":<10} {"CPU %":>8} {"decoded":>8} {"shown":>8} {"dropped":>8}')
+    for name, result in results.items():
+        print(
+            f'{name:<10} {result["cpu_percent"]:>8} '
+            f'{result["decoded_frames"] or "-":>8} '
+            f'{result["displayed_frames"] or "-":>8} '
+            f'{result["dropped_frames"]:>8}'
+        )
+
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
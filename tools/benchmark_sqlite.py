@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Runs writers, like the API saving assets, against readers, like the viewer
+building its playlist, on a scratch SQLite database. It does this once with
+SQLite's defaults and once with `SQLITE_PRAGMAS`, and reports throughput,
+read latency and "database is locked" errors for each, e.g.
+
+    python3 -m tools.benchmark_sqlite --writers 4 --readers 2
+
+The live database isn't touched.
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+from multiprocessing import Process, Queue
+from os import path
+from time import monotonic
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hive_django.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+
+from hive_app.signals import apply_pragmas  # noqa: E402
+
+ASSET_COUNT = 200
+# What Django gets without `SQLITE_PRAGMAS`: a rollback journal and the
+# 5 second busy timeout of `sqlite3.connect`.
+DEFAULT_PRAGMAS = {}
+
+
+def connect(database_path, pragmas):
+    # Autocommit, like Django.
+    connection = sqlite3.connect(database_path, isolation_level=None)
+    apply_pragmas(connection.cursor(), pragmas)
+    return connection
+
+
+def create_database(database_path, pragmas):
+    connection = connect(database_path, pragmas)
+    connection.execute(
+        'CREATE TABLE assets (asset_id TEXT PRIMARY KEY, name TEXT, '
+        'uri TEXT, duration INTEGER, play_order INTEGER, '
+        'is_enabled INTEGER)'
+    )
+    connection.executemany(
+        'INSERT INTO assets VALUES (?, ?, ?, 10, ?, 1)',
+        [
+            (f'{i:032x}', f'Asset {i}', f'/data/{i}.jpg', i)
+            for i in range(ASSET_COUNT)
+        ],
+    )
+    connection.close()
+
+
+def write(database_path, pragmas, deadline, results):
+    connection = connect(database_path, pragmas)
+    count = errors = 0
+
+    while monotonic() < deadline:
+        try:
+            # Reordering the playlist touches every asset in one
+            # transaction.
+            connection.execute('BEGIN IMMEDIATE')
+            for play_order in range(ASSET_COUNT):
+                connection.execute(
+                    'UPDATE assets SET play_order = ? WHERE asset_id = ?',
+                    (ASSET_COUNT - play_order, f'{play_order:032x}'),
+                )
+            connection.execute('COMMIT')
+            count += 1
+        except sqlite3.OperationalError:
+            errors += 1
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+
+    results.put(('write', count, errors, []))
+
+
+def read(database_path, pragmas, deadline, results):
+    connection = connect(database_path, pragmas)
+    count = errors = 0
+    latencies = []
+
+    while monotonic() < deadline:
+        started_at = monotonic()
+        try:
+            connection.execute(
+                'SELECT asset_id, name, uri, duration FROM assets '
+                'WHERE is_enabled = 1 ORDER BY play_order'
+            ).fetchall()
+            count += 1
+            latencies.append(monotonic() - started_at)
+        except sqlite3.OperationalError:
+            errors += 1
+
+    results.put(('read', count, errors, latencies))
+
+
+def run(name, pragmas, args):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database_path = path.join(tmp_dir, 'benchmark.db')
+        create_database(database_path, pragmas)
+
+        results = Queue()
+        deadline = monotonic() + args.duration
+        processes = [
+            Process(
+                target=write, args=(database_path, pragmas, deadline, results)
+            )
+            for _ in range(args.writers)
+        ] + [
+            Process(
+                target=read, args=(database_path, pragmas, deadline, results)
+            )
+            for _ in range(args.readers)
+        ]
+        for process in processes:
+            process.start()
+
+        totals = {
+            'write': {'count': 0, 'errors': 0},
+            'read': {'count': 0, 'errors': 0},
+        }
+        latencies = []
+        for _ in processes:
+            kind, count, errors, process_latencies = results.get()
+            totals[kind]['count'] += count
+            totals[kind]['errors'] += errors
+            latencies += process_latencies
+        for process in processes:
+            process.join()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0
+    print(
+        f'{name:<10} {totals["write"]["count"] / args.duration:>9.1f} '
+        f'{totals["write"]["errors"]:>8} '
+        f'{totals["read"]["count"] / args.duration:>9.1f} '
+        f'{totals["read"]["errors"]:>8} {p99 * 1000:>11.2f}'
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument(
+        '--duration',
+        type=int,
+        default=10,
+        help='Seconds to run each profile for (default: 10).',
+    )
+    args = parser.parse_args()
+
+    print(
+        f'{"profile":<10} {"writes/s":>9} {"locked":>8} {"reads/s":>9} '
+        f'{"locked":>8} {"read p99 ms":>11}'
+    )
+    run('default', DEFAULT_PRAGMAS, args)
+    run('tuned', settings.SQLITE_PRAGMAS, args)
+
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -232,6 +232,7 @@ def get_viewer_context(board: str) -> dict:
                 'qt6-base-dev',
                 'qt6-webengine-dev',
                 'qt6-image-formats-plugins',
+                'mpv',
             ]
         )
 
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Sends requests to the API from a number of clients at once and reports
+the requests per second and the latency of each endpoint, e.g.
+
+    python3 -m tools.load_test --concurrency 16 http://anthias.local
+
+Compare the results for different `GUNICORN_*` settings to pick the ones
+that suit a device. The endpoints are only read from.
+"""
+
+import argparse
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+from time import monotonic
+
+import requests
+
+DEFAULT_PATHS = [
+    '/api/v2/info',
+    '/api/v2/assets',
+    '/api/v2/device_settings',
+    '/splash-page',
+]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_client(base_url, paths, deadline, auth, results, lock):
+    session = requests.Session()
+    session.auth = auth
+
+    for path in cycle(paths):
+        if monotonic() >= deadline:
+            break
+
+        started_at = monotonic()
+        try:
+            response = session.get(f'{base_url}{path}', timeout=60)
+            ok = response.ok
+        except requests.RequestException:
+            ok = False
+        latency = monotonic() - started_at
+
+        with lock:
+            results[path]['latencies'].append(latency)
+            if not ok:
+                results[path]['errors'] += 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('base_url', help='e.g. http://anthias.local')
+    parser.add_argument(
+        '--path',
+        action='append',
+        dest='paths',
+        help='Endpoint to request, can be repeated (default: a few of '
+        'the ones the web interface polls).',
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=8,
+        help='Number of clients (default: 8).',
+    )
+    parser.add_argument(
+        '--duration',
+        type=int,
+        default=30,
+        help='Seconds to send requests for (default: 30).',
+    )
+    parser.add_argument('--username')
+    parser.add_argument('--password')
+    args = parser.parse_args()
+
+    paths = args.paths or DEFAULT_PATHS
+    auth = (args.username, args.password) if args.username else None
+    results = defaultdict(lambda: {'latencies': [], 'errors': 0})
+    lock = threading.Lock()
+
+    started_at = monotonic()
+    deadline = started_at + args.duration
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for index in range(args.concurrency):
+            # Each client starts on a different endpoint.
+            client_paths = (
+                paths[index % len(paths) :] + paths[: index % len(paths)]
+            )
+            executor.submit(
+                run_client,
+                args.base_url.rstrip('/'),
+                client_paths,
+                deadline,
+                auth,
+                results,
+                lock,
+            )
+    elapsed = monotonic() - started_at
+
+    print(
+        f'{"endpoint":<28} {"requests":>9} {"errors":>7} {"req/s":>8} '
+        f'{"p50 ms":>8} {"p99 ms":>8}'
+    )
+    all_latencies = []
+    for path in paths:
+        latencies = results[path]['latencies']
+        if not latencies:
+            continue
+        all_latencies += latencies
+        print(
+            f'{path:<28} {len(latencies):>9} {results[path]["errors"]:>7} '
+            f'{len(latencies) / elapsed:>8.1f} '
+            f'{percentile(latencies, 0.5) * 1000:>8.0f} '
+            f'{percentile(latencies, 0.99) * 1000:>8.0f}'
+        )
+
+    if all_latencies:
+        errors = sum(result['errors'] for result in results.values())
+        print(
+            f'{"total":<28} {len(all_latencies):>9} {errors:>7} '
+            f'{len(all_latencies) / elapsed:>8.1f} '
+            f'{percentile(all_latencies, 0.5) * 1000:>8.0f} '
+            f'{percentile(all_latencies, 0.99) * 1000:>8.0f}'
+        )
+
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
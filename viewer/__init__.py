@@ -17,18 +17,27 @@ from future import standard_library
 from jinja2 import Template
 from tenacity import Retrying, stop_after_attempt, wait_fixed
 
+from lib import renditions
 from settings import LISTEN, ZmqConsumer, settings
 from viewer.constants import (
     BALENA_IP_RETRY_DELAY,
     EMPTY_PL_DELAY,
     MAX_BALENA_IP_RETRIES,
+    PREFETCH_AHEAD,
     SERVER_WAIT_TIMEOUT,
     SPLASH_DELAY,
     SPLASH_PAGE_URL,
     STANDBY_SCREEN,
 )
+from viewer.event_loop import LoopEvent, event_loop
 from viewer.media_player import MediaPlayerProxy
-from viewer.playback import navigate_to_asset, play_loop, skip_asset, stop_loop
+from viewer.playback import (
+    TransitionTimer,
+    navigate_to_asset,
+    play_loop,
+    skip_asset,
+    stop_loop,
+)
 from viewer.utils import (
     command_not_found,
     get_skip_event,
@@ -48,10 +57,11 @@ try:
         get_node_ip,
         is_balena_app,
         string_to_bool,
-        url_fails,
     )
+    from viewer.asset_cache import AssetCache
+    from viewer.availability import AvailabilityProber
     from viewer.scheduling import Scheduler
-    from viewer.zmq import ZMQ_HOST_PUB_URL, ZmqSubscriber
+    from viewer.zmq import ZMQ_HOST_PUB_URL, ZMQ_RELAY_PUB_URL, ZmqSubscriber
 except Exception:
     pass
 
@@ -67,16 +77,28 @@ current_browser_url = None
 browser = None
 loop_is_stopped = False
 browser_bus = None
+webview_ready = LoopEvent(event_loop)
+webview_can_preload = True
+transition_timer = TransitionTimer()
 r = connect_to_redis()
 
 HOME = None
 
 scheduler = None
+availability_prober = None
+asset_cache = None
+# Only changes with the settings, see `load_settings`.
+rendition_profile = None
 
 
-def send_current_asset_id_to_server():
+def send_current_asset_id_to_server(request_id):
     consumer = ZmqConsumer()
-    consumer.send({'current_asset_id': scheduler.current_asset_id})
+    consumer.send(
+        {
+            'current_asset_id': scheduler.current_asset_id,
+            'request_id': request_id,
+        }
+    )
 
 
 def show_hotspot_page(data):
@@ -128,37 +150,69 @@ def show_splash(data):
         r.set('ip_addresses', data)
 
     view_webpage(SPLASH_PAGE_URL)
-    sleep(SPLASH_DELAY)
+    # Runs inside a command handler, so keep honouring skips meanwhile.
+    event_loop.run(until=get_skip_event().is_set, timeout=SPLASH_DELAY)
+    loop_is_stopped = play_loop()
+
+
+def pause_loop():
+    global loop_is_stopped
+    loop_is_stopped = stop_loop(scheduler)
+
+
+def resume_loop():
+    global loop_is_stopped
     loop_is_stopped = play_loop()
 
 
+def playlist_changed(data):
+    if scheduler is None:
+        return
+
+    try:
+        event = json.loads(data)
+        version = event['version']
+    except (TypeError, ValueError, KeyError):
+        logging.warning('Malformed playlist_changed event: %s', data)
+        return
+
+    scheduler.notify_playlist_changed(version, event.get('asset_ids'))
+
+
 commands = {
     'next': lambda _: skip_asset(scheduler),
     'previous': lambda _: skip_asset(scheduler, back=True),
     'asset': lambda asset_id: navigate_to_asset(scheduler, asset_id),
     'reload': lambda _: load_settings(),
-    'stop': lambda _: setattr(
-        __import__('__main__'), 'loop_is_stopped', stop_loop(scheduler)
-    ),
-    'play': lambda _: setattr(
-        __import__('__main__'), 'loop_is_stopped', play_loop()
-    ),
+    'stop': lambda _: pause_loop(),
+    'play': lambda _: resume_loop(),
     'setup_wifi': lambda data: setup_wifi(data),
     'show_splash': lambda data: show_splash(data),
     'unknown': lambda _: command_not_found(),
-    'current_asset_id': lambda _: send_current_asset_id_to_server(),
+    'current_asset_id': lambda request_id: send_current_asset_id_to_server(
+        request_id
+    ),
+    'playlist_changed': lambda data: playlist_changed(data),
 }
 
 
+def on_browser_output(line):
+    if 'HIVE service start' in line:
+        webview_ready.set()
+
+    if string_to_bool(getenv('WEBVIEW_DEBUG', '0')):
+        logging.info(line.rstrip())
+
+
 def load_browser():
     global browser
     logging.info('Loading browser...')
 
-    browser = sh.Command('HIVEWebview')(_bg=True, _err_to_out=True)
-    while 'HIVE service start' not in browser.process.stdout.decode(
-        'utf-8'
-    ):
-        sleep(1)
+    webview_ready.clear()
+    browser = sh.Command('HIVEWebview')(
+        _bg=True, _err_to_out=True, _out=on_browser_output
+    )
+    webview_ready.wait()
 
 
 def view_webpage(uri):
@@ -182,48 +236,125 @@ def view_image(uri):
         current_browser_url = uri
     logging.info('Current url is {0}'.format(current_browser_url))
 
-    if string_to_bool(getenv('WEBVIEW_DEBUG', '0')):
-        logging.info(browser.process.stdout)
+
+def get_asset_uri(asset):
+    """
+    Where to play `asset` from: its rendition for this device, its cached
+    copy or the original, whichever comes first.
+    """
+    return (
+        renditions.lookup(asset, rendition_profile)
+        or renditions.lookup_image(asset)
+        or asset_cache.lookup(asset)
+        or asset['uri']
+    )
+
+
+def preload_asset(asset):
+    """
+    Gets `asset` ready in the background so that showing it next is a swap
+    rather than a fresh load.
+    """
+    global webview_can_preload
+
+    uri = get_asset_uri(asset)
+    mime = asset['mimetype']
+
+    if 'image' not in mime and 'web' not in mime:
+        MediaPlayerProxy.get_instance().preload(uri)
+        return
+
+    if not webview_can_preload:
+        return
+
+    try:
+        if 'image' in mime:
+            browser_bus.preloadImage(uri)
+        else:
+            browser_bus.preloadPage(uri)
+    except AttributeError:
+        # The webview build predates preloading.
+        logging.info('Webview does not support preloading, disabling it')
+        webview_can_preload = False
+
+
+def preload_next_asset():
+    upcoming_assets = scheduler.get_upcoming_assets(1)
+    if upcoming_assets:
+        preload_asset(upcoming_assets[0])
 
 
 def view_video(uri, duration):
     logging.debug('Displaying video %s for %s ', uri, duration)
     media_player = MediaPlayerProxy.get_instance()
 
+    media_player.on_end = event_loop.wake
     media_player.set_asset(uri, duration)
     media_player.play()
 
     view_image('null')
+    preload_next_asset()
 
     try:
         skip_event = get_skip_event()
         skip_event.clear()
-        if skip_event.wait(timeout=int(duration)):
+        event_loop.run(
+            until=lambda: skip_event.is_set() or media_player.ended,
+            timeout=int(duration),
+        )
+        if skip_event.is_set():
             logging.info('Skip detected during video playback, stopping video')
             media_player.stop()
-        else:
-            pass
+        elif media_player.ended:
+            logging.debug('Video ended before its duration elapsed')
     except sh.ErrorReturnCode_1:
         logging.info(
             'Resource URI is not correct, remote host is not responding or '
             'request was rejected.'
         )
 
+    if media_player.started_at is None:
+        # The video never reached the screen.
+        transition_timer.cancel()
+    else:
+        transition_timer.stop(at=media_player.started_at)
+
     media_player.stop()
 
 
 def load_settings():
     """
-    Load settings and set the log level.
+    Load settings, set the log level and apply them to the media player.
     """
+    global rendition_profile
+
     settings.load()
     logging.getLogger().setLevel(
         logging.DEBUG if settings['debug_logging'] else logging.INFO
     )
+    # Worked out here rather than for every asset, since it reads the
+    # device tree.
+    rendition_profile = renditions.get_profile()
+    MediaPlayerProxy.reload()
 
 
 def asset_loop(scheduler):
     asset = scheduler.get_next_asset()
+    upcoming_assets = scheduler.get_upcoming_assets(PREFETCH_AHEAD)
+    availability_prober.prefetch(upcoming_assets)
+    asset_cache.prefetch(upcoming_assets)
+
+    # Both in one round trip, this runs for every asset shown.
+    pipeline = r.pipeline()
+    pipeline.set(
+        'availability_stats', json.dumps(availability_prober.get_stats())
+    )
+    pipeline.set('transition_stats', json.dumps(transition_timer.get_stats()))
+    pipeline.execute()
+
+    uri = None
+    if asset is not None:
+        uri = get_asset_uri(asset)
 
     if asset is None:
         logging.info(
@@ -241,18 +372,24 @@ def asset_loop(scheduler):
             # Duration elapsed normally, continue to next iteration
             pass
 
-    elif path.isfile(asset['uri']) or (
-        not url_fails(asset['uri']) or asset['skip_asset_check']
+    elif (
+        asset['skip_asset_check']
+        or path.isfile(uri)
+        or availability_prober.is_available(uri)
     ):
-        name, mime, uri = asset['name'], asset['mimetype'], asset['uri']
+        name, mime = asset['name'], asset['mimetype']
         logging.info('Showing asset %s (%s)', name, mime)
         logging.debug('Asset URI %s', uri)
         watchdog()
 
         if 'image' in mime:
             view_image(uri)
+            transition_timer.stop()
+            preload_next_asset()
         elif 'web' in mime:
             view_webpage(uri)
+            transition_timer.stop()
+            preload_next_asset()
         elif 'video' or 'streaming' in mime:
             view_video(uri, asset['duration'])
         else:
@@ -270,6 +407,8 @@ def asset_loop(scheduler):
                 # Duration elapsed normally, continue to next asset
                 pass
 
+        transition_timer.start()
+
     else:
         logging.info(
             'Asset %s at %s is not available, skipping.',
@@ -323,14 +462,14 @@ def start_loop():
     logging.debug('Entering infinite loop.')
     while True:
         if loop_is_stopped:
-            sleep(0.1)
+            event_loop.run(until=lambda: not loop_is_stopped)
             continue
 
         asset_loop(scheduler)
 
 
 def main():
-    global scheduler
+    global scheduler, availability_prober, asset_cache
     global load_screen_displayed, mq_data
 
     load_screen_displayed = False
@@ -338,13 +477,13 @@ def main():
 
     setup()
 
-    subscriber_1 = ZmqSubscriber(r, commands, 'tcp://anthias-server:10001')
-    subscriber_1.daemon = True
-    subscriber_1.start()
-
-    subscriber_2 = ZmqSubscriber(r, commands, ZMQ_HOST_PUB_URL)
-    subscriber_2.daemon = True
-    subscriber_2.start()
+    for publisher_url in [
+        'tcp://anthias-server:10001',
+        ZMQ_HOST_PUB_URL,
+        ZMQ_RELAY_PUB_URL,
+    ]:
+        subscriber = ZmqSubscriber(r, commands, publisher_url)
+        event_loop.add_reader(subscriber.socket, subscriber.handle)
 
     # This will prevent white screen from happening before showing the
     # splash screen with IP addresses.
@@ -353,6 +492,11 @@ def main():
     wait_for_server(SERVER_WAIT_TIMEOUT)
 
     scheduler = Scheduler()
+    availability_prober = AvailabilityProber()
+    asset_cache = AssetCache()
+    upcoming_assets = scheduler.get_upcoming_assets(PREFETCH_AHEAD)
+    availability_prober.prefetch(upcoming_assets)
+    asset_cache.prefetch(upcoming_assets)
 
     if settings['show_splash']:
         if is_balena_app():
@@ -364,7 +508,7 @@ def main():
                     get_balena_device_info()
 
         view_webpage(SPLASH_PAGE_URL)
-        sleep(SPLASH_DELAY)
+        event_loop.run(timeout=SPLASH_DELAY)
 
     # We don't want to show splash page if there are active assets but all of
     # them are not available.
@@ -376,6 +520,6 @@ def main():
         show_hotspot_page(mq_data)
         mq_data = None
 
-    sleep(0.5)
+    event_loop.run(timeout=0.5)
 
     start_loop()
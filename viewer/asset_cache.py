@@ -0,0 +1,251 @@
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from glob import glob
+from os import path
+from threading import Lock
+from time import time
+from urllib.parse import urlparse
+
+import certifi
+import requests
+
+from settings import settings
+from viewer.constants import (
+    ASSET_CACHE_CHUNK_SIZE,
+    ASSET_CACHE_DIR,
+    ASSET_CACHE_REVALIDATE_INTERVAL,
+    ASSET_CACHE_TIMEOUT,
+)
+
+CACHEABLE_MIMETYPES = ('image', 'video')
+INDEX_FILE = 'index.json'
+
+
+def is_cacheable(asset):
+    return (
+        not asset.get('nocache')
+        and asset.get('mimetype') in CACHEABLE_MIMETYPES
+        and urlparse(asset.get('uri') or '').scheme in ('http', 'https')
+    )
+
+
+class AssetCache(object):
+    """
+    Local copy of remote image and video assets, stored under
+    `<assetdir>/.cache` and named after the MD5 of their content.
+
+    Upcoming assets are downloaded ahead of their slot and revalidated
+    with `If-None-Match`/`If-Modified-Since`. When the origin can't be
+    reached the cached copy keeps being served. Blobs are evicted in
+    least-recently-used order once the cache grows past `max_bytes`.
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or path.join(
+            settings['assetdir'], ASSET_CACHE_DIR
+        )
+        self.max_bytes = (
+            settings['asset_cache_max_bytes']
+            if max_bytes is None
+            else max_bytes
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='asset-cache'
+        )
+        self.lock = Lock()
+        self.in_flight = set()
+        # uri -> {'md5', 'etag', 'last_modified', 'validated'}
+        self.entries = {}
+        # md5 -> {'size', 'ext'}, least recently used first
+        self.blobs = OrderedDict()
+
+        os.makedirs(self.directory, exist_ok=True)
+        for partial in glob(path.join(self.directory, '*.part')):
+            os.remove(partial)
+        self.load_index()
+
+    @property
+    def index_path(self):
+        return path.join(self.directory, INDEX_FILE)
+
+    def blob_path(self, md5):
+        return path.join(self.directory, f'{md5}{self.blobs[md5]["ext"]}')
+
+    def load_index(self):
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        for md5, blob in index.get('blobs', []):
+            self.blobs[md5] = blob
+            if not path.isfile(self.blob_path(md5)):
+                del self.blobs[md5]
+        self.entries = {
+            uri: entry
+            for uri, entry in index.get('entries', {}).items()
+            if entry['md5'] in self.blobs
+        }
+
+    def save_index(self):
+        # Called with `self.lock` held.
+        index = {
+            'entries': self.entries,
+            'blobs': list(self.blobs.items()),
+        }
+        tmp_path = f'{self.index_path}.part'
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+    @property
+    def size(self):
+        return sum(blob['size'] for blob in self.blobs.values())
+
+    def lookup(self, asset):
+        """Returns the path of the cached copy of `asset`, if any."""
+        if not self.max_bytes or not is_cacheable(asset):
+            return None
+
+        with self.lock:
+            entry = self.entries.get(asset['uri'])
+            if entry is None:
+                return None
+            self.blobs.move_to_end(entry['md5'])
+            return self.blob_path(entry['md5'])
+
+    def prefetch(self, assets):
+        """Downloads or revalidates the given assets in the background."""
+        if not self.max_bytes:
+            return
+
+        now = time()
+        for asset in assets:
+            if not is_cacheable(asset):
+                continue
+
+            uri = asset['uri']
+            with self.lock:
+                entry = self.entries.get(uri)
+                if uri in self.in_flight or (
+                    entry
+                    and now - entry['validated']
+                    < ASSET_CACHE_REVALIDATE_INTERVAL
+                ):
+                    continue
+                self.in_flight.add(uri)
+
+            self.executor.submit(self.fetch, asset)
+
+    def fetch(self, asset):
+        uri = asset['uri']
+        try:
+            self.download(asset)
+        except (OSError, requests.RequestException) as error:
+            # Keep serving whatever we already have.
+            logging.warning('Could not cache %s: %s', uri, error)
+        finally:
+            with self.lock:
+                self.in_flight.discard(uri)
+
+    def download(self, asset):
+        uri = asset['uri']
+        with self.lock:
+            entry = self.entries.get(uri)
+
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        response = requests.get(
+            uri,
+            headers=headers,
+            stream=True,
+            timeout=ASSET_CACHE_TIMEOUT,
+            verify=certifi.where() if settings['verify_ssl'] else True,
+        )
+        with response:
+            if response.status_code == 304 and entry:
+                # Not persisted; at worst we revalidate once after restart.
+                entry['validated'] = time()
+                return
+            response.raise_for_status()
+
+            md5 = hashlib.md5()
+            size = 0
+            tmp_path = path.join(
+                self.directory, f'{hashlib.md5(uri.encode()).hexdigest()}.part'
+            )
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(ASSET_CACHE_CHUNK_SIZE):
+                    md5.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+
+            digest = md5.hexdigest()
+            with self.lock:
+                if digest in self.blobs:
+                    # Same content under another URI (or unchanged).
+                    os.remove(tmp_path)
+                else:
+                    ext = path.splitext(urlparse(uri).path)[1]
+                    self.blobs[digest] = {'size': size, 'ext': ext}
+                    os.replace(tmp_path, self.blob_path(digest))
+
+                if entry and entry['md5'] != digest:
+                    self.release(entry['md5'], uri)
+
+                self.entries[uri] = {
+                    'md5': digest,
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'validated': time(),
+                }
+                self.blobs.move_to_end(digest)
+                self.evict()
+                self.save_index()
+
+        logging.info('Cached %s (%s bytes) as %s', uri, size, digest)
+
+    def release(self, md5, uri):
+        # Called with `self.lock` held. Drops the blob `uri` used to point
+        # to unless another URI shares the same content.
+        if any(
+            entry['md5'] == md5
+            for other_uri, entry in self.entries.items()
+            if other_uri != uri
+        ):
+            return
+
+        blob_path = self.blob_path(md5)
+        del self.blobs[md5]
+        try:
+            os.remove(blob_path)
+        except OSError:
+            pass
+
+    def evict(self):
+        # Called with `self.lock` held. The most recent blob is never
+        # evicted, even if it alone is larger than the budget.
+        total = self.size
+        while total > self.max_bytes and len(self.blobs) > 1:
+            md5 = next(iter(self.blobs))
+            blob_path = self.blob_path(md5)
+            total -= self.blobs.pop(md5)['size']
+            self.entries = {
+                uri: entry
+                for uri, entry in self.entries.items()
+                if entry['md5'] != md5
+            }
+            try:
+                os.remove(blob_path)
+            except OSError:
+                pass
+            logging.debug('Evicted %s from the asset cache', md5)
@@ -0,0 +1,155 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import monotonic
+
+from lib.utils import url_fails
+from viewer.constants import (
+    AVAILABILITY_MAX_RETRY_DELAY,
+    AVAILABILITY_RETRY_DELAY,
+    AVAILABILITY_TTL,
+    AVAILABILITY_WORKERS,
+)
+
+
+def is_remote(uri):
+    return bool(uri) and not uri.startswith('/')
+
+
+class AvailabilityProber(object):
+    """
+    Checks remote asset URIs on a thread pool ahead of their slot, so the
+    playback loop only does a cache lookup instead of a blocking HEAD/GET.
+
+    Healthy URIs are re-checked after `ttl` seconds. Failing ones are
+    cached as unavailable and retried with an exponential backoff that
+    starts at `retry_delay` and is capped at `max_retry_delay`.
+    """
+
+    def __init__(
+        self,
+        workers=AVAILABILITY_WORKERS,
+        ttl=AVAILABILITY_TTL,
+        retry_delay=AVAILABILITY_RETRY_DELAY,
+        max_retry_delay=AVAILABILITY_MAX_RETRY_DELAY,
+        check=url_fails,
+    ):
+        self.workers = workers
+        self.ttl = ttl
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.check = check
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='availability'
+        )
+        self.lock = Lock()
+        self.cache = {}
+        self.in_flight = set()
+        self.counters = {
+            'hits': 0,
+            'misses': 0,
+            'probes': 0,
+            'failures': 0,
+            'probe_time_total': 0.0,
+            'probe_time_max': 0.0,
+        }
+
+    def prefetch(self, assets):
+        """Schedules a probe for every asset without a fresh result."""
+        for asset in assets:
+            if asset.get('skip_asset_check'):
+                continue
+            self.submit(asset['uri'])
+
+    def submit(self, uri):
+        if not is_remote(uri):
+            return
+
+        with self.lock:
+            if uri in self.in_flight:
+                return
+            entry = self.cache.get(uri)
+            if entry and entry['expires'] > monotonic():
+                return
+            self.in_flight.add(uri)
+
+        self.executor.submit(self.probe, uri)
+
+    def probe(self, uri):
+        started = monotonic()
+        try:
+            available = not self.check(uri)
+        except Exception:
+            logging.exception('Availability probe for %s crashed', uri)
+            available = False
+        finished = monotonic()
+        elapsed = finished - started
+
+        with self.lock:
+            self.in_flight.discard(uri)
+            failures = self.cache.get(uri, {}).get('failures', 0)
+
+            if available:
+                failures = 0
+                expires = finished + self.ttl
+            else:
+                failures += 1
+                self.counters['failures'] += 1
+                expires = finished + min(
+                    self.retry_delay * 2 ** (failures - 1),
+                    self.max_retry_delay,
+                )
+
+            self.cache[uri] = {
+                'available': available,
+                'expires': expires,
+                'failures': failures,
+            }
+            self.counters['probes'] += 1
+            self.counters['probe_time_total'] += elapsed
+            self.counters['probe_time_max'] = max(
+                self.counters['probe_time_max'], elapsed
+            )
+
+        logging.debug(
+            'Probed %s in %.2fs: %s',
+            uri,
+            elapsed,
+            'available' if available else 'unavailable',
+        )
+
+    def is_available(self, uri):
+        """
+        Returns the last known state of `uri` without blocking. A URI that
+        was never probed is assumed to be available (that was the only
+        way to show it before the probe existed) and is probed for next
+        time.
+        """
+        if not is_remote(uri):
+            return True
+
+        with self.lock:
+            entry = self.cache.get(uri)
+            if entry is not None:
+                self.counters['hits'] += 1
+                return entry['available']
+            self.counters['misses'] += 1
+
+        self.submit(uri)
+        return True
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats['cached'] = len(self.cache)
+            stats['in_flight'] = len(self.in_flight)
+
+        stats['workers'] = self.workers
+        # More pending probes than workers means probes are queueing up.
+        stats['saturated'] = stats['in_flight'] > self.workers
+        stats['probe_time_avg'] = (
+            stats['probe_time_total'] / stats['probes']
+            if stats['probes']
+            else 0.0
+        )
+        return stats
@@ -11,3 +11,15 @@ SPLASH_PAGE_URL = f'http://{LISTEN}:{PORT}/splash-page'
 MAX_BALENA_IP_RETRIES = 90
 BALENA_IP_RETRY_DELAY = 1
 SERVER_WAIT_TIMEOUT = 60
+
+AVAILABILITY_WORKERS = 2
+AVAILABILITY_TTL = 300  # secs
+AVAILABILITY_RETRY_DELAY = 10  # secs, doubled after every failed probe
+AVAILABILITY_MAX_RETRY_DELAY = 600  # secs
+
+PREFETCH_AHEAD = 3  # upcoming assets to probe and cache in advance
+
+ASSET_CACHE_DIR = '.cache'  # relative to the asset directory
+ASSET_CACHE_REVALIDATE_INTERVAL = 300  # secs
+ASSET_CACHE_TIMEOUT = 30  # secs
+ASSET_CACHE_CHUNK_SIZE = 64 * 1024  # bytes
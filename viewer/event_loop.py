@@ -0,0 +1,105 @@
+import math
+import os
+from time import monotonic
+
+import zmq
+
+
+class EventLoop(object):
+    """
+    The viewer's single event loop. Whenever the viewer waits -- for an
+    asset's slot to end, for playback to be resumed, for the webview to
+    come up -- it does so in `run()`, which keeps handling the registered
+    ZMQ sockets and file descriptors in the meantime. Other threads wake
+    the loop through a pipe, so there is no polling interval.
+    """
+
+    def __init__(self):
+        self.poller = zmq.Poller()
+        self.handlers = {}
+        self.wakeup_fd, self.wakeup_write_fd = os.pipe()
+        os.set_blocking(self.wakeup_fd, False)
+        os.set_blocking(self.wakeup_write_fd, False)
+        self.add_reader(self.wakeup_fd, self.__drain_wakeups)
+
+    def add_reader(self, source, callback):
+        """Calls `callback()` whenever `source` (a ZMQ socket or a file
+        descriptor) has data to read.
+        """
+        self.handlers[source] = callback
+        self.poller.register(source, zmq.POLLIN)
+
+    def remove_reader(self, source):
+        self.poller.unregister(source)
+        del self.handlers[source]
+
+    def wake(self):
+        """Makes `run()` re-check its condition. Safe to call from any
+        thread.
+        """
+        try:
+            os.write(self.wakeup_write_fd, b'\0')
+        except BlockingIOError:
+            # The pipe is full, so a wake-up is pending anyway.
+            pass
+
+    def __drain_wakeups(self):
+        try:
+            while os.read(self.wakeup_fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def run(self, until=None, timeout=None):
+        """
+        Handles events until `until()` returns true or `timeout` seconds
+        have passed, whichever comes first. Returns whether `until` was
+        satisfied. Must only be called from the viewer's main thread, but
+        may be nested inside a handler.
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+
+        while True:
+            if until is not None and until():
+                return True
+
+            if deadline is None:
+                poll_timeout = None
+            else:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    return False
+                poll_timeout = math.ceil(remaining * 1000)
+
+            for source, _ in self.poller.poll(poll_timeout):
+                handler = self.handlers.get(source)
+                if handler is not None:
+                    handler()
+
+
+class LoopEvent(object):
+    """
+    A `threading.Event` lookalike whose `wait()` keeps the event loop
+    running, so that commands are still handled while the viewer waits
+    on it.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.flag = False
+
+    def is_set(self):
+        return self.flag
+
+    def set(self):
+        self.flag = True
+        self.loop.wake()
+
+    def clear(self):
+        self.flag = False
+
+    def wait(self, timeout=None):
+        return self.loop.run(until=self.is_set, timeout=timeout)
+
+
+event_loop = EventLoop()
@@ -1,7 +1,13 @@
 from __future__ import unicode_literals
 
+import json
 import logging
+import socket
 import subprocess
+from collections import OrderedDict
+from shutil import which
+from threading import Lock, Thread
+from time import monotonic, sleep
 
 import vlc
 
@@ -9,10 +15,50 @@ from lib.device_helper import get_device_type
 from settings import settings
 
 VIDEO_TIMEOUT = 20  # secs
+PRELOAD_TIMEOUT = 5000  # msecs
+MEDIA_POOL_SIZE = 16  # parsed media kept around for recurring assets
+
+MPV_SOCKET = '/tmp/mpv.sock'
+MPV_START_TIMEOUT = 5  # secs
+
+# Hardware decoders to try first. `any` falls back to software decoding
+# when the module isn't available in the installed VLC build.
+VLC_HW_DECODE_OPTIONS = {
+    'pi1': ['--codec=mmal_codec,any'],
+    'pi2': ['--codec=mmal_codec,any'],
+    'pi3': ['--codec=mmal_codec,any'],
+    'pi4': ['--codec=drm_avcodec,any'],
+}
+MPV_HW_DECODE_OPTIONS = {
+    'pi5': ['--hwdec=drm'],
+}
+MPV_DEFAULT_HW_DECODE_OPTIONS = ['--hwdec=auto-safe']
 
 
 class MediaPlayer:
     def __init__(self):
+        # Monotonic time at which the current asset reached the screen.
+        self.started_at = None
+        # Whether the current asset played to its end, and a callback for
+        # when it does. Called from the player's own thread.
+        self.ended = False
+        self.on_end = None
+
+    def _end_reached(self):
+        self.ended = True
+        if self.on_end is not None:
+            self.on_end()
+
+    def preload(self, uri):
+        """
+        Prepares `uri` while the current asset is still playing, so that a
+        following `set_asset(uri, ...)` only has to swap it in. Players
+        that can't prepare anything in advance ignore this.
+        """
+        pass
+
+    def reload(self):
+        """Applies settings changed since the player was created."""
         pass
 
     def set_asset(self, uri, duration):
@@ -37,11 +83,22 @@ class FFMPEGMediaPlayer(MediaPlayer):
         self.uri = uri
 
     def play(self):
+        # ffplay can't be started paused without opening its window on top
+        # of the current asset, so there is nothing to preload here.
+        self.ended = False
         self.process = subprocess.Popen(
             ['ffplay', '-autoexit', self.uri],
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
         )
+        self.started_at = monotonic()
+        Thread(
+            target=self.__wait_for_exit, args=(self.process,), daemon=True
+        ).start()
+
+    def __wait_for_exit(self, process):
+        if process.wait() == 0 and self.process is process:
+            self._end_reached()
 
     def stop(self):
         try:
@@ -57,15 +114,138 @@ class FFMPEGMediaPlayer(MediaPlayer):
         return False
 
 
+class MPVMediaPlayer(MediaPlayer):
+    """
+    A single long-lived mpv process, driven over its JSON IPC socket, so
+    that consecutive videos don't each pay for a fork and decoder set-up.
+    mpv only opens its window while a file is loaded.
+    """
+
+    def __init__(self):
+        MediaPlayer.__init__(self)
+        self.process = None
+        self.connection = None
+        self.lock = Lock()
+        self.uri = None
+        self.playing = False
+
+    def __start(self):
+        self.process = subprocess.Popen(
+            [
+                'mpv',
+                '--idle=yes',
+                '--force-window=no',
+                '--fs',
+                '--no-terminal',
+                '--no-osc',
+                '--no-input-default-bindings',
+                f'--input-ipc-server={MPV_SOCKET}',
+            ]
+            + MPV_HW_DECODE_OPTIONS.get(
+                get_device_type(), MPV_DEFAULT_HW_DECODE_OPTIONS
+            ),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        deadline = monotonic() + MPV_START_TIMEOUT
+        while True:
+            try:
+                connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                connection.connect(MPV_SOCKET)
+                break
+            except OSError:
+                connection.close()
+                if monotonic() > deadline or self.process.poll() is not None:
+                    raise
+                sleep(0.1)
+
+        self.connection = connection
+        Thread(
+            target=self.__read_events, args=(connection,), daemon=True
+        ).start()
+
+    def __read_events(self, connection):
+        for line in connection.makefile('rb'):
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            event = message.get('event')
+
+            if event == 'start-file':
+                self.playing = True
+            elif event == 'playback-restart':
+                self.started_at = monotonic()
+            elif event == 'end-file':
+                self.playing = False
+                if message.get('reason') == 'eof':
+                    self._end_reached()
+
+    def __command(self, *args):
+        with self.lock:
+            if self.process is None or self.process.poll() is not None:
+                self.__start()
+
+            message = json.dumps({'command': list(args)}) + '\n'
+            self.connection.sendall(message.encode('utf-8'))
+
+    def set_asset(self, uri, duration):
+        self.uri = uri
+
+    def play(self):
+        self.started_at = None
+        self.ended = False
+        self.playing = True
+        try:
+            self.__command('loadfile', self.uri, 'replace')
+        except OSError as e:
+            self.playing = False
+            logging.error(f'Could not start mpv: {e}')
+
+    def stop(self):
+        self.playing = False
+        try:
+            if self.process and self.process.poll() is None:
+                self.__command('stop')
+        except OSError as e:
+            logging.error(f'Exception in stop(): {e}')
+
+    def is_playing(self):
+        return self.playing
+
+
 class VLCMediaPlayer(MediaPlayer):
+    """
+    Keeps one libVLC instance and player for the lifetime of the viewer,
+    along with a small pool of parsed media for assets that come around
+    again.
+    """
+
     def __init__(self):
         MediaPlayer.__init__(self)
 
-        options = self.__get_options()
-        self.instance = vlc.Instance(options)
+        self.audio_device = self.get_alsa_audio_device()
+        self.instance = vlc.Instance(self.__get_options())
         self.player = self.instance.media_player_new()
+        # uri -> vlc.Media, least recently used first
+        self.media_pool = OrderedDict()
 
         self.player.audio_output_set('alsa')
+        self.player.audio_output_device_set('alsa', self.audio_device)
+        event_manager = self.player.event_manager()
+        event_manager.event_attach(
+            vlc.EventType.MediaPlayerVout, self.__on_vout
+        )
+        event_manager.event_attach(
+            vlc.EventType.MediaPlayerEndReached, self.__on_end_reached
+        )
+
+    def __on_vout(self, event):
+        self.started_at = monotonic()
+
+    def __on_end_reached(self, event):
+        self._end_reached()
 
     def get_alsa_audio_device(self):
         if settings['audio_output'] == 'local':
@@ -83,17 +263,39 @@ class VLCMediaPlayer(MediaPlayer):
 
     def __get_options(self):
         return [
-            f'--alsa-audio-device={self.get_alsa_audio_device()}',
-        ]
+            f'--alsa-audio-device={self.audio_device}',
+        ] + VLC_HW_DECODE_OPTIONS.get(get_device_type(), [])
+
+    def reload(self):
+        audio_device = self.get_alsa_audio_device()
+        if audio_device != self.audio_device:
+            self.audio_device = audio_device
+            self.player.audio_output_device_set('alsa', audio_device)
+
+    def __get_media(self, uri):
+        media = self.media_pool.pop(uri, None)
+        if media is None:
+            # Parsing runs asynchronously in libVLC and resolves the
+            # container and streams, which is most of the start-up cost.
+            media = self.instance.media_new(uri)
+            media.parse_with_options(
+                vlc.MediaParseFlag.network, PRELOAD_TIMEOUT
+            )
+
+        self.media_pool[uri] = media
+        while len(self.media_pool) > MEDIA_POOL_SIZE:
+            self.media_pool.popitem(last=False)
+        return media
+
+    def preload(self, uri):
+        self.__get_media(uri)
 
     def set_asset(self, uri, duration):
-        self.player.set_mrl(uri)
-        settings.load()
-        self.player.audio_output_device_set(
-            'alsa', self.get_alsa_audio_device()
-        )
+        self.player.set_media(self.__get_media(uri))
 
     def play(self):
+        self.started_at = None
+        self.ended = False
         self.player.play()
 
     def stop(self):
@@ -115,7 +317,14 @@ class MediaPlayerProxy:
         if cls.INSTANCE is None:
             if get_device_type() in ['pi1', 'pi2', 'pi3', 'pi4']:
                 cls.INSTANCE = VLCMediaPlayer()
+            elif which('mpv'):
+                cls.INSTANCE = MPVMediaPlayer()
             else:
                 cls.INSTANCE = FFMPEGMediaPlayer()
 
         return cls.INSTANCE
+
+    @classmethod
+    def reload(cls):
+        if cls.INSTANCE is not None:
+            cls.INSTANCE.reload()
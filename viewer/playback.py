@@ -1,7 +1,9 @@
-import threading
+from time import monotonic
+
+from viewer.event_loop import LoopEvent, event_loop
 
 # Global event for instant asset switching
-skip_event = threading.Event()
+skip_event = LoopEvent(event_loop)
 
 
 def skip_asset(scheduler, back=False):
@@ -22,3 +24,47 @@ def stop_loop(scheduler):
 
 def play_loop():
     return False
+
+
+class TransitionTimer(object):
+    """
+    Measures the gap between one asset leaving the screen and the next one
+    being shown.
+    """
+
+    def __init__(self):
+        self.started = None
+        self.count = 0
+        self.last = 0.0
+        self.total = 0.0
+        self.max = 0.0
+
+    def start(self):
+        self.started = monotonic()
+
+    def stop(self, at=None):
+        """
+        Records the transition as finished at `at` (a `monotonic()`
+        timestamp, defaults to now) and returns its duration.
+        """
+        if self.started is None:
+            return None
+
+        elapsed = max((monotonic() if at is None else at) - self.started, 0)
+        self.started = None
+        self.count += 1
+        self.last = elapsed
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        return elapsed
+
+    def cancel(self):
+        self.started = None
+
+    def get_stats(self):
+        return {
+            'count': self.count,
+            'last': self.last,
+            'avg': self.total / self.count if self.count else 0.0,
+            'max': self.max,
+        }
@@ -1,13 +1,35 @@
 import logging
+from bisect import bisect_left, bisect_right
 from os import path
 from random import shuffle
+from threading import Lock
+from time import monotonic
 
-from django.db.models import Case, DateTimeField, F, Min, When
 from django.utils import timezone
 
 from hive_app.models import Asset
 from settings import settings
 
+PLAYLIST_FIELDS = (
+    'asset_id',
+    'name',
+    'uri',
+    'start_date',
+    'end_date',
+    'duration',
+    'mimetype',
+    'md5',
+    'is_enabled',
+    'is_processing',
+    'nocache',
+    'play_order',
+    'skip_asset_check',
+)
+
+# Above this many changed assets a full reload is cheaper than an
+# `asset_id IN (...)` query (and stays below SQLite's parameter limit).
+MAX_INCREMENTAL_ASSETS = 500
+
 
 def get_specific_asset(asset_id):
     logging.info('Getting specific asset')
@@ -18,56 +40,166 @@ def get_specific_asset(asset_id):
         return None
 
 
-def generate_asset_list():
-    """Choose deadline via:
-    1. Map assets to deadlines with rule: if asset is active then
-       'end_date' else 'start_date'
-    2. Get nearest deadline
+class ScheduleIndex(object):
     """
-    logging.info('Generating asset-list...')
-    current_time = timezone.now()
+    In-memory timeline of the enabled assets' schedule windows.
+
+    `boundaries` is the sorted list of every distinct start and end date,
+    and `segments[i]` holds the ids of the assets that are active strictly
+    between `boundaries[i - 1]` and `boundaries[i]` (the first and the last
+    segment are open-ended). Looking up the active set or the next change
+    is a bisect, and a single asset can be added or removed without
+    rebuilding the whole index.
+    """
+
+    def __init__(self):
+        self.assets = {}
+        self.boundaries = []
+        self.boundary_refs = {}
+        self.segments = [set()]
 
-    enabled_assets = Asset.objects.filter(
-        is_enabled=True,
-        start_date__isnull=False,
-        end_date__isnull=False,
-    )
+    @classmethod
+    def from_assets(cls, assets):
+        index = cls()
+        for asset in assets:
+            if not cls.is_schedulable(asset):
+                continue
+            index.assets[asset['asset_id']] = asset
+            for boundary in (asset['start_date'], asset['end_date']):
+                index.boundary_refs[boundary] = (
+                    index.boundary_refs.get(boundary, 0) + 1
+                )
 
-    playlist = list(
-        enabled_assets.filter(
-            start_date__lt=current_time,
-            end_date__gt=current_time,
+        index.boundaries = sorted(index.boundary_refs)
+        index.segments = [set() for _ in range(len(index.boundaries) + 1)]
+        for asset in index.assets.values():
+            index._mark(asset, set.add)
+
+        return index
+
+    @classmethod
+    def from_database(cls):
+        return cls.from_assets(
+            Asset.objects.filter(
+                is_enabled=True,
+                start_date__isnull=False,
+                end_date__isnull=False,
+            ).values(*PLAYLIST_FIELDS)
         )
-        .order_by('play_order')
-        .values(
-            'asset_id',
-            'name',
-            'uri',
-            'start_date',
-            'end_date',
-            'duration',
-            'mimetype',
-            'is_enabled',
-            'is_processing',
-            'nocache',
-            'play_order',
-            'skip_asset_check',
+
+    @staticmethod
+    def is_schedulable(asset):
+        # Assets still being ingested may not be playable yet.
+        return bool(
+            asset['is_enabled']
+            and not asset['is_processing']
+            and asset['start_date']
+            and asset['end_date']
         )
-    )
-
-    deadline = enabled_assets.aggregate(
-        deadline=Min(
-            Case(
-                When(
-                    start_date__lt=current_time,
-                    end_date__gt=current_time,
-                    then=F('end_date'),
-                ),
-                default=F('start_date'),
-                output_field=DateTimeField(),
-            )
+
+    def __len__(self):
+        return len(self.assets)
+
+    def _segment_range(self, asset):
+        first = bisect_left(self.boundaries, asset['start_date']) + 1
+        last = bisect_left(self.boundaries, asset['end_date'])
+        return range(first, last + 1)
+
+    def _mark(self, asset, operation):
+        for i in self._segment_range(asset):
+            operation(self.segments[i], asset['asset_id'])
+
+    def _add_boundary(self, boundary):
+        refs = self.boundary_refs.get(boundary, 0)
+        self.boundary_refs[boundary] = refs + 1
+        if refs:
+            return
+
+        # Split the segment the new boundary falls into.
+        i = bisect_left(self.boundaries, boundary)
+        self.boundaries.insert(i, boundary)
+        self.segments.insert(i, set(self.segments[i]))
+
+    def _remove_boundary(self, boundary):
+        refs = self.boundary_refs[boundary] - 1
+        if refs:
+            self.boundary_refs[boundary] = refs
+            return
+
+        # Nothing else starts or ends here any more, so the segments on
+        # both sides hold the same assets and can be merged.
+        del self.boundary_refs[boundary]
+        i = bisect_left(self.boundaries, boundary)
+        del self.boundaries[i]
+        del self.segments[i]
+
+    def upsert(self, asset):
+        self.remove(asset['asset_id'])
+        if not self.is_schedulable(asset):
+            return
+
+        self.assets[asset['asset_id']] = asset
+        self._add_boundary(asset['start_date'])
+        self._add_boundary(asset['end_date'])
+        self._mark(asset, set.add)
+
+    def remove(self, asset_id):
+        asset = self.assets.pop(asset_id, None)
+        if asset is None:
+            return
+
+        self._mark(asset, set.discard)
+        self._remove_boundary(asset['end_date'])
+        self._remove_boundary(asset['start_date'])
+
+    def refresh(self, asset_ids):
+        """Re-read the given assets from the database."""
+        asset_ids = set(asset_ids)
+        for asset in Asset.objects.filter(asset_id__in=asset_ids).values(
+            *PLAYLIST_FIELDS
+        ):
+            asset_ids.discard(asset['asset_id'])
+            self.upsert(asset)
+
+        # Whatever is left has been deleted.
+        for asset_id in asset_ids:
+            self.remove(asset_id)
+
+    def active_at(self, moment):
+        """Returns the assets active at `moment`, sorted by play order."""
+        i = bisect_left(self.boundaries, moment)
+        if i < len(self.boundaries) and self.boundaries[i] == moment:
+            # Assets starting or ending exactly now aren't active.
+            asset_ids = self.segments[i] & self.segments[i + 1]
+        else:
+            asset_ids = self.segments[i]
+
+        return sorted(
+            (self.assets[asset_id] for asset_id in asset_ids),
+            key=lambda asset: (asset['play_order'], asset['asset_id']),
         )
-    )['deadline']
+
+    def next_change_after(self, moment):
+        """Returns the first time after `moment` the active set changes."""
+        i = bisect_right(self.boundaries, moment)
+        if i < len(self.boundaries):
+            return self.boundaries[i]
+        return None
+
+
+def generate_asset_list(schedule=None):
+    """Returns the active playlist and the deadline, i.e. the next time
+    an asset either starts or ends. Without a `schedule` the index is
+    built from the database.
+    """
+    logging.info('Generating asset-list...')
+    current_time = timezone.now()
+
+    if schedule is None:
+        schedule = ScheduleIndex.from_database()
+
+    playlist = schedule.active_at(current_time)
+    deadline = schedule.next_change_after(current_time)
 
     logging.debug('generate_asset_list deadline: %s', deadline)
 
@@ -87,6 +219,13 @@ class Scheduler(object):
         self.extra_asset = None
         self.index = 0
         self.reverse = 0
+        self.playlist_version = None
+        self.pending_playlist_version = None
+        self.pending_asset_ids = set()
+        self.pending_full_reload = False
+        self.pending_lock = Lock()
+        self.last_db_mtime_check = 0
+        self.schedule = None
         self.update_playlist()
 
     def get_next_asset(self):
@@ -128,6 +267,16 @@ class Scheduler(object):
         self.current_asset_id = current_asset.get('asset_id')
         return current_asset
 
+    def get_upcoming_assets(self, count):
+        """Returns the next `count` playlist entries without advancing."""
+        if not self.assets:
+            return []
+
+        return [
+            self.assets[(self.index + i) % len(self.assets)]
+            for i in range(min(count, len(self.assets)))
+        ]
+
     def refresh_playlist(self):
         logging.debug('refresh_playlist')
         time_cur = timezone.now()
@@ -139,18 +288,86 @@ class Scheduler(object):
             time_cur,
         )
 
-        if self.get_db_mtime() > self.last_update_db_mtime:
+        if self.has_pending_playlist_change():
+            logging.debug(
+                'updating playlist due to version %s',
+                self.pending_playlist_version,
+            )
+            self.apply_playlist_change()
+        elif self.db_mtime_check_due() and (
+            self.get_db_mtime() > self.last_update_db_mtime
+        ):
             logging.debug('updating playlist due to database modification')
             self.update_playlist()
         elif settings['shuffle_playlist'] and self.counter >= 5:
-            self.update_playlist()
+            self.update_playlist(reload=False)
         elif self.deadline and self.deadline <= time_cur:
+            self.update_playlist(reload=False)
+
+    def notify_playlist_changed(self, version, asset_ids=None):
+        """
+        Called from the ZMQ subscriber thread when the server publishes a
+        `playlist_changed` event. The rebuild itself happens on the next
+        `refresh_playlist()` so it never races with playback.
+
+        Events arrive in order over a single socket, so any version other
+        than the one already applied is new (a lower one means the counter
+        in Redis was reset). Without `asset_ids` the whole schedule is
+        reloaded.
+        """
+        with self.pending_lock:
+            if asset_ids:
+                self.pending_asset_ids.update(asset_ids)
+            else:
+                self.pending_full_reload = True
+            self.pending_playlist_version = version
+
+    def has_pending_playlist_change(self):
+        pending = self.pending_playlist_version
+        return pending is not None and pending != self.playlist_version
+
+    def db_mtime_check_due(self):
+        # The database mtime is only a fallback for missed events, so we
+        # stat the file at most once per `playlist_poll_interval`.
+        now = monotonic()
+        interval = settings['playlist_poll_interval']
+        if now - self.last_db_mtime_check < interval:
+            return False
+
+        self.last_db_mtime_check = now
+        return True
+
+    def apply_playlist_change(self):
+        with self.pending_lock:
+            version = self.pending_playlist_version
+            asset_ids = self.pending_asset_ids
+            full_reload = self.pending_full_reload
+            self.pending_asset_ids = set()
+            self.pending_full_reload = False
+
+        if full_reload or len(asset_ids) > MAX_INCREMENTAL_ASSETS:
             self.update_playlist()
+        else:
+            self.playlist_version = version
+            self.schedule.refresh(asset_ids)
+            self.update_playlist(reload=False)
 
-    def update_playlist(self):
+    def update_playlist(self, reload=True):
+        """
+        Regenerates the playlist. With `reload` the schedule index is
+        rebuilt from the database, otherwise the in-memory one is used.
+        """
         logging.debug('update_playlist')
-        self.last_update_db_mtime = self.get_db_mtime()
-        (new_assets, new_deadline) = generate_asset_list()
+        if reload or self.schedule is None:
+            with self.pending_lock:
+                self.playlist_version = self.pending_playlist_version
+                self.pending_asset_ids = set()
+                self.pending_full_reload = False
+            self.last_update_db_mtime = self.get_db_mtime()
+            self.last_db_mtime_check = monotonic()
+            self.schedule = ScheduleIndex.from_database()
+
+        (new_assets, new_deadline) = generate_asset_list(self.schedule)
         if new_assets == self.assets and new_deadline == self.deadline:
             # If nothing changed, don't disturb the current play-through.
             return
@@ -170,8 +387,14 @@ class Scheduler(object):
         )
 
     def get_db_mtime(self):
-        # get database file last modification time
-        try:
-            return path.getmtime(settings['database'])
-        except (OSError, TypeError):
-            return 0
+        # In WAL mode commits only touch the `-wal` file until the next
+        # checkpoint, so the newer of the two is taken.
+        mtime = 0
+        for suffix in ('', '-wal'):
+            try:
+                mtime = max(
+                    mtime, path.getmtime(f'{settings["database"]}{suffix}')
+                )
+            except OSError:
+                pass
+        return mtime
@@ -1,11 +1,11 @@
 import logging
 from os import path, utime
-from time import sleep
 
 import requests
 
 from lib.errors import SigalrmError
 from settings import LISTEN, PORT
+from viewer.event_loop import event_loop
 
 WATCHDOG_PATH = '/tmp/screenly.watchdog'
 
@@ -45,4 +45,4 @@ def wait_for_server(retries, wt=1):
             response.raise_for_status()
             break
         except requests.exceptions.RequestException:
-            sleep(wt)
+            event_loop.run(timeout=wt)
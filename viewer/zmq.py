@@ -1,12 +1,20 @@
+import logging
 from builtins import bytes
-from threading import Thread
 
 import zmq
 
 ZMQ_HOST_PUB_URL = 'tcp://host.docker.internal:10001'
+# What the Celery workers send to the viewer, see `ZmqRelayPublisher`.
+ZMQ_RELAY_PUB_URL = 'tcp://anthias-websocket:10003'
 
 
-class ZmqSubscriber(Thread):
+class ZmqSubscriber(object):
+    """
+    Subscribes to viewer commands on `publisher_url`. The socket is
+    polled by the viewer's event loop, which calls `handle()` whenever
+    commands are waiting.
+    """
+
     def __init__(
         self,
         redis_connection,
@@ -14,23 +22,28 @@ class ZmqSubscriber(Thread):
         publisher_url,
         topic='viewer',
     ):
-        Thread.__init__(self)
         self.context = zmq.Context()
         self.publisher_url = publisher_url
         self.topic = topic
         self.commands = commands
         self.redis_connection = redis_connection
 
-    def run(self):
-        socket = self.context.socket(zmq.SUB)
-        socket.connect(self.publisher_url)
-        socket.setsockopt(zmq.SUBSCRIBE, bytes(self.topic, encoding='utf-8'))
+        self.socket = self.context.socket(zmq.SUB)
+        self.socket.connect(self.publisher_url)
+        self.socket.setsockopt(
+            zmq.SUBSCRIBE, bytes(self.topic, encoding='utf-8')
+        )
 
         if self.publisher_url == ZMQ_HOST_PUB_URL:
             self.redis_connection.set('viewer-subscriber-ready', int(True))
 
+    def handle(self):
         while True:
-            msg = socket.recv()
+            try:
+                msg = self.socket.recv(zmq.NOBLOCK)
+            except zmq.Again:
+                return
+
             topic, message = msg.decode('utf-8').split(' ', 1)
 
             # If the command consists of 2 parts, then the first is the
@@ -39,4 +52,9 @@ class ZmqSubscriber(Thread):
             command = parts[0]
             parameter = parts[1] if len(parts) > 1 else None
 
-            self.commands.get(command, self.commands.get('unknown'))(parameter)
+            try:
+                self.commands.get(command, self.commands.get('unknown'))(
+                    parameter
+                )
+            except Exception:
+                logging.exception('Viewer command %s failed', command)
@@ -36,15 +36,31 @@ class HIVEServerListener(Thread):
 
     def run(self):
         socket_incoming = self.context.socket(zmq.SUB)
+        socket_relay = self.context.socket(zmq.SUB)
         socket_outgoing = self.context.socket(zmq.PUB)
+        socket_viewer = self.context.socket(zmq.PUB)
 
         socket_incoming.connect('tcp://anthias-server:10001')
+        # Where the Celery workers send their updates, see
+        # `ZmqRelayPublisher`. What they send to the viewer is
+        # republished for it, the viewer already gets anthias-server's
+        # own messages directly.
+        socket_relay.bind('tcp://0.0.0.0:10002')
+        socket_viewer.bind('tcp://0.0.0.0:10003')
         socket_outgoing.bind('inproc://queue')
 
         socket_incoming.setsockopt(zmq.SUBSCRIBE, b'')
+        socket_relay.setsockopt(zmq.SUBSCRIBE, b'')
+
+        poller = zmq.Poller()
+        poller.register(socket_incoming, zmq.POLLIN)
+        poller.register(socket_relay, zmq.POLLIN)
         while True:
-            msg = socket_incoming.recv()
-            socket_outgoing.send(msg)
+            for socket, _ in poller.poll():
+                msg = socket.recv()
+                socket_outgoing.send(msg)
+                if socket is socket_relay and msg.startswith(b'viewer '):
+                    socket_viewer.send(msg)
 
 
 if __name__ == '__main__':
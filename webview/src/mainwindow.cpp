@@ -28,3 +28,13 @@ void MainWindow::loadImage(const QString &uri)
 {
     view->loadImage(uri);
 }
+
+void MainWindow::preloadPage(const QString &uri)
+{
+    view->preloadPage(uri);
+}
+
+void MainWindow::preloadImage(const QString &uri)
+{
+    view->preloadImage(uri);
+}
@@ -15,6 +15,8 @@ class MainWindow : public QMainWindow
     public slots:
         void loadPage(const QString &uri);
         void loadImage(const QString &uri);
+        void preloadPage(const QString &uri);
+        void preloadImage(const QString &uri);
 
     private:
         View *view;
@@ -24,6 +24,7 @@ View::View(QWidget* parent) : QWidget(parent)
     currentWebView = webView1;
     nextWebView = webView2;
     nextWebViewReady = false;
+    pageLoadPending = false;
 
     // Make webView1 the main webView for compatibility
     webView = webView1;
@@ -43,6 +44,10 @@ View::View(QWidget* parent) : QWidget(parent)
     animationTimer = new QTimer(this);
     isAnimatedImage = false;
 
+    preloadImageReply = nullptr;
+    preloadedImageReady = false;
+    showPreloadedImageWhenReady = false;
+
     connect(animationTimer, &QTimer::timeout, this, &View::updateMovieFrame);
 }
 
@@ -70,6 +75,23 @@ void View::loadPage(const QString &uri)
     animationTimer->stop();
     isAnimatedImage = false;
 
+    clearPreloadedImage();
+    pageLoadPending = true;
+    nextWebView->page()->setAudioMuted(false);
+
+    if (!preloadedPageUri.isEmpty() && preloadedPageUri == uri) {
+        preloadedPageUri.clear();
+
+        if (nextWebViewReady) {
+            qDebug() << "Showing preloaded web page:" << uri;
+            switchToNextWebView();
+        } else {
+            qDebug() << "Preloaded web page still loading, showing it when ready:" << uri;
+        }
+        return;
+    }
+    preloadedPageUri.clear();
+
     // Reset web view states
     resetWebViewStates();
 
@@ -84,10 +106,40 @@ void View::loadPage(const QString &uri)
     qDebug() << "Loading web page in background web view:" << uri;
 }
 
+void View::preloadPage(const QString &uri)
+{
+    if (pageLoadPending) {
+        // The next web view is still busy with the page that should be on
+        // screen right now.
+        qDebug() << "Web page load in progress, not preloading:" << uri;
+        return;
+    }
+    if (uri == preloadedPageUri) {
+        return;
+    }
+
+    qDebug() << "Preloading web page in background web view:" << uri;
+
+    resetWebViewStates();
+    preloadedPageUri = uri;
+
+    connect(nextWebView->page(), &QWebEnginePage::loadProgress, this, &View::onWebPageLoadProgress);
+    connect(nextWebView->page(), &QWebEnginePage::loadFinished, this, &View::onWebPageLoadFinished);
+
+    // Keep the hidden page quiet until it is switched in
+    nextWebView->page()->setAudioMuted(true);
+    nextWebView->stop();
+    nextWebView->load(QUrl(uri));
+}
+
 void View::loadImage(const QString &preUri)
 {
     qDebug() << "Type: Image";
 
+    // An image replaces any web page that is still loading
+    pageLoadPending = false;
+    preloadedPageUri.clear();
+
     // Hide both web views when switching to image
     webView1->setVisible(false);
     webView2->setVisible(false);
@@ -101,23 +153,7 @@ void View::loadImage(const QString &preUri)
     animationTimer->stop();
     isAnimatedImage = false;
 
-    QFileInfo fileInfo = QFileInfo(preUri);
-    QString src;
-
-    if (fileInfo.isFile())
-    {
-        qDebug() << "Location: Local File";
-        qDebug() << "File path:" << fileInfo.absoluteFilePath();
-
-        QUrl url;
-        url.setScheme("http");
-        url.setHost("anthias-nginx");
-        url.setPath("/screenly_assets/" + fileInfo.fileName());
-
-        src = url.toString();
-        qDebug() << "Generated URL:" << src;
-    }
-    else if (preUri == "null")
+    if (preUri == "null")
     {
         qDebug() << "Black page";
         currentImage = QImage();
@@ -125,12 +161,23 @@ void View::loadImage(const QString &preUri)
         update();
         return;
     }
-    else
-    {
-        qDebug() << "Location: Remote URL";
-        src = preUri;
+
+    if (!preloadedImageUri.isEmpty() && preloadedImageUri == preUri) {
+        if (preloadedImageReady) {
+            qDebug() << "Showing preloaded image:" << preUri;
+            QByteArray data = preloadedImageData;
+            QImage image = preloadedImage;
+            clearPreloadedImage();
+            showImageData(data, image);
+        } else {
+            qDebug() << "Preloaded image still loading, showing it when ready:" << preUri;
+            showPreloadedImageWhenReady = true;
+        }
+        return;
     }
+    clearPreloadedImage();
 
+    QString src = resolveImageSource(preUri);
     qDebug() << "Loading image from:" << src;
 
     // Start loading the next image
@@ -141,14 +188,7 @@ void View::loadImage(const QString &preUri)
         if (reply->error() == QNetworkReply::NoError) {
             QByteArray data = reply->readAll();
             qDebug() << "Received image data size:" << data.size();
-
-            if (tryLoadAsAnimatedGif(data)) {
-                // Successfully loaded as animated GIF
-                return;
-            } else {
-                // Load as static image
-                loadAsStaticImage(data);
-            }
+            showImageData(data, QImage());
         } else {
             qDebug() << "Network error:" << reply->errorString();
         }
@@ -161,6 +201,119 @@ void View::loadImage(const QString &preUri)
     });
 }
 
+void View::preloadImage(const QString &uri)
+{
+    if (uri == "null" || uri == preloadedImageUri) {
+        return;
+    }
+
+    clearPreloadedImage();
+    preloadedImageUri = uri;
+
+    QString src = resolveImageSource(uri);
+    qDebug() << "Preloading image from:" << src;
+
+    QNetworkRequest request(src);
+    QNetworkReply* reply = networkManager->get(request);
+    preloadImageReply = reply;
+
+    connect(reply, &QNetworkReply::finished, this, [=]() {
+        reply->deleteLater();
+        if (reply != preloadImageReply) {
+            // Superseded by another preload or aborted
+            return;
+        }
+        preloadImageReply = nullptr;
+
+        if (reply->error() != QNetworkReply::NoError) {
+            qDebug() << "Image preload failed:" << reply->errorString();
+            bool pendingShow = showPreloadedImageWhenReady;
+            QString failedUri = preloadedImageUri;
+            clearPreloadedImage();
+            if (pendingShow) {
+                loadImage(failedUri);
+            }
+            return;
+        }
+
+        preloadedImageData = reply->readAll();
+        // Decoding is the slow part on a Pi, so do it ahead of the swap
+        preloadedImage.loadFromData(preloadedImageData);
+        preloadedImageReady = true;
+        qDebug() << "Preloaded image data size:" << preloadedImageData.size();
+
+        if (showPreloadedImageWhenReady) {
+            QByteArray data = preloadedImageData;
+            QImage image = preloadedImage;
+            clearPreloadedImage();
+            showImageData(data, image);
+        }
+    });
+}
+
+void View::clearPreloadedImage()
+{
+    if (preloadImageReply) {
+        QNetworkReply* reply = preloadImageReply;
+        preloadImageReply = nullptr;
+        reply->abort();
+    }
+
+    preloadedImageUri.clear();
+    preloadedImageData.clear();
+    preloadedImage = QImage();
+    preloadedImageReady = false;
+    showPreloadedImageWhenReady = false;
+}
+
+QString View::resolveImageSource(const QString &uri)
+{
+    QFileInfo fileInfo = QFileInfo(uri);
+    QString src;
+
+    if (fileInfo.isFile())
+    {
+        qDebug() << "Location: Local File";
+        qDebug() << "File path:" << fileInfo.absoluteFilePath();
+
+        // Keep subdirectories of the asset directory (such as the viewer's
+        // download cache) in the path nginx serves them from
+        QString absolutePath = fileInfo.absoluteFilePath();
+        int assetDirIndex = absolutePath.indexOf("/screenly_assets/");
+        QString relativePath = assetDirIndex >= 0
+            ? absolutePath.mid(assetDirIndex + QString("/screenly_assets/").length())
+            : fileInfo.fileName();
+
+        QUrl url;
+        url.setScheme("http");
+        url.setHost("anthias-nginx");
+        url.setPath("/screenly_assets/" + relativePath);
+
+        src = url.toString();
+        qDebug() << "Generated URL:" << src;
+    }
+    else
+    {
+        qDebug() << "Location: Remote URL";
+        src = uri;
+    }
+
+    return src;
+}
+
+void View::showImageData(const QByteArray& data, const QImage& decoded)
+{
+    if (tryLoadAsAnimatedGif(data)) {
+        return;
+    }
+
+    if (decoded.isNull()) {
+        loadAsStaticImage(data);
+    } else {
+        showStaticImage(decoded);
+    }
+}
+
 bool View::tryLoadAsAnimatedGif(const QByteArray& data)
 {
     // Try to load as QMovie first to check if it's an animated GIF
@@ -212,15 +365,20 @@ void View::loadAsStaticImage(const QByteArray& data)
     QImage newImage;
     if (newImage.loadFromData(data)) {
         qDebug() << "Successfully loaded static image. Size:" << newImage.size();
-        nextImage = newImage;
-        webView->setVisible(false);
-        currentImage = nextImage;
-        update();
+        showStaticImage(newImage);
     } else {
         qDebug() << "Failed to load image from data";
     }
 }
 
+void View::showStaticImage(const QImage& image)
+{
+    nextImage = image;
+    webView->setVisible(false);
+    currentImage = nextImage;
+    update();
+}
+
 void View::updateMovieFrame()
 {
     if (movie && isAnimatedImage && movie->state() == QMovie::Running) {
@@ -320,11 +478,17 @@ void View::onWebPageLoadFinished(bool ok)
         qDebug() << "Background web page loaded successfully";
         nextWebViewReady = true;
 
-        // Switch to the new web view since it's ready
-        switchToNextWebView();
+        if (pageLoadPending) {
+            // Switch to the new web view since it's ready
+            switchToNextWebView();
+        } else {
+            qDebug() << "Preloaded web page is ready";
+        }
     } else {
         qDebug() << "Background web page failed to load";
         nextWebViewReady = false;
+        pageLoadPending = false;
+        preloadedPageUri.clear();
     }
 
     // Disconnect signals to prevent memory leaks
@@ -368,6 +532,7 @@ void View::switchToNextWebView()
 
     // Reset states for next load
     nextWebViewReady = false;
+    pageLoadPending = false;
 
     qDebug() << "Successfully switched to next web view";
 }
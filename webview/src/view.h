@@ -22,6 +22,11 @@ public:
     void loadPage(const QString &uri);
     void loadImage(const QString &uri);
 
+    // Load the asset that will be shown next without showing it yet, so
+    // that the following loadPage()/loadImage() call only has to swap it in.
+    void preloadPage(const QString &uri);
+    void preloadImage(const QString &uri);
+
 protected:
     void paintEvent(QPaintEvent* event) override;
     void resizeEvent(QResizeEvent* event) override;
@@ -35,6 +40,10 @@ private slots:
 private:
     bool tryLoadAsAnimatedGif(const QByteArray& data);
     void loadAsStaticImage(const QByteArray& data);
+    void showStaticImage(const QImage& image);
+    void showImageData(const QByteArray& data, const QImage& decoded);
+    void clearPreloadedImage();
+    QString resolveImageSource(const QString &uri);
     void scheduleNextFrame();
     void setupAnimation();
     void switchToNextWebView();
@@ -55,4 +64,14 @@ private:
     QWebEngineView* currentWebView;
     QWebEngineView* nextWebView;
     bool nextWebViewReady;
+    bool pageLoadPending;
+
+    // Preloaded assets
+    QString preloadedPageUri;
+    QString preloadedImageUri;
+    QNetworkReply* preloadImageReply;
+    QByteArray preloadedImageData;
+    QImage preloadedImage;
+    bool preloadedImageReady;
+    bool showPreloadedImageWhenReady;
 };